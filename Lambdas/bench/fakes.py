@@ -0,0 +1,320 @@
+#
+# fakes.py
+#
+# Local stand-ins for the services the Lambdas talk to, so the
+# handlers can be run in-process without AWS:
+#
+#   FakeS3Client / FakeLambdaClient / FakeSqsClient
+#       in-memory versions of the boto3 calls the handlers make
+#   SqliteConnection
+#       a pymysql-compatible connection over SQLite, enough for
+#       datatier; the schema comes from migrations/versions/
+#   FakeModelServer
+#       local HTTP server answering the OpenAI chat-completions
+#       (streamed) and Gemini generateContent calls, with
+#       configurable latency
+#
+
+import re
+import os
+import sys
+import json
+import hmac
+import time
+import uuid
+import zlib
+import base64
+import struct
+import sqlite3
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAMBDAS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(LAMBDAS_DIR, "migrations", "versions")
+
+
+###################################################################
+#
+# AWS
+#
+
+class _Body:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+class FakeS3Client:
+    """In-memory S3 with the calls the handlers use. Presigning really HMACs, like botocore."""
+
+    def __init__(self):
+        self.objects = {}   # (bucket, key) -> (bytes, metadata dict)
+        self._secret = os.urandom(32)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        self.objects[(Bucket, Key)] = (data, kwargs)
+        return {"ETag": '"%s"' % hashlib.md5(data).hexdigest()}
+
+    def get_object(self, Bucket, Key):
+        data, meta = self.objects[(Bucket, Key)]
+        return {"Body": _Body(data), "ContentLength": len(data), **meta}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+        return {}
+
+    def _sign(self, *parts):
+        msg = "\n".join(str(p) for p in parts).encode("utf-8")
+        return hmac.new(self._secret, msg, hashlib.sha256).hexdigest()
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, HttpMethod=None):
+        now = int(time.time())
+        sig = self._sign(ClientMethod, Params["Bucket"], Params["Key"], now, ExpiresIn)
+        return (f"https://{Params['Bucket']}.s3.local/{Params['Key']}"
+                f"?X-Amz-Date={now}&X-Amz-Expires={ExpiresIn}&X-Amz-Signature={sig}")
+
+    def presign_get_url(self, bucket, key, signed_at, expires_in):
+        """Stands in for signed_urls.presign_get_url: the same inputs give the same URL."""
+        sig = self._sign("get_object", bucket, key, signed_at, expires_in)
+        return (f"https://{bucket}.s3.local/{key}"
+                f"?X-Amz-Date={signed_at}&X-Amz-Expires={expires_in}&X-Amz-Signature={sig}")
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600):
+        policy = base64.b64encode(json.dumps({"conditions": Conditions or []}).encode()).decode()
+        return {
+            "url": f"https://{Bucket}.s3.local/",
+            "fields": {**(Fields or {}), "key": Key, "policy": policy, "signature": self._sign(policy)},
+        }
+
+
+class FakeLambdaClient:
+    """Records invocations; optionally dispatches them to in-process handlers."""
+
+    def __init__(self, dispatch=None):
+        self.invocations = []
+        self.dispatch = dispatch or {}   # FunctionName -> handler(event, context)
+
+    def invoke(self, FunctionName, InvocationType="RequestResponse", Payload="{}"):
+        self.invocations.append((FunctionName, Payload))
+        handler = self.dispatch.get(FunctionName)
+        if handler:
+            handler(json.loads(Payload), None)
+        return {"StatusCode": 202}
+
+
+class FakeSqsClient:
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, QueueUrl, MessageBody):
+        msg_id = str(uuid.uuid4())
+        self.messages.append({"messageId": msg_id, "body": MessageBody, "eventSource": "aws:sqs"})
+        return {"MessageId": msg_id}
+
+
+###################################################################
+#
+# Database
+#
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+
+def to_sqlite(sql):
+    """Rewrites the MySQL dialect the Lambdas use into SQLite."""
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    return sql.replace("INSERT IGNORE", "INSERT OR IGNORE")
+
+
+class _SqliteCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = conn.cursor()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, parameters=()):
+        self._cursor.execute(to_sqlite(sql), tuple(parameters or ()))
+
+    def executemany(self, sql, parameters_list):
+        self._cursor.executemany(to_sqlite(sql), [tuple(p) for p in parameters_list])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """The subset of pymysql's Connection that datatier relies on."""
+
+    def __init__(self, path=":memory:"):
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.create_function("UUID", 0, lambda: str(uuid.uuid4()))
+
+    def cursor(self):
+        return _SqliteCursor(self._conn)
+
+    def begin(self):
+        self._conn.execute("BEGIN")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def autocommit(self, value):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+    def apply_migrations(self):
+        from migrate import split_statements
+
+        for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+            if filename.endswith(".sql"):
+                with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+                    for stmt in split_statements(f.read()):
+                        self._conn.execute(stmt)
+        return self
+
+
+###################################################################
+#
+# Model APIs
+#
+
+def tiny_png(width=8, height=8):
+    """A valid white PNG, built without Pillow."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    raw = b"".join(b"\x00" + b"\xff\xff\xff" * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw))
+            + chunk(b"IEND", b""))
+
+
+SAMPLE_ITEMS = [
+    {"clothing_type": "T-Shirt", "color": "Red", "material": "Cotton", "style": "Casual",
+     "extra_info": "Graphic print, crew neck"},
+    {"clothing_type": "Jeans", "color": "Blue", "material": "Denim", "style": "Slim", "extra_info": ""},
+    {"clothing_type": "Sneakers", "color": "White", "material": "Leather", "style": "Sporty",
+     "extra_info": "Low top"},
+    {"clothing_type": "Sunglasses", "color": "Black", "material": "Plastic", "style": "Aviator",
+     "extra_info": "Reflective lenses"},
+]
+
+# Where the fake detection model says each item is: [x_min, y_min, x_max, y_max]
+SAMPLE_BOXES = [
+    [0.25, 0.05, 0.75, 0.45],
+    [0.3, 0.45, 0.7, 0.85],
+    [0.3, 0.85, 0.7, 1.0],
+    [0.4, 0.0, 0.6, 0.08],
+]
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """Drops the tracebacks of clients that hang up on a keep-alive connection."""
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class FakeModelServer:
+    """
+    Serves POST <base>/openai/chat/completions (streamed SSE) and
+    POST <base>/gemini/models/<model>:generateContent on localhost.
+    latency_ms is the time to first byte; chunk_delay_ms the gap
+    between streamed chunks.
+    """
+
+    def __init__(self, latency_ms=300, chunk_delay_ms=5, items_per_photo=4):
+        self.latency_ms = latency_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.items_per_photo = items_per_photo
+        self._server = _QuietHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like the real endpoints
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(server.latency_ms / 1000)
+                if self.path.startswith("/openai/"):
+                    self._openai()
+                elif self.path.startswith("/gemini/"):
+                    self._gemini()
+                else:
+                    self.send_error(404)
+
+            def _openai(self):
+                items = [dict(item, bbox=SAMPLE_BOXES[i % len(SAMPLE_BOXES)])
+                         for i, item in enumerate((SAMPLE_ITEMS * server.items_per_photo)[:server.items_per_photo])]
+                text = json.dumps({"items": items})
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(text), 16):
+                    event = {"choices": [{"delta": {"content": text[i:i + 16]}}]}
+                    self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+                    time.sleep(server.chunk_delay_ms / 1000)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _gemini(self):
+                image = base64.b64encode(tiny_png()).decode()
+                body = json.dumps({"candidates": [{"content": {"parts": [
+                    {"inlineData": {"mimeType": "image/png", "data": image}}]}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,441 @@
+#
+# run_bench.py
+#
+# Offline benchmark for the Lambda handlers. Runs each
+# lambda_handler in-process against the stand-ins in fakes.py
+# (in-memory S3, SQLite behind datatier, local OpenAI/Gemini
+# servers) and reports p50/p95/p99 latency and throughput for
+# synthetic closets of various sizes.
+#
+# Usage:
+#   python bench/run_bench.py
+#   python bench/run_bench.py --sizes 10,1000 --iterations 100
+#   python bench/run_bench.py --model-latency-ms 50 --json results.json
+#
+# Absolute numbers are not Lambda numbers (SQLite is not RDS and
+# there is no network to S3), but runs on the same machine are
+# comparable, which is what catches regressions before deploy.
+#
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import importlib.util
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.dirname(BENCH_DIR)
+
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, "shared", "python"))
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, "migrations"))
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, "detectClothing"))   # item_stream
+sys.path.insert(0, BENCH_DIR)
+
+from sc_runtime import clients, config, signed_urls
+from sc_runtime.pipeline_event import make_pipeline_event
+import fakes
+
+BUCKET = "bench-bucket"
+USER_ID = "benchuser"
+ITEMS_PER_IMAGE = 4
+DEFAULT_SIZES = "10,100,1000,10000,50000"
+
+
+###################################################################
+#
+# Environment
+#
+
+class BenchEnv:
+    """Fresh fakes wired into sc_runtime; one per closet size."""
+
+    def __init__(self, model_base_url=None):
+        self.s3 = fakes.FakeS3Client()
+        self.lambda_ = fakes.FakeLambdaClient()
+        self.sqs = fakes.FakeSqsClient()
+        self.db = fakes.SqliteConnection().apply_migrations()
+
+        clients.s3 = lambda: self.s3
+        clients.lambda_ = lambda: self.lambda_
+        clients.sqs = lambda: self.sqs
+        clients.db = lambda: self.db
+        signed_urls.presign_get_url = self.s3.presign_get_url
+        signed_urls._signed_url_cache.clear()   # each size starts cold
+
+        write_config(model_base_url)
+
+    def seed_closet(self, num_items):
+        """num_items clothing items spread over photos of ITEMS_PER_IMAGE items each."""
+        cur = self.db.cursor()
+        cur.execute("INSERT INTO users (id) VALUES (%s)", [USER_ID])
+
+        images, items = [], []
+        for n in range(0, num_items, ITEMS_PER_IMAGE):
+            image_id = str(uuid.uuid4())
+            images.append([image_id, USER_ID, f"uploads/{USER_ID}/{image_id}.jpg"])
+            for _ in range(min(ITEMS_PER_IMAGE, num_items - n)):
+                item = fakes.SAMPLE_ITEMS[len(items) % len(fakes.SAMPLE_ITEMS)]
+                item_id = str(uuid.uuid4())
+                # per-item clipart with grid thumbnails, as SC_clipartCreator writes them
+                items.append([item_id, image_id, USER_ID, item["clothing_type"], item["color"],
+                              item["material"], item["style"], item["extra_info"],
+                              f"{USER_ID}/closet_items/{item_id}.png", "avif,webp", 1024])
+
+        self.db.begin()
+        cur.executemany("INSERT INTO images (id, user_id, s3_key) VALUES (%s, %s, %s)", images)
+        cur.executemany("""
+            INSERT INTO clothing_items (id, original_image_id, user_id, clothing_type, color,
+                                        material, style, extra_info, new_image_s3_key,
+                                        thumbnail_formats, clipart_width)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, items)
+        self.db.commit()
+        return images
+
+
+    def seed_pending_photos(self, num_photos, items_per_photo=ITEMS_PER_IMAGE):
+        """
+        Photos whose items_per_photo detected items (with boxes) have no
+        clipart yet; with items_per_photo=0, photos not yet detected.
+        """
+        cur = self.db.cursor()
+        images, items = [], []
+        for _ in range(num_photos):
+            image_id = str(uuid.uuid4())
+            images.append([image_id, USER_ID, f"uploads/{USER_ID}/{image_id}.jpg"])
+            for n in range(items_per_photo):
+                item = fakes.SAMPLE_ITEMS[n % len(fakes.SAMPLE_ITEMS)]
+                items.append([str(uuid.uuid4()), image_id, USER_ID, item["clothing_type"], item["color"],
+                              item["material"], item["style"], item["extra_info"],
+                              *fakes.SAMPLE_BOXES[n % len(fakes.SAMPLE_BOXES)]])
+
+        self.db.begin()
+        cur.executemany("INSERT INTO images (id, user_id, s3_key) VALUES (%s, %s, %s)", images)
+        cur.executemany("""
+            INSERT INTO clothing_items (id, original_image_id, user_id, clothing_type, color,
+                                        material, style, extra_info,
+                                        bbox_x_min, bbox_y_min, bbox_x_max, bbox_y_max)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, items)
+        self.db.commit()
+        return images
+
+
+def write_config(model_base_url):
+    path = os.path.join(tempfile.mkdtemp(prefix="sc-bench-"), "SC.ini")
+    base = model_base_url or "http://127.0.0.1:9"
+    with open(path, "w") as f:
+        f.write(f"""
+[s3]
+bucket_name = {BUCKET}
+region_name = us-east-2
+
+[rds]
+endpoint = sqlite
+port_number = 0
+user_name = bench
+user_pwd = bench
+db_name = bench
+
+[openai]
+api_key = bench
+api_base = {base}/openai
+
+[gemini]
+api_key = bench
+api_base = {base}/gemini
+""")
+    config.CONFIG_FILE = path
+    config._config = None
+
+
+def load_handler(name):
+    """Imports <name>/lambda_function.py under a unique module name."""
+    path = os.path.join(LAMBDAS_DIR, name, "lambda_function.py")
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+###################################################################
+#
+# Measurement
+#
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(fn, iterations, verbose=False):
+    """Calls fn() iterations times; returns (sorted latencies in ms, wall seconds)."""
+    latencies = []
+    sink = None if verbose else io.StringIO()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+            t0 = time.perf_counter()
+            result = fn()
+            latencies.append((time.perf_counter() - t0) * 1000)
+        if isinstance(result, dict) and result.get("statusCode", 200) >= 400:
+            raise RuntimeError(f"handler failed: {result}")
+        if sink:
+            sink.seek(0)
+            sink.truncate()
+    return sorted(latencies), time.perf_counter() - start
+
+
+def summarize(scenario, size, latencies, wall_secs):
+    return {
+        "scenario": scenario,
+        "closet_items": size,
+        "n": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "throughput_per_sec": round(len(latencies) / wall_secs, 1) if wall_secs else 0.0,
+    }
+
+
+###################################################################
+#
+# Scenarios
+#
+
+def closet_event(limit=None, cursor=None, etag=None, filters=None):
+    params = dict(filters or {})
+    if limit:
+        params["limit"] = str(limit)
+    if cursor:
+        params["cursor"] = cursor
+    return {
+        "httpMethod": "GET",
+        "pathParameters": {"userid": USER_ID},
+        "queryStringParameters": params or None,
+        "headers": {"If-None-Match": etag} if etag else {},
+    }
+
+
+def bench_get_closet(size, iterations, verbose, **_):
+    env = BenchEnv()
+    env.seed_closet(size)
+    handler = load_handler("getCloset").lambda_handler
+    results = []
+
+    lat, wall = measure(lambda: handler(closet_event(), None), iterations, verbose)
+    results.append(summarize("getCloset first page", size, lat, wall))
+
+    with contextlib.redirect_stdout(None if verbose else io.StringIO()):
+        etag = handler(closet_event(), None)["headers"]["ETag"]
+    lat, wall = measure(lambda: handler(closet_event(etag=etag), None), iterations, verbose)
+    results.append(summarize("getCloset 304", size, lat, wall))
+
+    filtered = closet_event(filters={"color": "Blue"})
+    lat, wall = measure(lambda: handler(filtered, None), iterations, verbose)
+    results.append(summarize("getCloset filtered", size, lat, wall))
+
+    def walk():
+        cursor, pages = None, 0
+        while True:
+            body = json.loads(handler(closet_event(limit=500, cursor=cursor), None)["body"])
+            pages += 1
+            cursor = body["next_cursor"]
+            if not cursor:
+                return {"pages": pages}
+
+    walk_iterations = max(1, min(iterations, 200_000 // max(size, 1)))
+    lat, wall = measure(walk, walk_iterations, verbose)
+    results.append(summarize("getCloset full walk", size, lat, wall))
+    return results
+
+
+def bench_upload(size, iterations, verbose, **_):
+    env = BenchEnv()
+    env.seed_closet(size)
+    handler = load_handler("upload").lambda_handler
+    results = []
+
+    request = {"body": json.dumps({"user_id": USER_ID, "content_type": "image/jpeg"})}
+    lat, wall = measure(lambda: handler(request, None), iterations, verbose)
+    results.append(summarize("upload issue URL", size, lat, wall))
+
+    def object_created():
+        key = f"uploads/{USER_ID}/{uuid.uuid4()}.jpg"
+        return handler({"Records": [{"s3": {"bucket": {"name": BUCKET}, "object": {"key": key}}}]}, None)
+
+    lat, wall = measure(object_created, iterations, verbose)
+    results.append(summarize("upload register object", size, lat, wall))
+    return results
+
+
+def bench_model_handler(name, label, size, iterations, verbose, model_server, items_per_photo):
+    env = BenchEnv(model_server.base_url)
+    env.seed_closet(size)
+    handler = load_handler(name).lambda_handler
+
+    model_key = "model_inputs/bench.jpg"
+    env.s3.put_object(Bucket=BUCKET, Key=model_key, Body=fakes.tiny_png(768, 1024))
+    # a fresh photo per call: detection skips photos it has already done,
+    # and clipart skips items that already have theirs
+    events = [make_pipeline_event(image_id, USER_ID, s3_key, model_key)
+              for image_id, _, s3_key in env.seed_pending_photos(iterations, items_per_photo)]
+
+    counter = iter(range(10**9))
+    lat, wall = measure(lambda: handler(events[next(counter)], None), iterations, verbose)
+    return [summarize(label, size, lat, wall)]
+
+
+def bench_detect_clothing(size, iterations, verbose, model_server, **_):
+    return bench_model_handler("detectClothing", "detectClothing", size, iterations, verbose, model_server,
+                               items_per_photo=0)
+
+
+def bench_clipart_creator(size, iterations, verbose, model_server, **_):
+    return bench_model_handler("clipartCreator", "clipartCreator", size, iterations, verbose, model_server,
+                               items_per_photo=ITEMS_PER_IMAGE)
+
+
+def search_event(item_id, mode):
+    return {
+        "httpMethod": "GET",
+        "pathParameters": {"userid": USER_ID, "itemid": item_id},
+        "queryStringParameters": {"mode": mode, "limit": "20"},
+    }
+
+
+def outfits_event():
+    return {
+        "httpMethod": "GET",
+        "resource": "/closet/{userid}/outfits",
+        "pathParameters": {"userid": USER_ID},
+        "queryStringParameters": {"count": "20"},
+    }
+
+
+def bench_closet_search(size, iterations, verbose, **_):
+    env = BenchEnv()
+    images = env.seed_closet(size)
+    module = load_handler("closetSearch")
+    handler = module.lambda_handler
+    results = []
+    if not images:
+        return results
+
+    cur = env.db.cursor()
+    cur.execute("SELECT id FROM clothing_items WHERE original_image_id = %s", [images[0][0]])
+    item_id = cur.fetchone()[0]
+    similar = search_event(item_id, "similar")
+
+    def cold():
+        module._closet_cache.clear()
+        return handler(similar, None)
+
+    lat, wall = measure(cold, max(1, min(iterations, 500_000 // max(size, 1))), verbose)
+    results.append(summarize("closetSearch index build", size, lat, wall))
+
+    lat, wall = measure(lambda: handler(similar, None), iterations, verbose)
+    results.append(summarize("closetSearch similar", size, lat, wall))
+
+    lat, wall = measure(lambda: handler(search_event(item_id, "goes_with"), None), iterations, verbose)
+    results.append(summarize("closetSearch goes_with", size, lat, wall))
+
+    def after_insert():
+        # what detectClothing does for a one-item photo
+        item = fakes.SAMPLE_ITEMS[0]
+        env.db.begin()
+        cur.execute("UPDATE users SET closet_version = closet_version + 1 WHERE id = %s", [USER_ID])
+        cur.execute("""
+            INSERT INTO clothing_items (id, original_image_id, user_id, clothing_type, color,
+                                        material, style, extra_info, closet_stamp)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, (SELECT closet_version FROM users WHERE id = %s))
+        """, [str(uuid.uuid4()), images[0][0], USER_ID, item["clothing_type"], item["color"],
+              item["material"], item["style"], item["extra_info"], USER_ID])
+        env.db.commit()
+        return handler(similar, None)
+
+    lat, wall = measure(lambda: handler(outfits_event(), None), iterations, verbose)
+    results.append(summarize("closetSearch outfits", size, lat, wall))
+
+    lat, wall = measure(after_insert, iterations, verbose)
+    results.append(summarize("closetSearch after insert", size, lat, wall))
+    return results
+
+
+SCENARIOS = {
+    "getCloset": bench_get_closet,
+    "closetSearch": bench_closet_search,
+    "upload": bench_upload,
+    "detectClothing": bench_detect_clothing,
+    "clipartCreator": bench_clipart_creator,
+}
+NEEDS_REQUESTS = {"detectClothing", "clipartCreator"}
+NEEDS_NUMPY = {"closetSearch"}
+NEEDS_PILLOW = {"clipartCreator"}   # per-item crops
+
+
+###################################################################
+#
+# main
+#
+
+def print_table(rows):
+    header = f"{'scenario':<26}{'items':>8}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['scenario']:<26}{r['closet_items']:>8}{r['n']:>6}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['throughput_per_sec']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the SmartCloset Lambdas")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated closet sizes (items)")
+    parser.add_argument("--iterations", type=int, default=50, help="invocations per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--model-latency-ms", type=int, default=300, help="fake model time to first byte")
+    parser.add_argument("--chunk-delay-ms", type=int, default=5, help="gap between streamed model chunks")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show handler output")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+
+    if NEEDS_REQUESTS.intersection(scenarios) and importlib.util.find_spec("requests") is None:
+        print("**Skipping model scenarios: the requests package is not installed")
+        scenarios = [s for s in scenarios if s not in NEEDS_REQUESTS]
+    if NEEDS_NUMPY.intersection(scenarios) and importlib.util.find_spec("numpy") is None:
+        print("**Skipping closetSearch: the numpy package is not installed")
+        scenarios = [s for s in scenarios if s not in NEEDS_NUMPY]
+    if NEEDS_PILLOW.intersection(scenarios) and importlib.util.find_spec("PIL") is None:
+        print("**Skipping clipartCreator: the Pillow package is not installed")
+        scenarios = [s for s in scenarios if s not in NEEDS_PILLOW]
+
+    rows = []
+    with fakes.FakeModelServer(args.model_latency_ms, args.chunk_delay_ms) as model_server:
+        for name in scenarios:
+            for size in sizes:
+                rows += SCENARIOS[name](size=size, iterations=args.iterations,
+                                        verbose=args.verbose, model_server=model_server)
+
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
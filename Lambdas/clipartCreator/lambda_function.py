@@ -1,49 +1,83 @@
+import io
 import json
-import boto3
-import uuid
-import requests
-import configparser
 import base64
-import datatier
+from sc_runtime import clients, closet_version, color_analysis, config, datatier, metrics, model_client, thumbnails
+from sc_runtime.pipeline_event import InvalidPipelineEvent, parse_pipeline_event
 
-# === Load Config ===
-CONFIG_FILE = "SC.ini"
-config = configparser.ConfigParser()
-config.read(CONFIG_FILE)
+# Config (SC.ini) and AWS/DB clients are loaded lazily through
+# sc_runtime on first use.
 
-try:
-    # S3
-    S3_BUCKET_NAME = config.get("s3", "bucket_name")
-    S3_REGION = config.get("s3", "region_name")
+# Overridable with [gemini] api_base in SC.ini (e.g. a local stand-in)
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
 
-    # RDS
-    DB_HOST = config.get("rds", "endpoint")
-    DB_PORT = config.getint("rds", "port_number")
-    DB_USER = config.get("rds", "user_name")
-    DB_PASSWORD = config.get("rds", "user_pwd")
-    DB_NAME = config.get("rds", "db_name")
+# Image generation is slower than text; allow for it
+GEMINI_READ_TIMEOUT_SECS = 90
 
-    # Gemini
-    GEMINI_API_KEY = config.get("gemini", "api_key")
+# Each item is drawn from its own crop of the model-sized photo: the box
+# from detection plus a margin, shrunk to at most CROP_MAX_DIMENSION. A
+# crop is a fraction of the photo's bytes, so the upload and Gemini's
+# answer are both faster.
+CROP_MARGIN = 0.08            # of the box's width / height, on each side
+CROP_MAX_DIMENSION = 512
+CROP_JPEG_QUALITY = 85
 
-except Exception as e:
-    raise Exception(f"Missing or invalid configuration: {e}")
-
-# === AWS Clients ===
-s3_client = boto3.client("s3", region_name=S3_REGION)
+# Items of one photo drawn at once; model_client's per-host limiter caps
+# the Gemini calls of the whole container as well
+CLIPART_MAX_WORKERS = model_client.MAX_CONCURRENT_CALLS
 
 # === Utility Functions ===
 
+@metrics.timed("s3.get")
 def download_image_bytes_from_s3(s3_key):
-    response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+    response = clients.s3().get_object(Bucket=config.s3_bucket(), Key=s3_key)
     return response["Body"].read()
 
-def generate_line_art_with_gemini(s3_key):
-    """Uses Gemini 2.0 Flash to generate a cutesy line art image from an input image."""
-    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp-image-generation:generateContent?key={GEMINI_API_KEY}"
+@metrics.timed("image.crop")
+def crop_items(image_bytes, boxes):
+    """
+    Returns one JPEG per box: the box (fractions of the image, see
+    migration 0009) widened by CROP_MARGIN and shrunk to fit
+    CROP_MAX_DIMENSION. A None box gets the whole photo. The photo is
+    decoded once for all of them.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        width, height = img.size
+        crops = []
+        for box in boxes:
+            if box is None:
+                crops.append(image_bytes)
+                continue
+            x_min, y_min, x_max, y_max = box
+            pad_x = (x_max - x_min) * CROP_MARGIN
+            pad_y = (y_max - y_min) * CROP_MARGIN
+            left = max(0, int((x_min - pad_x) * width))
+            top = max(0, int((y_min - pad_y) * height))
+            right = max(left + 1, min(width, int(round((x_max + pad_x) * width))))
+            bottom = max(top + 1, min(height, int(round((y_max + pad_y) * height))))
+            crop = img.crop((left, top, right, bottom))
+            crop.thumbnail((CROP_MAX_DIMENSION, CROP_MAX_DIMENSION), Image.LANCZOS)
+
+            out = io.BytesIO()
+            crop.save(out, format="JPEG", quality=CROP_JPEG_QUALITY)
+            crops.append(out.getvalue())
+        return crops
+
+# Clipart objects are written once under a unique key and never modified,
+# so browsers may cache them for as long as they like.
+CLIPART_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def generate_line_art_with_gemini(image_bytes, item_name, deadline=None):
+    """
+    Uses Gemini 2.0 Flash to generate a cutesy line art image of one item
+    (e.g. "red t-shirt") from a photo of it. deadline bounds the
+    rate-limit waits and retries (see model_client.invocation_deadline).
+    """
+    api_base = config.get("gemini", "api_base", fallback=GEMINI_API_BASE)
+    api_url = f"{api_base}/models/gemini-2.0-flash-exp-image-generation:generateContent?key={config.get('gemini', 'api_key')}"
 
-    # Get the image bytes from S3
-    image_bytes = download_image_bytes_from_s3(s3_key)
     base64_image = base64.b64encode(image_bytes).decode("utf-8")
 
     headers = {
@@ -57,7 +91,8 @@ def generate_line_art_with_gemini(s3_key):
                 "parts": [
                     {
                         "text": (
-                            "Generate a an image of the clothing and accesories in this photo. Use soft colors, thick outlines, and a plain white background. "
+                            f"Generate an image of just the {item_name} in this photo, on its own. "
+                            "Use soft colors, thick outlines, and a plain white background. "
                             "Avoid shadows and realistic textures—make it look like a clean digital sticker or illustration. "
                             "Focus on capturing the clothing style and shape clearly."
                         )
@@ -76,85 +111,178 @@ def generate_line_art_with_gemini(s3_key):
         }
     }
 
-    response = requests.post(api_url, headers=headers, json=payload)
-    if response.status_code != 200:
-        raise Exception(f"Gemini Vision API error: {response.text}")
+    with metrics.span("model.call"):
+        response = model_client.post_json(api_url, payload, headers=headers,
+                                          read_timeout=GEMINI_READ_TIMEOUT_SECS, deadline=deadline)
+        if response.status_code != 200:
+            raise Exception(f"Gemini Vision API error: {response.text}")
+        body = response.json()
 
     try:
-        parts = response.json()["candidates"][0]["content"]["parts"]
-        for part in parts:
-            if "inlineData" in part:
-                return base64.b64decode(part["inlineData"]["data"])
+        with metrics.span("model.parse"):
+            parts = body["candidates"][0]["content"]["parts"]
+            for part in parts:
+                if "inlineData" in part:
+                    return base64.b64decode(part["inlineData"]["data"])
         raise Exception("No image returned from Gemini.")
     except Exception as e:
         raise Exception(f"Failed to parse Gemini response: {str(e)}")
 
-def upload_clipart_to_s3(user_id, original_id, image_bytes):
-    new_s3_key = f"{user_id}/closet_items/{original_id}.png"
-    s3_client.put_object(
-        Bucket=S3_BUCKET_NAME,
-        Key=new_s3_key,
-        Body=image_bytes,
-        ContentType="image/png"
-    )
+def upload_clipart_to_s3(user_id, item_id, image_bytes):
+    new_s3_key = f"{user_id}/closet_items/{item_id}.png"
+    with metrics.span("s3.put"):
+        clients.s3().put_object(
+            Bucket=config.s3_bucket(),
+            Key=new_s3_key,
+            Body=image_bytes,
+            ContentType="image/png",
+            CacheControl=CLIPART_CACHE_CONTROL
+        )
     return new_s3_key
 
-def update_new_image_key(clothing_id, new_key):
-    conn = datatier.get_dbConn(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+def analyze_colors(clipart_bytes):
+    """
+    Dominant color swatches of the clipart (white background masked out),
+    or [] if they could not be measured; colors are optional extras and
+    never fail the clipart.
+    """
     try:
-        sql = """
-            UPDATE clothing_items
-            SET new_image_s3_key = %s
-            WHERE original_image_id = %s
-        """
-        datatier.perform_action(conn, sql, [new_key, clothing_id])
-    finally:
-        conn.close()
-
-# === Lambda Entry Point ===
+        with metrics.span("color.analyze"):
+            return color_analysis.dominant_colors(clipart_bytes)
+    except Exception as e:
+        print("Color analysis failed:", str(e))
+        return []
 
-def lambda_handler(event, context):
+def make_thumbnails(clipart_key, clipart_bytes):
+    """
+    Writes the grid-sized AVIF/WebP copies of the clipart (see
+    sc_runtime/thumbnails.py); returns (their formats, the clipart's
+    width), or (None, None) if they could not be made. Like colors, they
+    never fail the clipart: readers fall back to the full-size PNG.
+    """
     try:
-        print("Lambda: SC_clipartCreator triggered.")
+        return thumbnails.write_thumbnails(clipart_key, clipart_bytes)
+    except Exception as e:
+        print("Thumbnails failed:", str(e))
+        return None, None
 
-        body = json.loads(event.get("body", "{}")) if isinstance(event.get("body"), str) else event
-        s3_key = body.get("s3_key")
-        clothing_id = body.get("clothing_id")
+# Items of the photo that have no clipart yet; on a retry the items
+# finished by the failed attempt are skipped
+PENDING_ITEMS_SQL = """
+    SELECT id, clothing_type, color, bbox_x_min, bbox_y_min, bbox_x_max, bbox_y_max
+    FROM clothing_items
+    WHERE original_image_id = %s AND new_image_s3_key IS NULL
+"""
 
-        if not s3_key or not clothing_id:
-            return {"statusCode": 400, "body": json.dumps({"error": "Missing s3_key or clothing_id"})}
+def load_pending_items(original_id):
+    """Returns [(item_id, "color type" name, box or None)]."""
+    rows = datatier.retrieve_all_rows(clients.db(), PENDING_ITEMS_SQL, [original_id])
+    items = []
+    for item_id, clothing_type, color, *box in rows:
+        name = " ".join(w for w in (color, clothing_type) if w).lower() or "clothing"
+        items.append((item_id, name, tuple(box) if None not in box else None))
+    return items
 
-        # Get user_id from DB
-        conn = datatier.get_dbConn(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
-        row = datatier.retrieve_one_row(conn, "SELECT id, user_id FROM images WHERE s3_key = %s", [s3_key])
-        conn.close()
+def draw_item(user_id, item_id, item_name, crop_bytes, deadline=None):
+    """
+    Clipart for one item; returns (S3 key, (thumbnail formats, clipart
+    width), color swatches). Runs on a worker thread.
+    """
+    clipart_bytes = generate_line_art_with_gemini(crop_bytes, item_name, deadline)
+    new_key = upload_clipart_to_s3(user_id, item_id, clipart_bytes)
+    return new_key, make_thumbnails(new_key, clipart_bytes), analyze_colors(clipart_bytes)
 
-        if not row:
-            raise Exception("Image not found in database.")
-        original_id = row[0]
-        user_id = row[1]
+UPDATE_ITEM_CLIPART_SQL = f"""
+    UPDATE clothing_items
+    SET new_image_s3_key = %s, thumbnail_formats = %s, clipart_width = %s, closet_stamp = {closet_version.STAMP_SQL}
+    WHERE id = %s
+"""
 
-        # Generate line art using Gemini
-        print("Generating line art using Gemini...")
-        clipart_bytes = generate_line_art_with_gemini(s3_key)
+# Measured color of one item. The clipart shows just that item, so its
+# dominant swatch's bucket replaces the model's color guess.
+UPDATE_ITEM_COLOR_SQL = """
+    UPDATE clothing_items
+    SET color = %s, color_rgb = %s, color_lab_l = %s, color_lab_a = %s, color_lab_b = %s,
+        color_swatches = %s
+    WHERE id = %s
+"""
 
-        # Upload new image to S3
-        new_key = upload_clipart_to_s3(user_id, original_id, clipart_bytes)
+def update_item_clipart(item_id, user_id, new_key, thumbnail_info=(None, None), swatches=()):
+    conn = clients.db()
+    with datatier.transaction(conn):
+        closet_version.bump(conn, user_id)
+        datatier.perform_action(conn, UPDATE_ITEM_CLIPART_SQL, [new_key, *thumbnail_info, user_id, item_id])
+        if swatches:
+            swatch = swatches[0]
+            datatier.perform_action(conn, UPDATE_ITEM_COLOR_SQL,
+                [swatch["bucket"], swatch["rgb"], *swatch["lab"], json.dumps(swatches), item_id])
 
-        # Update DB with new image key
-        update_new_image_key(clothing_id, new_key)
+def create_clipart(pipeline_event, deadline=None):
+    """
+    Draws every pending item of the photo from its own crop, up to
+    CLIPART_MAX_WORKERS at a time, and stores each one as soon as it is
+    done. Returns (number drawn, number failed).
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed  # pulls in logging
 
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": "Clipart created and uploaded successfully using Gemini.",
-                "new_image_s3_key": new_key
-            })
-        }
+    original_id = pipeline_event["image_id"]
+    user_id = pipeline_event["user_id"]
+    # downscaled, EXIF-normalized copy from SC_preprocessImage; the
+    # detection boxes are fractions of it
+    model_s3_key = pipeline_event.get("model_s3_key") or pipeline_event["s3_key"]
 
-    except Exception as e:
-        print("ERROR:", str(e))
-        return {
-            "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
+    items = load_pending_items(original_id)
+    if not items:
+        return 0, 0
+
+    crops = crop_items(download_image_bytes_from_s3(model_s3_key), [box for _, _, box in items])
+
+    drawn = failed = 0
+    with ThreadPoolExecutor(max_workers=min(CLIPART_MAX_WORKERS, len(items))) as pool:
+        futures = {
+            pool.submit(draw_item, user_id, item_id, item_name, crop, deadline): item_id
+            for (item_id, item_name, _), crop in zip(items, crops)
         }
+        # DB writes stay on this thread: the cached connection is not
+        # thread-safe
+        for future in as_completed(futures):
+            item_id = futures[future]
+            try:
+                new_key, thumbnail_info, swatches = future.result()
+                update_item_clipart(item_id, user_id, new_key, thumbnail_info, swatches)
+                drawn += 1
+            except Exception as e:
+                print(f"ERROR (item {item_id}):", str(e))
+                failed += 1
+    return drawn, failed
+
+# === Lambda Entry Point ===
+
+@metrics.instrument("SC_clipartCreator")
+def lambda_handler(event, context):
+    print("Lambda: SC_clipartCreator triggered.")
+
+    try:
+        pipeline_event = parse_pipeline_event(event)
+    except InvalidPipelineEvent as e:
+        # retrying a malformed event cannot help
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+
+    # Anything else raises: this function is invoked asynchronously, and
+    # only a raised error makes Lambda retry the invocation (a returned
+    # 500 counts as success). The retry redraws just the items still
+    # missing clipart.
+    print("Generating line art using Gemini...")
+    # model calls give up in time to store the finished items and raise
+    drawn, failed = create_clipart(pipeline_event, model_client.invocation_deadline(context))
+
+    if failed:
+        raise Exception(f"Clipart failed for {failed} of {drawn + failed} items")
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": "Clipart created and uploaded successfully using Gemini.",
+            "num_items_drawn": drawn
+        })
+    }
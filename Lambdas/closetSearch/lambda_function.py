@@ -0,0 +1,397 @@
+# lambda_function.py for SC_closetSearch (item matches and outfits)
+#
+# GET /closet/{userid}/items/{itemid}/matches?mode=similar|goes_with&limit=20
+# GET /closet/{userid}/outfits?count=20&item={itemid}
+#
+# Each warm container keeps a feature matrix per recently used closet
+# (sc_runtime/features.py). A request checks the closet's version, reads
+# only the rows stamped since the cached version (migration 0008), and
+# scores the whole closet with array operations.
+import json
+from collections import OrderedDict
+from sc_runtime import clients, closet_version, metrics
+from sc_runtime.closet_items import JSON_COLUMNS, item_json
+from sc_runtime.datatier import retrieve_all_rows, retrieve_one_row
+
+# Common CORS headers
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Methods": "OPTIONS,GET"
+}
+
+MODES = ("similar", "goes_with")
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Outfits: required slots, then optional slots added when the closet has
+# items for them. Every pair of slots in a template goes together.
+OUTFIT_TEMPLATES = (
+    (("top", "bottom", "shoes"), ("outerwear", "accessory")),
+    (("one_piece", "shoes"), ("outerwear", "accessory")),
+)
+DEFAULT_OUTFITS = 20
+MAX_OUTFITS = 50
+SLOT_TOP_K = 8          # candidates kept per slot before the cross product
+MAX_ITEM_REPEATS = 3    # outfits one item may appear in, so results vary
+
+MAX_CACHED_CLOSETS = 20   # per warm container, least recently used evicted
+
+# closet_items.JSON_COLUMNS, then the measured color for scoring
+ITEM_COLUMNS = """
+    SELECT id, clothing_type, color, material, style, extra_info, new_image_s3_key,
+           color_rgb, thumbnail_formats, clipart_width, color_lab_l, color_lab_a, color_lab_b
+    FROM clothing_items
+"""
+
+# user_id -> ClosetIndex; survives across warm invocations
+_closet_cache = OrderedDict()
+
+
+class BadRequest(Exception):
+    pass
+
+
+class ClosetIndex:
+    """
+    One user's closet as arrays, row i describing item ids[i]: the feature
+    matrix for similarity and the style/color/slot columns for pairing.
+    Rows are overwritten in place when an item changes and appended when
+    it is new; version is the closet_version the arrays reflect.
+    """
+
+    def __init__(self):
+        import numpy as np
+        from sc_runtime import features
+
+        self.version = None
+        self.ids = []
+        self.pos = {}
+        self.display = []
+        self.X = np.zeros((0, features.feature_dim()), dtype=np.float32)
+        self.style = np.zeros((0, features.STYLE_DIM), dtype=np.float32)
+        self.lab = np.zeros((0, 3), dtype=np.float32)
+        self.slots = np.zeros(0, dtype=np.int8)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def upsert(self, rows):
+        """Encodes rows (ITEM_COLUMNS order) as one batch and stores them."""
+        import numpy as np
+        from sc_runtime import features
+
+        if not rows:
+            return
+        X, style, lab, slots = features.encode([
+            (clothing_type, color, material, item_style,
+             features.item_lab(color, lab_l, lab_a, lab_b))
+            for _, clothing_type, color, material, item_style, _, _, _, _, _, lab_l, lab_a, lab_b in rows
+        ])
+
+        existing = [(k, self.pos[row[0]]) for k, row in enumerate(rows) if row[0] in self.pos]
+        if existing:
+            batch, at = (list(x) for x in zip(*existing))
+            self.X[at], self.style[at], self.lab[at], self.slots[at] = X[batch], style[batch], lab[batch], slots[batch]
+            for k, i in existing:
+                self.display[i] = rows[k][:len(JSON_COLUMNS)]
+
+        new = [k for k, row in enumerate(rows) if row[0] not in self.pos]
+        if new:
+            self.X = np.concatenate([self.X, X[new]])
+            self.style = np.concatenate([self.style, style[new]])
+            self.lab = np.concatenate([self.lab, lab[new]])
+            self.slots = np.concatenate([self.slots, slots[new]])
+            for k in new:
+                self.pos[rows[k][0]] = len(self.ids)
+                self.ids.append(rows[k][0])
+                self.display.append(rows[k][:len(JSON_COLUMNS)])
+
+
+def load_closet_index(conn, user_id):
+    """
+    Returns the user's ClosetIndex, up to date with the database. A cached
+    index only reads the rows stamped after its version; when the closet
+    has lost rows (a photo re-detected or deleted) the row count no longer
+    matches and the index is rebuilt from scratch.
+    """
+    # version first: rows written after this read carry a larger stamp
+    # and are picked up by the next refresh
+    version = closet_version.get(conn, user_id)
+
+    index = _closet_cache.get(user_id)
+    if index is not None:
+        _closet_cache.move_to_end(user_id)
+        if index.version == version:
+            return index
+        with metrics.span("index.refresh"):
+            index.upsert(retrieve_all_rows(conn,
+                ITEM_COLUMNS + "WHERE user_id = %s AND closet_stamp > %s", [user_id, index.version]))
+            count = retrieve_one_row(conn,
+                "SELECT COUNT(*) FROM clothing_items WHERE user_id = %s", [user_id])[0]
+        if count == len(index):
+            index.version = version
+            return index
+
+    with metrics.span("index.build"):
+        index = ClosetIndex()
+        index.upsert(retrieve_all_rows(conn, ITEM_COLUMNS + "WHERE user_id = %s", [user_id]))
+        index.version = version
+
+    _closet_cache[user_id] = index
+    _closet_cache.move_to_end(user_id)
+    if len(_closet_cache) > MAX_CACHED_CLOSETS:
+        _closet_cache.popitem(last=False)
+    return index
+
+
+def score_matches(index, item_id, mode, limit):
+    """
+    Returns [(row, score)] for the best limit matches of item_id, best
+    first. The whole closet is scored in one pass: a matrix-vector product
+    for similarity, a broadcast pair score for goes_with.
+    """
+    import numpy as np
+    from sc_runtime import features
+
+    i = index.pos[item_id]
+    if mode == "similar":
+        scores = index.X @ index.X[i]
+    else:
+        scores = features.pair_scores(index.style[i:i + 1], index.lab[i:i + 1], index.slots[i:i + 1],
+                                      index.style, index.lab, index.slots)[0]
+
+    scores = scores.astype(np.float32)
+    scores[i] = -np.inf
+    if mode == "goes_with":
+        scores[scores <= 0] = -np.inf   # different slot: not a match at all
+
+    k = min(limit, int(np.isfinite(scores).sum()))
+    if k == 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(index.display[j], float(scores[j])) for j in top]
+
+
+def template_outfits(index, members, pair_matrix):
+    """
+    Scored outfits for one template, as (scores (n,), combos (n, slots))
+    of item positions. members holds each slot's candidate positions. An
+    outfit's score is the mean pair score over all its item pairs.
+
+    Each slot is first cut to its SLOT_TOP_K most promising items -- those
+    with the best expected pair score against the other slots, which
+    costs time linear in the closet size -- and then the cross product of
+    the survivors is scored at once: every pair of slots contributes a
+    small (k, k) block, broadcast into one k x k x ... array.
+    """
+    import numpy as np
+    from sc_runtime import features
+
+    def columns(positions):
+        return index.style[positions], index.lab[positions], index.slots[positions]
+
+    m = len(members)
+    pairs = [(a, b) for a in range(m) for b in range(a + 1, m)]
+
+    summaries = [features.partner_summary(index.style[p], index.lab[p]) for p in members]
+    centres = features.bucket_centres()
+
+    kept = []
+    for a in range(m):
+        k = min(SLOT_TOP_K, len(members[a]))
+        if k == len(members[a]):
+            kept.append(members[a])
+            continue
+        style = index.style[members[a]]
+        bucket_harmony = features.color_harmony(index.lab[members[a]], centres)
+        # the template's slots all go together, so no slot compatibility term
+        promise = sum(features.expected_pair_scores(style, bucket_harmony, summaries[b])
+                      for b in range(m) if b != a)
+        kept.append(members[a][np.argpartition(-promise, k - 1)[:k]])
+
+    shape = [len(k) for k in kept]
+    total = np.zeros(shape, dtype=np.float32)
+    for a, b in pairs:
+        view = [1] * m
+        view[a], view[b] = shape[a], shape[b]
+        total += features.pair_scores(*columns(kept[a]), *columns(kept[b]), pair_matrix).reshape(view)
+    total /= len(pairs)
+
+    grid = np.unravel_index(np.arange(total.size), shape)
+    combos = np.stack([kept[a][i] for a, i in enumerate(grid)], axis=1)
+    return total.ravel(), combos
+
+
+def generate_outfits(index, count, anchor_id=None):
+    """
+    Returns up to count outfits, best first, as [(score, [(slot, row)])].
+    With anchor_id every outfit is built around that item. No item other
+    than the anchor appears in more than MAX_ITEM_REPEATS outfits.
+    """
+    import numpy as np
+    from sc_runtime import features
+
+    pair_matrix = features.slot_pair_matrix()
+    by_slot = {slot: np.flatnonzero(index.slots == k) for k, slot in enumerate(features.SLOTS)}
+
+    anchor_slot = None
+    if anchor_id is not None:
+        anchor = index.pos[anchor_id]
+        if index.slots[anchor] == features.NO_SLOT:
+            return []
+        anchor_slot = features.SLOTS[index.slots[anchor]]
+        by_slot[anchor_slot] = np.array([anchor])
+
+    templates = []
+    for required, optional in OUTFIT_TEMPLATES:
+        slots = required + tuple(s for s in optional if len(by_slot[s]))
+        if any(len(by_slot[s]) == 0 for s in required):
+            continue
+        if anchor_slot is not None and anchor_slot not in slots:
+            continue
+        templates.append((slots,) + template_outfits(index, [by_slot[s] for s in slots], pair_matrix))
+    if not templates:
+        return []
+
+    # best first across templates, then greedily skip outfits that would
+    # repeat an item too often; rows leave NumPy a chunk at a time, only
+    # as far down the ranking as needed
+    width = max(len(t[0]) for t in templates)
+    scores = np.concatenate([t[1] for t in templates])
+    owner = np.concatenate([np.full(len(t[1]), k) for k, t in enumerate(templates)])
+    combos = np.concatenate([np.pad(t[2], ((0, 0), (0, width - t[2].shape[1])), constant_values=-1)
+                             for t in templates])
+    order = np.argsort(-scores, kind="stable")
+
+    anchor_pos = index.pos.get(anchor_id)
+    uses = {}
+    saturated = set()
+    outfits = []
+    for start in range(0, len(order), 256):
+        chunk = order[start:start + 256]
+        for j, combo in zip(chunk.tolist(), combos[chunk].tolist()):
+            if not saturated.isdisjoint(combo):
+                continue
+            slots = templates[owner[j]][0]
+            combo = combo[:len(slots)]
+            for i in combo:
+                uses[i] = uses.get(i, 0) + 1
+                if uses[i] >= MAX_ITEM_REPEATS and i != anchor_pos:
+                    saturated.add(i)
+            outfits.append((float(scores[j]), [(slot, index.display[i]) for slot, i in zip(slots, combo)]))
+            if len(outfits) == count:
+                return outfits
+    return outfits
+
+
+def parse_limit(params, name, default, maximum):
+    if not params.get(name):
+        return default
+    try:
+        value = int(params[name])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if value < 1:
+        raise BadRequest(f"{name} must be positive")
+    return min(value, maximum)
+
+
+def parse_params(event):
+    params = event.get("queryStringParameters") or {}
+
+    mode = params.get("mode") or "similar"
+    if mode not in MODES:
+        raise BadRequest(f"mode must be one of {', '.join(MODES)}")
+    return mode, parse_limit(params, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+
+
+def parse_outfit_params(event):
+    params = event.get("queryStringParameters") or {}
+    anchor_id = (params.get("item") or "").strip() or None
+    return parse_limit(params, "count", DEFAULT_OUTFITS, MAX_OUTFITS), anchor_id
+
+
+def matches_response(index, item_id, mode, limit):
+    if item_id not in index.pos:
+        return 404, {"error": "Item not found"}
+
+    with metrics.span("index.score"):
+        matches = score_matches(index, item_id, mode, limit)
+
+    items = [{**item_json(row), "score": round(score, 4)} for row, score in matches]
+    return 200, {"item_id": item_id, "mode": mode, "items": items}
+
+
+def outfits_response(index, count, anchor_id):
+    if anchor_id is not None and anchor_id not in index.pos:
+        return 404, {"error": "Item not found"}
+
+    with metrics.span("outfits.generate"):
+        outfits = generate_outfits(index, count, anchor_id)
+
+    results = [
+        {
+            "score": round(score, 4),
+            "items": [{**item_json(row), "slot": slot} for slot, row in members]
+        }
+        for score, members in outfits
+    ]
+    return 200, {"item_id": anchor_id, "outfits": results}
+
+@metrics.instrument("SC_closetSearch")
+def lambda_handler(event, context):
+    try:
+        # Handle CORS preflight
+        if event["httpMethod"] == "OPTIONS":
+            return {
+                "statusCode": 200,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"message": "CORS preflight OK"})
+            }
+
+        path_params = event.get("pathParameters") or {}
+        user_id = ''.join(c for c in (path_params.get("userid") or "").strip() if c.isalnum())
+        item_id = (path_params.get("itemid") or "").strip()
+        # /closet/{userid}/outfits has no {itemid}
+        wants_outfits = (event.get("resource") or event.get("path") or "").rstrip("/").endswith("/outfits")
+
+        if not user_id or not (item_id or wants_outfits):
+            return {
+                "statusCode": 400,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Missing user_id or item_id in path"})
+            }
+
+        try:
+            params = parse_outfit_params(event) if wants_outfits else parse_params(event)
+        except BadRequest as e:
+            return {
+                "statusCode": 400,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": str(e)})
+            }
+
+        conn = clients.db()
+        index = load_closet_index(conn, user_id)
+
+        if wants_outfits:
+            status, body = outfits_response(index, *params)
+        else:
+            status, body = matches_response(index, item_id, *params)
+
+        return {
+            "statusCode": status,
+            "headers": CORS_HEADERS,
+            "body": json.dumps(body)
+        }
+
+    except Exception as e:
+        print("Error in SC_closetSearch:", str(e))
+        return {
+            "statusCode": 500,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"error": str(e)})
+        }
@@ -0,0 +1,130 @@
+#
+# item_stream.py
+#
+# Incremental parser for the detection model's structured output,
+#
+#   {"items": [{...}, {...}, ...]}
+#
+# fed in arbitrary text fragments as the response streams in.
+# Each element of the "items" array is returned as soon as its
+# closing brace arrives, so it can be stored before the model
+# has finished describing the rest of the outfit.
+#
+# Items may also carry a "bbox": [x_min, y_min, x_max, y_max] in
+# fractions of the image's width and height. A missing or unusable
+# box becomes None; the item itself is kept.
+#
+
+import json
+
+ITEM_FIELDS = ("clothing_type", "color", "material", "style", "extra_info")
+BBOX_FIELD = "bbox"
+
+# Boxes thinner than this (as a fraction of the image) are noise
+MIN_BBOX_SIDE = 0.02
+
+
+def clean_bbox(value):
+    """Returns the box as a tuple of four floats clamped to 0..1, or None."""
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        return None
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+        return None
+    x_min, y_min, x_max, y_max = (min(max(float(v), 0.0), 1.0) for v in value)
+    if x_max - x_min < MIN_BBOX_SIDE or y_max - y_min < MIN_BBOX_SIDE:
+        return None
+    return (x_min, y_min, x_max, y_max)
+
+
+def clean_item(obj):
+    """
+    Returns the item with its fields as stripped strings, or None if it
+    is not a usable clothing item.
+    """
+    if not isinstance(obj, dict):
+        return None
+    item = {}
+    for field in ITEM_FIELDS:
+        value = obj.get(field, "")
+        if value is None:
+            value = ""
+        if not isinstance(value, str):
+            return None
+        item[field] = value.strip()
+    if not item["clothing_type"]:
+        return None
+    item[BBOX_FIELD] = clean_bbox(obj.get(BBOX_FIELD))
+    return item
+
+
+class ItemStreamParser:
+    """
+    Feed text with feed(); each call returns the list of items completed by
+    that text. Tracks JSON nesting (ignoring brackets inside strings) and
+    slices out every object that sits directly inside the top-level array.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0            # next character of _buffer to scan
+        self._stack = []         # open "{" / "[" characters
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None  # index of the current item's "{"
+        self.num_items = 0
+
+    def feed(self, text):
+        self._buffer += text
+        items = []
+
+        while self._pos < len(self._buffer):
+            i = self._pos
+            ch = self._buffer[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._stack == ["{", "["]:
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._stack == ["{", "["] and self._item_start is not None:
+                    item = self._decode(self._buffer[self._item_start:i + 1])
+                    self._item_start = None
+                    if item:
+                        items.append(item)
+
+        # drop text that can no longer be part of an item
+        keep_from = self._item_start if self._item_start is not None else self._pos
+        if keep_from > 0:
+            self._buffer = self._buffer[keep_from:]
+            self._pos -= keep_from
+            if self._item_start is not None:
+                self._item_start = 0
+
+        self.num_items += len(items)
+        return items
+
+    def _decode(self, text):
+        try:
+            return clean_item(json.loads(text))
+        except ValueError:
+            print("item_stream: skipping malformed item:", text)
+            return None
+
+
+def parse_items(text):
+    """Parses a complete response in one go; returns the list of items."""
+    return ItemStreamParser().feed(text)
@@ -1,72 +1,102 @@
 import json
-import boto3
+import time
 import uuid
-import requests
-import configparser
-import datatier
+import threading
+from sc_runtime import clients, closet_version, config, datatier, metrics, model_client
+from sc_runtime.pipeline_event import InvalidPipelineEvent, parse_pipeline_event
+from sc_runtime.vocabulary import VOCABULARY_VERSION, normalize_item
+from item_stream import BBOX_FIELD, ITEM_FIELDS, ItemStreamParser, parse_items
 
-# === Load config ===
-CONFIG_FILE = "SC.ini"
-config = configparser.ConfigParser()
-config.read(CONFIG_FILE)
+# Config (SC.ini) and AWS/DB clients are loaded lazily through
+# sc_runtime on first use.
 
-try:
-    # S3
-    S3_BUCKET_NAME = config.get("s3", "bucket_name")
-    S3_REGION = config.get("s3", "region_name")
+# Started once a photo's items are stored, to draw each item's clipart
+CLIPART_CREATOR_FUNCTION = "SC_clipartCreator"
 
-    # RDS (MySQL)
-    DB_HOST = config.get("rds", "endpoint")
-    DB_PORT = config.getint("rds", "port_number")
-    DB_USER = config.get("rds", "user_name")
-    DB_PASSWORD = config.get("rds", "user_pwd")
-    DB_NAME = config.get("rds", "db_name")
+# Overridable with [openai] api_base in SC.ini (e.g. a local stand-in)
+OPENAI_API_BASE = "https://api.openai.com/v1"
 
-    # OpenAI
-    OPENAI_API_KEY = config.get("openai", "api_key")
+# Vision responses for a single photo take a few seconds; anything past
+# this is a stuck request
+OPENAI_READ_TIMEOUT_SECS = 60
 
-except (configparser.NoSectionError, configparser.NoOptionError) as e:
-    raise Exception(f"Missing configuration: {e}")
+# Batch (SQS) mode: photos processed concurrently within one invocation.
+# Model calls are further bounded by model_client's per-host limiter.
+BATCH_MAX_WORKERS = model_client.MAX_CONCURRENT_CALLS
 
-# === AWS Clients ===
-s3_client = boto3.client("s3", region_name=S3_REGION)
+# pymysql connections are not thread-safe; batch workers share the one
+# cached connection by taking turns
+_db_lock = threading.Lock()
 
 # === Utility Functions ===
 
 def generate_presigned_image_url(s3_key, expiration=300):
     """Generate a temporary public URL to the image in S3."""
     try:
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': S3_BUCKET_NAME, 'Key': s3_key},
-            ExpiresIn=expiration
-        )
+        with metrics.span("s3.presign"):
+            url = clients.s3().generate_presigned_url(
+                'get_object',
+                Params={'Bucket': config.s3_bucket(), 'Key': s3_key},
+                ExpiresIn=expiration
+            )
         return url
     except Exception as e:
         raise Exception(f"Failed to generate presigned URL: {str(e)}")
 
-def call_openai_with_image_url(image_url):
-    """Send image URL to GPT-4 Turbo (Vision) and return response."""
-    api_url = "https://api.openai.com/v1/chat/completions"
+# Structured output: the model must answer with exactly this shape, so
+# commas or odd punctuation inside a field can no longer lose an item
+DETECTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "clothing_detection",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            **{field: {"type": "string"} for field in ITEM_FIELDS},
+                            BBOX_FIELD: {"type": "array", "items": {"type": "number"}}
+                        },
+                        "required": list(ITEM_FIELDS) + [BBOX_FIELD],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["items"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def call_openai_with_image_url(image_url, on_items, deadline=None):
+    """
+    Send image URL to GPT-4o (Vision) with a JSON-schema response format and
+    stream the answer back. on_items(items) is called with each batch of
+    items as soon as they are complete. Returns the number of items found.
+    deadline bounds the rate-limit waits and retries (see
+    model_client.invocation_deadline).
+    """
+    api_url = f"{config.get('openai', 'api_base', fallback=OPENAI_API_BASE)}/chat/completions"
     headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Authorization": f"Bearer {config.get('openai', 'api_key')}",
         "Content-Type": "application/json"
     }
 
     prompt = (
         "Please analyze the following outfit image and return a list of identifiable clothing and accessory items. "
         "Only include items you are over 80% confident about. Exclude makeup, hairstyle, or background objects.\n\n"
-        "For each item, return exactly one line in the following format:\n"
-        "**Clothing Type, Color, Material, Style, Extra Info**\n\n"
-        "Respond with one line per item. Do not include bullet points, numbering, or any explanation.\n"
-        "Example response:\n"
-        "T-Shirt, Red, Cotton, Casual, Graphic print on front\n"
-        "Sunglasses, Black, Plastic, Aviator, Reflective lenses"
+        "For each item give its clothing_type, color, material, style, and any extra_info "
+        "(e.g. \"Graphic print on front\"; use an empty string if there is nothing to add), "
+        "and its bbox: the tightest box around the item as [x_min, y_min, x_max, y_max], "
+        "each a fraction from 0 to 1 of the image's width or height, measured from the top left."
     )
 
-
     payload = {
-        "model": "gpt-4-turbo",
+        "model": "gpt-4o",
         "messages": [
             {
                 "role": "user",
@@ -76,105 +106,243 @@ def call_openai_with_image_url(image_url):
                 ]
             }
         ],
-        "max_tokens": 800
+        "response_format": DETECTION_RESPONSE_FORMAT,
+        "max_tokens": 1000,   # boxes add ~25 tokens per item
+        "stream": True
     }
 
-    response = requests.post(api_url, headers=headers, json=payload)
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"].strip()
-    else:
-        raise Exception(f"OpenAI Vision API error: {response.text}")
+    # model.call covers the whole streamed answer, including the time
+    # on_items spends storing items; model.parse is just the parsing
+    parse_secs = 0.0
+    with metrics.span("model.call"):
+        response = model_client.post_json(api_url, payload, headers=headers,
+                                          read_timeout=OPENAI_READ_TIMEOUT_SECS, stream=True,
+                                          deadline=deadline)
+        with response:
+            if response.status_code != 200:
+                raise Exception(f"OpenAI Vision API error: {response.text}")
+
+            parser = ItemStreamParser()
+            for line in response.iter_lines(decode_unicode=True):
+                # server-sent events: "data: {chunk}" lines, ending with "data: [DONE]"
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+
+                parse_start = time.perf_counter()
+                choices = json.loads(data).get("choices") or []
+                text = choices[0].get("delta", {}).get("content") if choices else None
+                items = parser.feed(text) if text else None
+                parse_secs += time.perf_counter() - parse_start
+
+                if items:
+                    on_items(items)
+
+    metrics.record("model.parse", parse_secs * 1000)
+    return parser.num_items
 
 def parse_clothing_response(text):
-    """Parse OpenAI text into structured clothing items."""
-    lines = [line.strip() for line in text.strip().split("\n") if line.strip()]
-    clothing_items = []
-    for line in lines:
-        parts = [p.strip() for p in line.split(",")]
-        if len(parts) == 5:
-            clothing_items.append({
-                "clothing_type": parts[0],
-                "color": parts[1],
-                "material": parts[2],
-                "style": parts[3],
-                "extra_info": parts[4]
-            })
-    return clothing_items
+    """Parse a complete (non-streamed) structured OpenAI response into clothing items."""
+    return parse_items(text)
 
 def insert_clothing_items_to_db(image_id, user_id, clothing_items):
-    """Insert parsed clothing items into the DB."""
-    conn = datatier.get_dbConn(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+    """
+    Insert parsed clothing items into the DB as one multi-row INSERT, with
+    clothing_type, color and material canonicalized and the model's own
+    wording kept in the *_raw columns.
+    """
+    sql = """
+        INSERT INTO clothing_items (
+            id, original_image_id, user_id, clothing_type, color,
+            material, style, extra_info,
+            clothing_type_raw, color_raw, material_raw, attributes_version,
+            bbox_x_min, bbox_y_min, bbox_x_max, bbox_y_max, closet_stamp
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    rows = []
+    for item in map(normalize_item, clothing_items):
+        rows.append([
+            str(uuid.uuid4()),
+            image_id,
+            user_id,
+            item["clothing_type"],
+            item["color"],
+            item["material"],
+            item["style"],
+            item["extra_info"],
+            item["clothing_type_raw"],
+            item["color_raw"],
+            item["material_raw"],
+            VOCABULARY_VERSION,
+            *(item.get(BBOX_FIELD) or (None,) * 4),
+        ])
+    with _db_lock:
+        conn = clients.db()
+        with datatier.transaction(conn):
+            # Stamp the rows with the bumped closet_version (migration 0008).
+            # Read back inside the transaction, where the bump holds the row
+            # lock, so the stamp is a plain parameter and the rows still go
+            # out as one multi-row INSERT.
+            closet_version.bump(conn, user_id)
+            stamp = closet_version.get(conn, user_id)
+            datatier.perform_many(conn, sql, [row + [stamp] for row in rows])
+
+def delete_clothing_items_from_db(image_id, user_id):
+    """Remove any items already stored for this image."""
+    with _db_lock:
+        conn = clients.db()
+        with datatier.transaction(conn):
+            deleted = datatier.perform_action(conn, "DELETE FROM clothing_items WHERE original_image_id = %s", [image_id])
+            if deleted:
+                closet_version.bump(conn, user_id)
+
+# Migration 0011: set once a photo's items are stored and their clipart
+# started (or the photo turned out to have none), so a redelivered event
+# can tell the work is already done
+DETECTION_STATE_SQL = """
+    SELECT i.items_detected_at,
+           (SELECT COUNT(*) FROM clothing_items c WHERE c.original_image_id = i.id)
+    FROM images i
+    WHERE i.id = %s
+"""
+
+MARK_DETECTED_SQL = "UPDATE images SET items_detected_at = CURRENT_TIMESTAMP WHERE id = %s"
+
+def detected_item_count(image_id):
+    """The photo's item count if detection already finished for it, else None."""
+    with _db_lock:
+        row = datatier.retrieve_one_row(clients.db(), DETECTION_STATE_SQL, [image_id])
+    return row[1] if row and row[0] is not None else None
+
+def mark_detected(image_id):
+    with _db_lock:
+        conn = clients.db()
+        with datatier.transaction(conn):
+            datatier.perform_action(conn, MARK_DETECTED_SQL, [image_id])
+
+def start_clipart(pipeline_event):
+    """
+    SC_clipartCreator draws each stored item from its box in the photo, so
+    it starts only once detection has stored them all.
+    """
+    with metrics.span("lambda.invoke"):
+        clients.lambda_().invoke(
+            FunctionName=CLIPART_CREATOR_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps(pipeline_event)
+        )
+    print(f"Invoked SC_clipartCreator for {pipeline_event['image_id']}")
+
+def detect_clothing(pipeline_event, deadline=None):
+    """
+    Runs detection for one photo, stores its items and starts their
+    clipart; returns the item count, 0 for a photo with no clothing. Safe
+    to run again for the same photo: a photo already done is skipped, and
+    a partial attempt (e.g. one that timed out mid-stream) is discarded
+    and redone.
+    """
+    image_id = pipeline_event["image_id"]
+    user_id = pipeline_event["user_id"]
+    # downscaled, EXIF-normalized copy from SC_preprocessImage
+    model_s3_key = pipeline_event.get("model_s3_key") or pipeline_event["s3_key"]
+
+    done_count = detected_item_count(image_id)
+    if done_count is not None:
+        print(f"Image {image_id} already detected ({done_count} items), skipping redelivered event")
+        return done_count
+    delete_clothing_items_from_db(image_id, user_id)
+
+    # Step 1: Generate presigned URL to the model-sized image
+    image_url = generate_presigned_image_url(model_s3_key)
+
+    # Step 2: Stream the structured analysis from OpenAI, inserting each
+    # item into clothing_items as soon as it has been parsed
+    def store_items(items):
+        print("Detected:", ", ".join(item["clothing_type"] for item in items))
+        insert_clothing_items_to_db(image_id, user_id, items)
+
     try:
-        for item in clothing_items:
-            clothing_id = str(uuid.uuid4())
-
-            sql = """
-                INSERT INTO clothing_items (
-                    id, original_image_id, clothing_type, color,
-                    material, style, extra_info
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            datatier.perform_action(conn, sql, [
-                clothing_id,
-                image_id,
-                item["clothing_type"],
-                item["color"],
-                item["material"],
-                item["style"],
-                item["extra_info"],
-            ])
-    finally:
-        conn.close()
+        num_items = call_openai_with_image_url(image_url, store_items, deadline)
+        if num_items:
+            start_clipart(pipeline_event)
+        else:
+            # a final answer: asking the model again would pay for the
+            # same call and get the same answer
+            print("No valid clothing items found in AI response.")
+        # last, so a failure before it still gets the photo redone
+        mark_detected(image_id)
+    except Exception:
+        # Don't leave a partial outfit behind: the error propagates, and
+        # the retry (Lambda's async retry, or SQS redelivery) would store
+        # the items again
+        delete_clothing_items_from_db(image_id, user_id)
+        raise
 
-# === Lambda Entry Point ===
+    return num_items
 
-def lambda_handler(event, context):
+def process_sqs_record(record, deadline=None):
+    """Returns None on success, or the record's messageId if it should be retried."""
     try:
-        print("Lambda: SC_detectClothing triggered.")
+        detect_clothing(parse_pipeline_event({"body": record["body"]}), deadline)
+        return None
+    except Exception as e:
+        # invalid events fail too, so they end up in the dead-letter queue
+        print(f"ERROR (message {record.get('messageId')}):", str(e))
+        return record["messageId"]
 
-        body = json.loads(event.get("body", "{}")) if isinstance(event.get("body"), str) else event
-        s3_key = body.get("s3_key")
+def handle_sqs_batch(records, deadline=None):
+    """
+    Processes a batch of queued pipeline events concurrently, sharing the
+    warm DB connection and pooled HTTP session. Returns the partial-batch
+    response, so SQS redelivers only the messages that failed (requires
+    ReportBatchItemFailures on the event source mapping). Photos still
+    waiting on the model at the deadline fail, rather than the whole batch
+    timing out and being redelivered.
+    """
+    from concurrent.futures import ThreadPoolExecutor  # pulls in logging; batch mode only
 
-        if not s3_key:
-            return {"statusCode": 400, "body": json.dumps({"error": "Missing s3_key"})}
+    print(f"Lambda: SC_detectClothing batch of {len(records)} triggered.")
 
-        # Step 1: Generate presigned URL to the image
-        image_url = generate_presigned_image_url(s3_key)
+    with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(records))) as pool:
+        results = pool.map(lambda record: process_sqs_record(record, deadline), records)
+        failed_ids = [msg_id for msg_id in results if msg_id]
 
-        # Step 2: Send image URL to OpenAI for vision analysis
-        response_text = call_openai_with_image_url(image_url)
-        print("OpenAI Response:\n", response_text)
+    print(f"Batch done: {len(records) - len(failed_ids)} succeeded, {len(failed_ids)} failed")
+    return {"batchItemFailures": [{"itemIdentifier": msg_id} for msg_id in failed_ids]}
 
-        # Step 3: Parse the response into structured clothing item data
-        clothing_items = parse_clothing_response(response_text)
-        if not clothing_items:
-            raise Exception("No valid clothing items found in AI response.")
+def is_sqs_batch(event):
+    records = event.get("Records")
+    return bool(records) and all(r.get("eventSource") == "aws:sqs" for r in records)
 
-        # Step 4: Look up image + user ID from DB
-        conn = datatier.get_dbConn(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
-        image_row = datatier.retrieve_one_row(conn, "SELECT id, user_id FROM images WHERE s3_key = %s", [s3_key])
-        conn.close()
+# === Lambda Entry Point ===
 
-        if not image_row:
-            raise Exception("Image not found in DB.")
+@metrics.instrument("SC_detectClothing")
+def lambda_handler(event, context):
+    # model calls give up in time for the handler to clean up and report
+    deadline = model_client.invocation_deadline(context)
 
-        image_id, user_id = image_row
+    if is_sqs_batch(event):
+        return handle_sqs_batch(event["Records"], deadline)
 
-        # Step 5: Insert the clothing items into clothing_items table
-        insert_clothing_items_to_db(image_id, user_id, clothing_items)
+    print("Lambda: SC_detectClothing triggered.")
 
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "message": "Clothing detection completed successfully.",
-                "num_items_detected": len(clothing_items)
-            })
-        }
+    try:
+        pipeline_event = parse_pipeline_event(event)
+    except InvalidPipelineEvent as e:
+        # retrying a malformed event cannot help
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
 
-    except Exception as e:
-        print("ERROR:", str(e))
-        return {
-            "statusCode": 500,
-            "body": json.dumps({"error": str(e)})
-        }
+    # Anything else raises: SC_preprocessImage invokes this function
+    # asynchronously, and only a raised error makes Lambda retry it
+    num_items = detect_clothing(pipeline_event, deadline)
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": "Clothing detection completed successfully.",
+            "num_items_detected": num_items
+        })
+    }
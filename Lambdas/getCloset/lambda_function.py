@@ -1,36 +1,199 @@
 # lambda_function.py for SC_getCloset (with signed S3 URLs)
 import json
-import boto3
-import configparser
-from datatier import get_dbConn, retrieve_all_rows
+import time
+import base64
+import hashlib
+from sc_runtime import clients, closet_version, metrics
+from sc_runtime.closet_items import item_json
+from sc_runtime.datatier import retrieve_all_rows
+from sc_runtime.signed_urls import current_url_window_end
 
-# Load config
-CONFIG_FILE = "SC.ini"
-config = configparser.ConfigParser()
-config.read(CONFIG_FILE)
-
-# S3 config
-S3_BUCKET = config.get("s3", "bucket_name")
-S3_REGION = config.get("s3", "region_name")
-
-# RDS config
-DB_HOST = config.get("rds", "endpoint")
-DB_PORT = config.getint("rds", "port_number")
-DB_USER = config.get("rds", "user_name")
-DB_PASSWORD = config.get("rds", "user_pwd")
-DB_NAME = config.get("rds", "db_name")
-
-# AWS client
-s3_client = boto3.client("s3", region_name=S3_REGION)
+# Config (SC.ini) and AWS/DB clients are loaded lazily through
+# sc_runtime on first use, so CORS preflight touches neither.
 
 # Common CORS headers
 CORS_HEADERS = {
     "Content-Type": "application/json",
     "Access-Control-Allow-Origin": "*",
-    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Headers": "Content-Type,If-None-Match",
+    "Access-Control-Expose-Headers": "ETag",
     "Access-Control-Allow-Methods": "OPTIONS,GET"
 }
 
+# Pagination
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Faceted filtering: ?<attribute>=<value>, repeatable to match any of
+# several values. Each attribute is a clothing_items column with its own
+# (user_id, attribute, ...) index.
+FACET_ATTRIBUTES = ("clothing_type", "color", "material", "style")
+MAX_FILTER_VALUES = 20          # per attribute
+MAX_FILTER_VALUE_LENGTH = 255   # the column width
+
+
+def closet_etag(user_id, version, limit, after, filters):
+    """
+    ETag for one closet page. Besides the closet version it covers the page
+    parameters, the filters and the presigned URL window, since the image
+    URLs in the body change when the window rolls over.
+    """
+    window_end = int(current_url_window_end(time.time()))
+    raw = json.dumps([user_id, version, limit, after, filters, window_end], sort_keys=True)
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(event, etag):
+    headers = event.get("headers") or {}
+    for name, value in headers.items():
+        if name.lower() == "if-none-match" and value:
+            candidates = [v.strip() for v in value.split(",")]
+            return "*" in candidates or etag in candidates or "W/" + etag in candidates
+    return False
+
+
+class BadRequest(Exception):
+    pass
+
+
+def encode_cursor(original_image_id, clothing_id):
+    """Opaque cursor pointing just past the given (image, item) position."""
+    raw = json.dumps([original_image_id, clothing_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        original_image_id, clothing_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(original_image_id), str(clothing_id)
+    except Exception:
+        raise BadRequest("Invalid cursor")
+
+
+def parse_page_params(event):
+    params = event.get("queryStringParameters") or {}
+
+    limit = DEFAULT_PAGE_SIZE
+    if params.get("limit"):
+        try:
+            limit = int(params["limit"])
+        except ValueError:
+            raise BadRequest("limit must be an integer")
+        if limit < 1:
+            raise BadRequest("limit must be positive")
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    after = decode_cursor(params["cursor"]) if params.get("cursor") else None
+    return limit, after
+
+
+def parse_filters(event):
+    """
+    Returns {attribute: sorted values} for the facet attributes in the query
+    string. API Gateway puts repeated parameters (?color=Blue&color=Navy)
+    in multiValueQueryStringParameters.
+    """
+    single = event.get("queryStringParameters") or {}
+    multi = event.get("multiValueQueryStringParameters") or {}
+
+    filters = {}
+    for attr in FACET_ATTRIBUTES:
+        values = multi.get(attr) or ([single[attr]] if single.get(attr) else [])
+        values = sorted({v.strip() for v in values if v and v.strip()})
+        if not values:
+            continue
+        if len(values) > MAX_FILTER_VALUES:
+            raise BadRequest(f"at most {MAX_FILTER_VALUES} values allowed for {attr}")
+        if any(len(v) > MAX_FILTER_VALUE_LENGTH for v in values):
+            raise BadRequest(f"{attr} value too long")
+        filters[attr] = values
+    return filters
+
+
+def filter_sql(filters, exclude=None):
+    """AND clauses (and their parameters) for every filter except exclude."""
+    clauses = []
+    params = []
+    for attr, values in filters.items():
+        if attr == exclude:
+            continue
+        # attr comes from FACET_ATTRIBUTES, never from the request
+        clauses.append(f"AND c.{attr} IN ({', '.join(['%s'] * len(values))})")
+        params += values
+    return "\n          ".join(clauses), params
+
+
+def fetch_facet_counts(conn, user_id, filters):
+    """
+    Item counts per value of each facet attribute, most common first. Each
+    attribute is counted under all the *other* filters, so with color=Blue
+    selected the color facet still shows how many items every other color
+    would give. One round trip: a UNION ALL of one GROUP BY per attribute,
+    each of which MySQL answers from that attribute's index.
+    """
+    selects = []
+    params = []
+    for attr in FACET_ATTRIBUTES:
+        where, where_params = filter_sql(filters, exclude=attr)
+        selects.append(f"""
+        SELECT '{attr}', c.{attr}, COUNT(*)
+        FROM clothing_items c
+        WHERE c.user_id = %s AND c.{attr} IS NOT NULL AND c.{attr} <> ''
+          {where}
+        GROUP BY c.{attr}
+        """)
+        params += [user_id] + where_params
+
+    facets = {attr: [] for attr in FACET_ATTRIBUTES}
+    for attr, value, count in retrieve_all_rows(conn, "UNION ALL".join(selects), params):
+        facets[attr].append({"value": value, "count": count})
+    for values in facets.values():
+        values.sort(key=lambda f: (-f["count"], f["value"]))
+    return facets
+
+
+def fetch_closet_page(conn, user_id, limit, after, filters):
+    """
+    Keyset pagination over (original_image_id, id): items from the same
+    photo stay adjacent, and each page is an index range scan that costs
+    the same no matter how deep into the closet it starts. Unfiltered pages
+    walk the (user_id, original_image_id, id) index in order; a filtered
+    page walks the filtered attribute's (user_id, attribute,
+    original_image_id, id) index instead. One extra row is fetched to tell
+    whether another page exists.
+    """
+    where, params = filter_sql(filters)
+    # closet_items.JSON_COLUMNS, then the cursor's original_image_id
+    sql = f"""
+        SELECT c.id, c.clothing_type, c.color, c.material, c.style, c.extra_info, c.new_image_s3_key,
+               c.color_rgb, c.thumbnail_formats, c.clipart_width, c.original_image_id
+        FROM clothing_items c
+        WHERE c.user_id = %s
+          {where}
+    """
+    params = [user_id] + params
+    if after:
+        sql += """
+          AND (c.original_image_id > %s OR (c.original_image_id = %s AND c.id > %s))
+        """
+        params += [after[0], after[0], after[1]]
+    sql += """
+        ORDER BY c.original_image_id, c.id
+        LIMIT %s
+    """
+    params.append(limit + 1)
+
+    rows = retrieve_all_rows(conn, sql, params)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[10], last[0])
+    return rows, next_cursor
+
+@metrics.instrument("SC_getCloset")
 def lambda_handler(event, context):
     try:
         # Handle CORS preflight
@@ -51,56 +214,49 @@ def lambda_handler(event, context):
                 "body": json.dumps({"error": "Missing user_id in path"})
             }
 
-        conn = get_dbConn(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
         try:
-            sql = """
-                SELECT c.id, c.clothing_type, c.color, c.material, c.style, c.extra_info, c.new_image_s3_key
-                FROM clothing_items c
-                JOIN images i ON c.original_image_id = i.id
-                WHERE i.user_id = %s
-            """
-            items = retrieve_all_rows(conn, sql, [user_id])
-        finally:
-            conn.close()
+            limit, after = parse_page_params(event)
+            filters = parse_filters(event)
+        except BadRequest as e:
+            return {
+                "statusCode": 400,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": str(e)})
+            }
+
+        conn = clients.db()
+
+        # Conditional GET: if the client already has this version of the
+        # page, answer 304 without running the closet join
+        etag = closet_etag(user_id, closet_version.get(conn, user_id), limit, after, filters)
+        headers = {**CORS_HEADERS, "ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if etag_matches(event, etag):
+            return {
+                "statusCode": 304,
+                "headers": headers,
+                "body": ""
+            }
+
+        items, next_cursor = fetch_closet_page(conn, user_id, limit, after, filters)
+
+        # Facet counts come with the first page only; later pages of the
+        # same listing would repeat them
+        facets = fetch_facet_counts(conn, user_id, filters) if not after else None
 
         if not items:
             return {
                 "statusCode": 200,
-                "headers": CORS_HEADERS,
-                "body": json.dumps({"items": []})
+                "headers": headers,
+                "body": json.dumps({"items": [], "next_cursor": None, "facets": facets})
             }
 
-        results = []
-        for row in items:
-            print(row)
-            clothing_id, clothing_type, color, material, style, extra_info, s3_key = row
-
-            signed_url = None
-            if s3_key:
-                try:
-                    signed_url = s3_client.generate_presigned_url(
-                        "get_object",
-                        Params={"Bucket": S3_BUCKET, "Key": s3_key},
-                        ExpiresIn=3600  # 1 hour
-                    )
-                except Exception as e:
-                    print(f"Error generating signed URL (key: {s3_key}): {e}")
-
-            results.append({
-                "clothing_id": clothing_id,
-                "clothing_type": clothing_type,
-                "color": color,
-                "material": material,
-                "style": style,
-                "extra_info": extra_info,
-                "new_image_s3_key": s3_key,
-                "image_url": signed_url
-            })
+        results = [item_json(row) for row in items]
 
         return {
             "statusCode": 200,
-            "headers": CORS_HEADERS,
-            "body": json.dumps({"items": results})
+            "headers": headers,
+            "body": json.dumps({"items": results, "next_cursor": next_cursor, "facets": facets})
         }
 
     except Exception as e:
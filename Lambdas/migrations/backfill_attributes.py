@@ -0,0 +1,108 @@
+#
+# backfill_attributes.py
+#
+# Canonicalizes clothing_type, color and material on every
+# clothing_items row stored under an older vocabulary (see
+# sc_runtime/vocabulary.py), keeping the original text in the
+# *_raw columns. Run it after migration 0006, and again whenever
+# VOCABULARY_VERSION is bumped; rows already at the current
+# version are skipped, so it is safe to re-run or interrupt. A color
+# measured from the item's clipart (color_rgb set, migration 0007) is
+# kept: it is better than any reading of the model's text.
+#
+# Usage:
+#   python backfill_attributes.py              backfill all stale rows
+#   python backfill_attributes.py --dry-run    report what would change
+#
+
+import os
+import sys
+
+# the shared runtime layer, as laid out in the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared", "python"))
+
+from sc_runtime import closet_version, config, datatier
+from sc_runtime.vocabulary import NORMALIZED_FIELDS, VOCABULARY_VERSION, canonicalize
+
+BATCH_SIZE = 500
+
+SELECT_BATCH_SQL = """
+    SELECT id, user_id, color_rgb,
+           clothing_type, color, material,
+           clothing_type_raw, color_raw, material_raw
+    FROM clothing_items
+    WHERE id > %s AND attributes_version < %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+# Stamped with the owner's closet_version (bumped first in the same
+# transaction) so incremental readers pick the change up; see 0008
+UPDATE_ROW_SQL = f"""
+    UPDATE clothing_items
+    SET clothing_type = %s,
+        color = CASE WHEN color_rgb IS NOT NULL THEN color ELSE %s END,
+        material = %s,
+        clothing_type_raw = %s, color_raw = %s, material_raw = %s,
+        attributes_version = %s,
+        closet_stamp = {closet_version.OWNER_STAMP_SQL}
+    WHERE id = %s
+"""
+
+def backfill_row(row):
+    """Returns (update parameters, changed?) for one selected row."""
+    item_id, _, color_rgb, *values = row
+    current = values[:len(NORMALIZED_FIELDS)]
+    # rows from before 0006 have no raw copy yet: their value is the raw text
+    raws = [raw if raw is not None else (value or "")
+            for value, raw in zip(current, values[len(NORMALIZED_FIELDS):])]
+    canonical = [value if field == "color" and color_rgb is not None else canonicalize(field, raw)
+                 for field, value, raw in zip(NORMALIZED_FIELDS, current, raws)]
+    return canonical + raws + [VOCABULARY_VERSION, item_id], canonical != list(current)
+
+def backfill(conn, dry_run=False):
+    last_id = ""
+    scanned = changed = 0
+    touched_users = set()
+
+    while True:
+        rows = datatier.retrieve_all_rows(conn, SELECT_BATCH_SQL, [last_id, VOCABULARY_VERSION, BATCH_SIZE])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        updates = []
+        batch_users = set()
+        for row in rows:
+            params, row_changed = backfill_row(row)
+            updates.append(params)
+            if row_changed:
+                changed += 1
+                if row[1] is not None:
+                    batch_users.add(row[1])
+                if dry_run:
+                    print(f"  {row[0]}: {list(row[3:6])} -> {params[:3]}")
+        scanned += len(rows)
+        touched_users |= batch_users
+
+        if not dry_run:
+            with datatier.transaction(conn):
+                # closet pages changed, so their ETags must too
+                closet_version.bump_many(conn, batch_users)
+                datatier.perform_many(conn, UPDATE_ROW_SQL, updates)
+        print(f"{scanned} rows scanned, {changed} changed...")
+
+    verb = "would change" if dry_run else "changed"
+    print(f"Done: {scanned} rows scanned, {changed} {verb} for {len(touched_users)} user(s).")
+    return changed
+
+def main(argv):
+    conn = datatier.get_dbConn(*config.rds_settings())
+    try:
+        backfill(conn, dry_run="--dry-run" in argv)
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
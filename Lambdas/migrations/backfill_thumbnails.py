@@ -0,0 +1,110 @@
+#
+# backfill_thumbnails.py
+#
+# Writes the grid thumbnails (see sc_runtime/thumbnails.py) for
+# clipart drawn before migration 0010, and records them in
+# clothing_items.thumbnail_formats and clipart_width. Items sharing
+# one clipart object (photo-level clipart from before 0009) get it
+# rendered once. Rows that already have thumbnails are skipped, so
+# it is safe to re-run or interrupt. Needs Pillow, like
+# SC_clipartCreator.
+#
+# Usage:
+#   python backfill_thumbnails.py              backfill all items
+#   python backfill_thumbnails.py --dry-run    report what would change
+#
+
+import os
+import sys
+
+# the shared runtime layer, as laid out in the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared", "python"))
+
+from sc_runtime import clients, closet_version, config, datatier, thumbnails
+
+BATCH_SIZE = 500
+
+SELECT_BATCH_SQL = """
+    SELECT id, user_id, new_image_s3_key
+    FROM clothing_items
+    WHERE id > %s AND new_image_s3_key IS NOT NULL AND thumbnail_formats IS NULL
+    ORDER BY id
+    LIMIT %s
+"""
+
+# Stamped with the owner's closet_version (bumped first in the same
+# transaction) so incremental readers pick the change up; see 0008
+UPDATE_ROW_SQL = f"""
+    UPDATE clothing_items
+    SET thumbnail_formats = %s, clipart_width = %s,
+        closet_stamp = {closet_version.OWNER_STAMP_SQL}
+    WHERE id = %s
+"""
+
+def render_key(clipart_key):
+    """
+    Writes the thumbnails of one clipart object; returns (formats, clipart
+    width), or (None, None) if it could not be rendered.
+    """
+    try:
+        response = clients.s3().get_object(Bucket=config.s3_bucket(), Key=clipart_key)
+        return thumbnails.write_thumbnails(clipart_key, response["Body"].read())
+    except Exception as e:
+        print(f"  {clipart_key}: {e}")
+        return None, None
+
+def backfill(conn, dry_run=False):
+    last_id = ""
+    scanned = written = 0
+    touched_users = set()
+
+    while True:
+        rows = datatier.retrieve_all_rows(conn, SELECT_BATCH_SQL, [last_id, BATCH_SIZE])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        scanned += len(rows)
+
+        if dry_run:
+            for item_id, _, clipart_key in rows:
+                print(f"  {item_id}: {clipart_key}")
+            continue
+
+        thumbnails_by_key = {}
+        for _, _, clipart_key in rows:
+            if clipart_key not in thumbnails_by_key:
+                thumbnails_by_key[clipart_key] = render_key(clipart_key)
+
+        updates = []
+        batch_users = set()
+        for item_id, user_id, clipart_key in rows:
+            formats, clipart_width = thumbnails_by_key[clipart_key]
+            if formats:
+                updates.append([formats, clipart_width, item_id])
+                if user_id is not None:
+                    batch_users.add(user_id)
+        written += len(updates)
+        touched_users |= batch_users
+
+        with datatier.transaction(conn):
+            # closet pages changed, so their ETags must too
+            closet_version.bump_many(conn, batch_users)
+            datatier.perform_many(conn, UPDATE_ROW_SQL, updates)
+        print(f"{scanned} rows scanned, {written} given thumbnails...")
+
+    if dry_run:
+        print(f"Done: {scanned} rows would get thumbnails.")
+    else:
+        print(f"Done: {scanned} rows scanned, {written} given thumbnails for {len(touched_users)} user(s).")
+    return written
+
+def main(argv):
+    conn = datatier.get_dbConn(*config.rds_settings())
+    try:
+        backfill(conn, dry_run="--dry-run" in argv)
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,213 @@
+#
+# explain_check.py
+#
+# Runs EXPLAIN on every query the Lambdas issue against the
+# database configured in SC.ini and exits non-zero if any of
+# them scans a whole table or a whole index. Run it after
+# migrate.py, and add new queries to HOT_QUERIES when a Lambda
+# starts issuing them.
+#
+# Usage:
+#   python explain_check.py
+#
+
+import os
+import sys
+
+# the shared runtime layer, as laid out in the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared", "python"))
+
+import importlib.util
+
+import pymysql
+from sc_runtime import closet_version, config, datatier
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def load_lambda(name):
+    """Imports <name>/lambda_function.py, for the SQL constants it defines."""
+    directory = os.path.join(LAMBDAS_DIR, name)
+    sys.path.insert(0, directory)  # for modules next to it, e.g. item_stream
+    try:
+        spec = importlib.util.spec_from_file_location(f"{name}_lambda_function",
+                                                      os.path.join(directory, "lambda_function.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        sys.path.remove(directory)
+
+upload = load_lambda("upload")
+detect_clothing = load_lambda("detectClothing")
+clipart_creator = load_lambda("clipartCreator")
+get_closet = load_lambda("getCloset")
+closet_search = load_lambda("closetSearch")
+
+USER_ID = "exampleuser"
+IMAGE_ID = "00000000-0000-0000-0000-000000000000"
+ITEM_ID = "00000000-0000-0000-0000-000000000001"
+S3_KEY = "uploads/exampleuser/00000000-0000-0000-0000-000000000000.jpg"
+CONTENT_HASH = "0" * 64
+
+# (Lambda, description, sql, sample parameters). SQL a Lambda defines as
+# a module constant is imported from it, so the check runs exactly what
+# the Lambda does; SQL built inline in a function is copied here and
+# must be kept in sync. Plain INSERT ... VALUES statements read nothing
+# and are left out.
+HOT_QUERIES = [
+    ("upload", "user exists check",
+     "SELECT id FROM users WHERE id = %s", [USER_ID]),
+    ("upload", "register image (idempotent)",
+     "INSERT IGNORE INTO images (id, user_id, s3_key) VALUES (%s, %s, %s)", [IMAGE_ID, USER_ID, S3_KEY]),
+    ("upload", "image processing state",
+     upload.PROCESSING_STATE_SQL, [IMAGE_ID]),
+    ("upload/preprocessImage/detectClothing/clipartCreator", "bump closet version",
+     closet_version.BUMP_SQL, [USER_ID]),
+    ("preprocessImage", "store content hash",
+     "UPDATE images SET content_hash = %s WHERE id = %s", [CONTENT_HASH, IMAGE_ID]),
+    ("preprocessImage", "find processed duplicate",
+     """
+     SELECT i.id
+     FROM images i
+     WHERE i.user_id = %s AND i.content_hash = %s AND i.id <> %s
+       AND EXISTS (SELECT 1 FROM clothing_items c WHERE c.original_image_id = i.id)
+       AND NOT EXISTS (SELECT 1 FROM clothing_items c
+                       WHERE c.original_image_id = i.id AND c.new_image_s3_key IS NULL)
+     LIMIT 1
+     """, [USER_ID, CONTENT_HASH, IMAGE_ID]),
+    ("preprocessImage", "already cloned check",
+     "SELECT 1 FROM clothing_items WHERE original_image_id = %s LIMIT 1", [IMAGE_ID]),
+    ("preprocessImage", "duplicate's items",
+     "SELECT id, new_image_s3_key, thumbnail_formats, clipart_width FROM clothing_items WHERE original_image_id = %s",
+     [IMAGE_ID]),
+    ("preprocessImage", "clone duplicate's item",
+     f"""
+     INSERT INTO clothing_items (
+         id, original_image_id, user_id, clothing_type, color,
+         material, style, extra_info, new_image_s3_key, thumbnail_formats, clipart_width,
+         clothing_type_raw, color_raw, material_raw, attributes_version,
+         color_rgb, color_lab_l, color_lab_a, color_lab_b, color_swatches,
+         bbox_x_min, bbox_y_min, bbox_x_max, bbox_y_max, closet_stamp
+     )
+     SELECT %s, %s, %s, clothing_type, color, material, style, extra_info, %s, thumbnail_formats, clipart_width,
+            clothing_type_raw, color_raw, material_raw, attributes_version,
+            color_rgb, color_lab_l, color_lab_a, color_lab_b, color_swatches,
+            bbox_x_min, bbox_y_min, bbox_x_max, bbox_y_max, {closet_version.STAMP_SQL}
+     FROM clothing_items
+     WHERE id = %s
+     """, [ITEM_ID, IMAGE_ID, USER_ID, S3_KEY, USER_ID, ITEM_ID]),
+    ("detectClothing", "detection state",
+     detect_clothing.DETECTION_STATE_SQL, [IMAGE_ID]),
+    ("detectClothing", "mark detected",
+     detect_clothing.MARK_DETECTED_SQL, [IMAGE_ID]),
+    ("detectClothing", "discard partial detection",
+     "DELETE FROM clothing_items WHERE original_image_id = %s", [IMAGE_ID]),
+    ("clipartCreator", "items without clipart",
+     clipart_creator.PENDING_ITEMS_SQL, [IMAGE_ID]),
+    ("clipartCreator", "set item clipart key",
+     clipart_creator.UPDATE_ITEM_CLIPART_SQL, [S3_KEY, "avif,webp", 1024, USER_ID, ITEM_ID]),
+    ("clipartCreator", "set item color",
+     clipart_creator.UPDATE_ITEM_COLOR_SQL, ["Navy", "#1e285a", 18.1, 13.6, -31.5, "[]", ITEM_ID]),
+    ("getCloset/closetSearch/detectClothing", "closet version",
+     closet_version.GET_SQL, [USER_ID]),
+    ("getCloset", "closet page (first)",
+     """
+     SELECT c.id, c.clothing_type, c.color, c.material, c.style, c.extra_info, c.new_image_s3_key,
+            c.color_rgb, c.thumbnail_formats, c.clipart_width, c.original_image_id
+     FROM clothing_items c
+     WHERE c.user_id = %s
+     ORDER BY c.original_image_id, c.id
+     LIMIT %s
+     """, [USER_ID, 101]),
+    ("getCloset", "closet page (after cursor)",
+     """
+     SELECT c.id, c.clothing_type, c.color, c.material, c.style, c.extra_info, c.new_image_s3_key,
+            c.color_rgb, c.thumbnail_formats, c.clipart_width, c.original_image_id
+     FROM clothing_items c
+     WHERE c.user_id = %s
+       AND (c.original_image_id > %s OR (c.original_image_id = %s AND c.id > %s))
+     ORDER BY c.original_image_id, c.id
+     LIMIT %s
+     """, [USER_ID, IMAGE_ID, IMAGE_ID, ITEM_ID, 101]),
+    ("getCloset", "closet page (filtered)",
+     """
+     SELECT c.id, c.clothing_type, c.color, c.material, c.style, c.extra_info, c.new_image_s3_key,
+            c.color_rgb, c.thumbnail_formats, c.clipart_width, c.original_image_id
+     FROM clothing_items c
+     WHERE c.user_id = %s
+       AND c.color IN (%s, %s)
+     ORDER BY c.original_image_id, c.id
+     LIMIT %s
+     """, [USER_ID, "Blue", "Navy", 101]),
+    ("getCloset", "facet counts",
+     " UNION ALL ".join(f"""
+     SELECT '{attr}', c.{attr}, COUNT(*)
+     FROM clothing_items c
+     WHERE c.user_id = %s AND c.{attr} IS NOT NULL AND c.{attr} <> ''
+     GROUP BY c.{attr}
+     """ for attr in get_closet.FACET_ATTRIBUTES), [USER_ID] * len(get_closet.FACET_ATTRIBUTES)),
+    ("closetSearch", "closet index (full)",
+     closet_search.ITEM_COLUMNS + "WHERE user_id = %s", [USER_ID]),
+    ("closetSearch", "closet index (changed since version)",
+     closet_search.ITEM_COLUMNS + "WHERE user_id = %s AND closet_stamp > %s", [USER_ID, 0]),
+    ("closetSearch", "closet item count",
+     "SELECT COUNT(*) FROM clothing_items WHERE user_id = %s", [USER_ID]),
+]
+
+FULL_SCAN_TYPES = ("ALL", "index")
+
+def explain(conn, sql, parameters):
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("EXPLAIN " + sql, parameters)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def check_query(conn, sql, parameters):
+    """
+    Returns the errors for one query: one per full table or index scan
+    in its plan. A scan fails even when the optimizer lists usable keys
+    (on a small table it may prefer scanning anyway); the keys are
+    reported to help tell the two cases apart.
+    """
+    errors = []
+    for row in explain(conn, sql, parameters):
+        if row.get("select_type") in ("INSERT", "REPLACE"):
+            continue  # the write target of INSERT ... SELECT
+        if row.get("type") not in FULL_SCAN_TYPES:
+            continue
+        msg = f"full {'table' if row['type'] == 'ALL' else 'index'} scan on {row.get('table')}"
+        if row.get("possible_keys"):
+            errors.append(f"{msg} (usable keys: {row['possible_keys']})")
+        else:
+            errors.append(msg + " (no usable index)")
+    return errors
+
+def main():
+    conn = datatier.get_dbConn(*config.rds_settings())
+    failed = 0
+    try:
+        for lambda_name, description, sql, parameters in HOT_QUERIES:
+            # EXPLAIN of a write does not modify anything, but be safe
+            conn.begin()
+            try:
+                errors = check_query(conn, sql, parameters)
+            finally:
+                conn.rollback()
+
+            print(f"[{'FAIL' if errors else 'ok'}] {lambda_name}: {description}")
+            for msg in errors:
+                print(f"       {msg}")
+            failed += bool(errors)
+    finally:
+        conn.close()
+
+    if failed:
+        print(f"{failed} query(ies) need an index.")
+        return 1
+    print("All queries use indexes.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#
+# migrate.py
+#
+# Applies the versioned schema migrations in versions/ to the
+# database configured in SC.ini. Each file is named
+# NNNN_description.sql and is applied at most once, in order;
+# applied versions are recorded in the schema_migrations table.
+#
+# Usage:
+#   python migrate.py            apply pending migrations
+#   python migrate.py --status   list applied / pending migrations
+#
+
+import os
+import re
+import sys
+
+# the shared runtime layer, as laid out in the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared", "python"))
+
+from sc_runtime import config, datatier
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "versions")
+MIGRATION_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+def list_migrations():
+    """Returns [(version, name, path)] for every migration file, in version order."""
+    migrations = []
+    for filename in os.listdir(VERSIONS_DIR):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(VERSIONS_DIR, filename)))
+    migrations.sort()
+
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise Exception("Duplicate migration version numbers in versions/")
+    return migrations
+
+def split_statements(sql_text):
+    """Splits a migration file into statements; strips -- comments."""
+    lines = [line for line in sql_text.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+def ensure_migrations_table(conn):
+    datatier.perform_action(conn, """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (version)
+        )
+    """)
+
+def applied_versions(conn):
+    rows = datatier.retrieve_all_rows(conn, "SELECT version FROM schema_migrations")
+    return {row[0] for row in rows}
+
+def apply_migration(conn, version, name, path):
+    # MySQL commits DDL implicitly, so a migration cannot be rolled back
+    # as a unit; keep each file to statements that are safe to re-run or
+    # that fail before changing anything.
+    with open(path) as f:
+        statements = split_statements(f.read())
+
+    for stmt in statements:
+        datatier.perform_action(conn, stmt)
+
+    datatier.perform_action(conn,
+        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", [version, name])
+
+def migrate(conn):
+    ensure_migrations_table(conn)
+    done = applied_versions(conn)
+
+    pending = [m for m in list_migrations() if m[0] not in done]
+    if not pending:
+        print("Schema is up to date.")
+        return 0
+
+    for version, name, path in pending:
+        print(f"Applying {version:04d}_{name}...")
+        apply_migration(conn, version, name, path)
+
+    print(f"Applied {len(pending)} migration(s).")
+    return len(pending)
+
+def print_status(conn):
+    ensure_migrations_table(conn)
+    done = applied_versions(conn)
+    for version, name, _ in list_migrations():
+        state = "applied" if version in done else "pending"
+        print(f"{version:04d}_{name}: {state}")
+
+def main(argv):
+    conn = datatier.get_dbConn(*config.rds_settings())
+    try:
+        if "--status" in argv:
+            print_status(conn)
+        else:
+            migrate(conn)
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
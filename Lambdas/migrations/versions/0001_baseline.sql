@@ -0,0 +1,26 @@
+-- Tables as originally created by hand. IF NOT EXISTS so that running
+-- this against the existing production database is a no-op.
+
+CREATE TABLE IF NOT EXISTS users (
+    id VARCHAR(64) NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS images (
+    id CHAR(36) NOT NULL,
+    user_id VARCHAR(64) NOT NULL,
+    s3_key VARCHAR(512) NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS clothing_items (
+    id CHAR(36) NOT NULL,
+    original_image_id CHAR(36) NOT NULL,
+    clothing_type VARCHAR(255),
+    color VARCHAR(255),
+    material VARCHAR(255),
+    style VARCHAR(255),
+    extra_info TEXT,
+    new_image_s3_key VARCHAR(512),
+    PRIMARY KEY (id)
+);
@@ -0,0 +1,5 @@
+-- Per-user counter behind SC_getCloset's ETag; bumped by every write
+-- that changes what the closet returns.
+
+ALTER TABLE users
+    ADD COLUMN closet_version INT NOT NULL DEFAULT 0;
@@ -0,0 +1,5 @@
+-- SHA-256 of the uploaded bytes, used by SC_preprocessImage to spot
+-- re-uploads of an already processed photo.
+
+ALTER TABLE images
+    ADD COLUMN content_hash CHAR(64) NULL;
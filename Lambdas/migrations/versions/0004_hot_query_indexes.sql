@@ -0,0 +1,17 @@
+-- Indexes for the queries the pipeline runs on every request.
+--
+-- images (user_id, id): closet listing drives the join from this index,
+--   reading the user's image ids in order (InnoDB secondary indexes end
+--   with the primary key, so the listing's ORDER BY i.id needs no sort).
+-- images (user_id, content_hash): duplicate-upload lookup.
+-- images (s3_key): one row per object; also serves lookups by key.
+-- clothing_items (original_image_id, id): the join / keyset seek into a
+--   photo's items, and clipart updates by original_image_id.
+
+CREATE INDEX idx_images_user_id ON images (user_id, id);
+
+CREATE INDEX idx_images_user_content_hash ON images (user_id, content_hash);
+
+CREATE UNIQUE INDEX uq_images_s3_key ON images (s3_key);
+
+CREATE INDEX idx_clothing_items_original_image ON clothing_items (original_image_id, id);
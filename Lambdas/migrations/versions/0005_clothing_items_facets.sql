@@ -0,0 +1,31 @@
+-- Faceted filtering in SC_getCloset.
+--
+-- clothing_items gets its owner's user_id (copied from images), so the
+-- closet page and the facet counts no longer need the join to images:
+--
+-- (user_id, original_image_id, id): unfiltered closet page, walked in
+--   keyset order.
+-- (user_id, <attribute>, original_image_id, id), one per facet: a
+--   filtered page is an equality range on (user_id, attribute) read in
+--   keyset order, and the facet counts GROUP BY <attribute> straight
+--   off the index without touching the rows.
+--
+-- The closet page used to be driven by idx_images_user_id; that index
+-- still serves the other images lookups.
+
+ALTER TABLE clothing_items
+    ADD COLUMN user_id VARCHAR(64) NULL;
+
+UPDATE clothing_items
+SET user_id = (SELECT i.user_id FROM images i WHERE i.id = clothing_items.original_image_id)
+WHERE user_id IS NULL;
+
+CREATE INDEX idx_clothing_items_user ON clothing_items (user_id, original_image_id, id);
+
+CREATE INDEX idx_clothing_items_user_type ON clothing_items (user_id, clothing_type, original_image_id, id);
+
+CREATE INDEX idx_clothing_items_user_color ON clothing_items (user_id, color, original_image_id, id);
+
+CREATE INDEX idx_clothing_items_user_material ON clothing_items (user_id, material, original_image_id, id);
+
+CREATE INDEX idx_clothing_items_user_style ON clothing_items (user_id, style, original_image_id, id);
@@ -0,0 +1,20 @@
+-- Canonical attribute values (see sc_runtime/vocabulary.py).
+--
+-- clothing_type, color and material now hold canonical values, so the
+-- facet indexes from 0005 serve exact-match filters and GROUP BYs. The
+-- model's original text is kept in the *_raw columns, and
+-- attributes_version records which vocabulary produced the canonical
+-- values. Existing rows start at version 0; run backfill_attributes.py
+-- after this migration to canonicalize them.
+
+ALTER TABLE clothing_items
+    ADD COLUMN clothing_type_raw VARCHAR(255) NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN color_raw VARCHAR(255) NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN material_raw VARCHAR(255) NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN attributes_version SMALLINT NOT NULL DEFAULT 0;
@@ -0,0 +1,22 @@
+-- Pixel-measured colors (see sc_runtime/color_analysis.py), written by
+-- SC_clipartCreator.
+--
+-- color_rgb / color_lab_*: the item's dominant swatch; Lab is
+--   perceptually uniform, so color-range and similarity queries can use
+--   plain distances on it.
+-- color_swatches: JSON list of all the swatches found, heaviest first.
+
+ALTER TABLE clothing_items
+    ADD COLUMN color_rgb CHAR(7) NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN color_lab_l FLOAT NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN color_lab_a FLOAT NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN color_lab_b FLOAT NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN color_swatches TEXT NULL;
@@ -0,0 +1,14 @@
+-- closet_stamp: the owner's users.closet_version as of the write that
+-- last inserted or changed the row. Writers bump closet_version first
+-- and stamp rows with the bumped value in the same transaction, so
+-- "rows changed since version V" is an index range scan:
+--
+--   WHERE user_id = %s AND closet_stamp > V
+--
+-- SC_closetSearch uses it to refresh its cached per-user feature
+-- matrix incrementally instead of re-reading the whole closet.
+
+ALTER TABLE clothing_items
+    ADD COLUMN closet_stamp INT NOT NULL DEFAULT 0;
+
+CREATE INDEX idx_clothing_items_user_stamp ON clothing_items (user_id, closet_stamp);
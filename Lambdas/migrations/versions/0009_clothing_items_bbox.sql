@@ -0,0 +1,18 @@
+-- Where each item is in its photo, as returned by SC_detectClothing:
+-- a bounding box in fractions (0..1) of the model-sized image's width
+-- and height. SC_clipartCreator crops each item out of the photo with
+-- it, so every item gets its own clipart in new_image_s3_key. NULL for
+-- items detected before this migration, or when the model gave no
+-- usable box; those items are drawn from the whole photo.
+
+ALTER TABLE clothing_items
+    ADD COLUMN bbox_x_min FLOAT NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN bbox_y_min FLOAT NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN bbox_x_max FLOAT NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN bbox_y_max FLOAT NULL;
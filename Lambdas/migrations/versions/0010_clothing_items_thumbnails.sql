@@ -0,0 +1,13 @@
+-- thumbnail_formats: the formats SC_clipartCreator wrote small copies
+-- of the item's clipart in, best first ("avif,webp"), under keys
+-- derived from new_image_s3_key (see sc_runtime/thumbnails.py).
+-- clipart_width: the clipart's width in pixels, which fixes the widths
+-- those copies were written at (never wider than the clipart).
+-- Both NULL when there are none (clipart drawn before this migration,
+-- or rendering failed); readers then link the full-size PNG only.
+
+ALTER TABLE clothing_items
+    ADD COLUMN thumbnail_formats VARCHAR(32) NULL;
+
+ALTER TABLE clothing_items
+    ADD COLUMN clipart_width INT NULL;
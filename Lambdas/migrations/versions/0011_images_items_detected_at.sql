@@ -0,0 +1,8 @@
+-- items_detected_at: when SC_detectClothing finished storing the
+-- photo's items and started their clipart. SQS (and Lambda's async
+-- retry) deliver at least once; a redelivered event for a photo that
+-- has it set is skipped instead of detecting and storing the items a
+-- second time.
+
+ALTER TABLE images
+    ADD COLUMN items_detected_at DATETIME NULL;
@@ -0,0 +1,218 @@
+import io
+import json
+import uuid
+import hashlib
+from sc_runtime import clients, closet_version, config, datatier, metrics, thumbnails
+from sc_runtime.pipeline_event import InvalidPipelineEvent, make_pipeline_event, parse_pipeline_event
+
+# Config (SC.ini) and AWS/DB clients are loaded lazily through
+# sc_runtime on first use. Pillow is imported only when an image
+# actually has to be resized (not for duplicate uploads).
+
+# Lambda function names. SC_detectClothing starts SC_clipartCreator once
+# the photo's items (and their boxes) are stored.
+DETECT_CLOTHING_FUNCTION = "SC_detectClothing"
+
+# Model input derivative. Both vision models downsample large inputs
+# internally (OpenAI tiles at 768px on the short side, Gemini at 768px),
+# so anything past ~1024px on the long side is paid for and thrown away.
+MODEL_MAX_DIMENSION = 1024
+MODEL_JPEG_QUALITY = 85
+MODEL_IMAGE_PREFIX = "model_inputs/"
+
+# === Utility Functions ===
+
+def detect_queue_url():
+    """
+    SQS (optional): when [sqs] detect_queue_url is set, detection requests
+    are queued for SC_detectClothing's batch consumer instead of invoked
+    one by one.
+    """
+    return config.get("sqs", "detect_queue_url", fallback=None)
+
+def model_image_key(s3_key):
+    """uploads/<user>/<image>.<ext> -> model_inputs/<user>/<image>.jpg"""
+    stem = s3_key.split("/", 1)[-1].rsplit(".", 1)[0]
+    return f"{MODEL_IMAGE_PREFIX}{stem}.jpg"
+
+@metrics.timed("image.normalize")
+def normalize_for_models(image_bytes):
+    """
+    Returns JPEG bytes of the photo rotated upright per its EXIF orientation,
+    with all metadata stripped and the long side capped at MODEL_MAX_DIMENSION.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft("RGB", (MODEL_MAX_DIMENSION, MODEL_MAX_DIMENSION))  # cheap JPEG DCT downscale
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGB")
+        img.thumbnail((MODEL_MAX_DIMENSION, MODEL_MAX_DIMENSION), Image.LANCZOS)
+
+        out = io.BytesIO()
+        # no exif= argument, so none of the original metadata is written
+        img.save(out, format="JPEG", quality=MODEL_JPEG_QUALITY, optimize=True)
+        return out.getvalue()
+
+@metrics.timed("s3.get")
+def download_original(s3_key):
+    response = clients.s3().get_object(Bucket=config.s3_bucket(), Key=s3_key)
+    return response["Body"].read()
+
+@metrics.timed("image.hash")
+def content_hash(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def find_processed_duplicate(conn, user_id, image_id, digest):
+    """
+    Returns the id of an earlier upload by the same user with identical
+    bytes whose detection and clipart have both finished (it has items,
+    and every item has its clipart), or None.
+    """
+    sql = """
+        SELECT i.id
+        FROM images i
+        WHERE i.user_id = %s AND i.content_hash = %s AND i.id <> %s
+          AND EXISTS (SELECT 1 FROM clothing_items c WHERE c.original_image_id = i.id)
+          AND NOT EXISTS (SELECT 1 FROM clothing_items c
+                          WHERE c.original_image_id = i.id AND c.new_image_s3_key IS NULL)
+        LIMIT 1
+    """
+    row = datatier.retrieve_one_row(conn, sql, [user_id, digest, image_id])
+    return row[0] if row else None
+
+def clone_duplicate(user_id, image_id, digest):
+    """
+    Records the upload's content hash and, if the same photo was already
+    processed, copies its clothing items and their clipart to this image
+    instead of calling the models again. Returns True if the upload was
+    cloned.
+    """
+    conn = clients.db()
+
+    datatier.perform_action(conn, "UPDATE images SET content_hash = %s WHERE id = %s", [digest, image_id])
+
+    source_id = find_processed_duplicate(conn, user_id, image_id, digest)
+    if not source_id:
+        return False
+    # a retried or redelivered event: the items were cloned already
+    if datatier.retrieve_one_row(conn, "SELECT 1 FROM clothing_items WHERE original_image_id = %s LIMIT 1", [image_id]):
+        print(f"Duplicate of image {source_id}: items already cloned")
+        return True
+    source_items = datatier.retrieve_all_rows(conn,
+        "SELECT id, new_image_s3_key, thumbnail_formats, clipart_width FROM clothing_items WHERE original_image_id = %s",
+        [source_id])
+
+    # Server-side copies so each item keeps its own clipart object, and
+    # its thumbnails keep the keys derived from it
+    clones = []
+    for source_item_id, source_clipart_key, thumbnail_formats, clipart_width in source_items:
+        item_id = str(uuid.uuid4())
+        clipart_key = f"{user_id}/closet_items/{item_id}.png"
+        copies = [(clipart_key, source_clipart_key)] + list(zip(
+            thumbnails.thumbnail_keys(clipart_key, thumbnail_formats, clipart_width),
+            thumbnails.thumbnail_keys(source_clipart_key, thumbnail_formats, clipart_width)))
+        for key, source_key in copies:
+            with metrics.span("s3.copy"):
+                clients.s3().copy_object(
+                    Bucket=config.s3_bucket(),
+                    Key=key,
+                    CopySource={"Bucket": config.s3_bucket(), "Key": source_key}
+                )
+        clones.append([item_id, image_id, user_id, clipart_key, user_id, source_item_id])
+
+    sql = f"""
+        INSERT INTO clothing_items (
+            id, original_image_id, user_id, clothing_type, color,
+            material, style, extra_info, new_image_s3_key, thumbnail_formats, clipart_width,
+            clothing_type_raw, color_raw, material_raw, attributes_version,
+            color_rgb, color_lab_l, color_lab_a, color_lab_b, color_swatches,
+            bbox_x_min, bbox_y_min, bbox_x_max, bbox_y_max, closet_stamp
+        )
+        SELECT %s, %s, %s, clothing_type, color, material, style, extra_info, %s, thumbnail_formats, clipart_width,
+               clothing_type_raw, color_raw, material_raw, attributes_version,
+               color_rgb, color_lab_l, color_lab_a, color_lab_b, color_swatches,
+               bbox_x_min, bbox_y_min, bbox_x_max, bbox_y_max, {closet_version.STAMP_SQL}
+        FROM clothing_items
+        WHERE id = %s
+    """
+    with datatier.transaction(conn):
+        closet_version.bump(conn, user_id)
+        datatier.perform_many(conn, sql, clones)
+
+    print(f"Duplicate of image {source_id}: cloned {len(clones)} items, skipping model calls")
+    return True
+
+def preprocess_image(s3_key, original_bytes):
+    normalized_bytes = normalize_for_models(original_bytes)
+    print(f"Normalized {s3_key}: {len(original_bytes)} -> {len(normalized_bytes)} bytes")
+
+    new_key = model_image_key(s3_key)
+    with metrics.span("s3.put"):
+        clients.s3().put_object(
+            Bucket=config.s3_bucket(),
+            Key=new_key,
+            Body=normalized_bytes,
+            ContentType="image/jpeg"
+        )
+    return new_key
+
+def start_processing(pipeline_event):
+    payload = json.dumps(pipeline_event)
+    s3_key = pipeline_event["s3_key"]
+
+    # Trigger SC_detectClothing Lambda (batched through SQS if configured)
+    if detect_queue_url():
+        with metrics.span("sqs.send"):
+            clients.sqs().send_message(QueueUrl=detect_queue_url(), MessageBody=payload)
+        print(f"Queued SC_detectClothing for {s3_key}")
+    else:
+        with metrics.span("lambda.invoke"):
+            clients.lambda_().invoke(
+                FunctionName=DETECT_CLOTHING_FUNCTION,
+                InvocationType="Event",
+                Payload=payload
+            )
+        print(f"Invoked SC_detectClothing for {s3_key}")
+
+# === Lambda Entry Point ===
+
+@metrics.instrument("SC_preprocessImage")
+def lambda_handler(event, context):
+    print("Lambda: SC_preprocessImage triggered.")
+
+    try:
+        pipeline_event = parse_pipeline_event(event)
+    except InvalidPipelineEvent as e:
+        # retrying a malformed event cannot help
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+
+    # Anything else raises: this function is invoked asynchronously, and
+    # only a raised error makes Lambda retry the invocation (a returned
+    # 500 counts as success and would drop the upload).
+    s3_key = pipeline_event["s3_key"]
+    image_id = pipeline_event["image_id"]
+    user_id = pipeline_event["user_id"]
+
+    original_bytes = download_original(s3_key)
+
+    # Step 1: Re-uploads of an already processed photo reuse its results
+    if clone_duplicate(user_id, image_id, content_hash(original_bytes)):
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"message": "Duplicate upload; existing results cloned."})
+        }
+
+    # Step 2: Build the single model-sized derivative both models read
+    model_s3_key = preprocess_image(s3_key, original_bytes)
+
+    # Step 3: Start detection, which in turn starts clipart generation
+    start_processing(make_pipeline_event(image_id, user_id, s3_key, model_s3_key))
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps({
+            "message": "Image preprocessed; detection and clipart generation started.",
+            "model_s3_key": model_s3_key
+        })
+    }
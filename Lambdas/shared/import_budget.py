@@ -0,0 +1,109 @@
+#
+# import_budget.py
+#
+# Reports how long each Lambda handler module takes to import
+# (the part of a cold start our code controls) and which heavy
+# dependencies get loaded, both at import time and -- for the
+# API Gateway handlers -- while serving a CORS preflight. Exits
+# non-zero if a handler is over its import budget or if the
+# preflight path drags in a heavy dependency.
+#
+# Usage (from Lambdas/):
+#   python shared/import_budget.py
+#
+
+import os
+import sys
+import json
+import subprocess
+
+LAMBDAS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(LAMBDAS_DIR, "shared", "python")
+
+# handler -> import budget in milliseconds
+HANDLERS = {
+    "upload": 50,
+    "getCloset": 50,
+    "preprocessImage": 50,
+    "detectClothing": 50,
+    "clipartCreator": 50,
+    "closetSearch": 50,
+}
+
+# handlers behind API Gateway, whose OPTIONS path must stay light
+HTTP_HANDLERS = ("upload", "getCloset", "closetSearch")
+
+HEAVY_MODULES = ("boto3", "botocore", "pymysql", "requests", "PIL", "numpy")
+
+PROBE = """
+import sys, json
+sys.path[:0] = [{handler_dir!r}, {layer_dir!r}]
+heavy = {heavy!r}
+loaded = lambda: sorted(m for m in heavy if m in sys.modules)
+
+import lambda_function
+result = {{"after_import": loaded()}}
+if {is_http!r}:
+    lambda_function.lambda_handler({{"httpMethod": "OPTIONS"}}, None)
+    result["after_preflight"] = loaded()
+print(json.dumps(result))
+"""
+
+
+def parse_importtime(stderr, module):
+    """Returns the cumulative import time of module in microseconds, from -X importtime output."""
+    for line in stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    return None
+
+
+def measure(handler):
+    handler_dir = os.path.join(LAMBDAS_DIR, handler)
+    probe = PROBE.format(handler_dir=handler_dir, layer_dir=LAYER_DIR,
+                         heavy=HEAVY_MODULES, is_http=handler in HTTP_HANDLERS)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                          cwd=handler_dir, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise Exception(f"{handler}: probe failed:\n{proc.stderr[-2000:]}")
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["import_us"] = parse_importtime(proc.stderr, "lambda_function")
+    return result
+
+
+def main():
+    failures = 0
+    print(f"{'handler':<18}{'import ms':>10}{'budget':>8}  heavy modules loaded")
+
+    for handler, budget_ms in HANDLERS.items():
+        try:
+            result = measure(handler)
+        except Exception as e:
+            print(str(e))
+            failures += 1
+            continue
+
+        import_ms = (result["import_us"] or 0) / 1000
+        over = import_ms > budget_ms
+        heavy = ", ".join(result["after_import"]) or "none"
+        line = f"{handler:<18}{import_ms:>10.1f}{budget_ms:>8}  import: {heavy}"
+
+        preflight = result.get("after_preflight")
+        if preflight is not None:
+            line += f"; OPTIONS: {', '.join(preflight) or 'none'}"
+
+        if over or preflight:
+            line += "  <-- FAIL"
+            failures += 1
+        print(line)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
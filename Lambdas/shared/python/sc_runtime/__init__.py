@@ -0,0 +1,24 @@
+#
+# sc_runtime
+#
+# Runtime shared by the Smart Closet Lambdas, deployed as a
+# Lambda layer (the layer zip holds this package under python/,
+# which Lambda puts on sys.path). Modules:
+#
+#   config         : lazy SC.ini access
+#   clients        : lazily constructed AWS clients and DB connection
+#   datatier       : SQL helpers over pymysql
+#   metrics        : per-stage timings, logged as CloudWatch EMF
+#   model_client   : pooled, rate-limited HTTP client for model APIs
+#   pipeline_event : versioned event passed between pipeline Lambdas
+#   closet_version : per-user closet version and row stamps
+#   closet_items   : JSON form of a closet item
+#   signed_urls    : cached presigned GET URLs for closet images
+#   thumbnails     : grid-sized AVIF/WebP copies of clipart
+#   color_analysis : dominant colors measured from an image
+#   vocabulary     : canonical clothing types, colors and materials
+#   features       : item feature vectors for similarity and pairing
+#
+# Nothing here imports boto3, pymysql, requests, Pillow or numpy
+# until it is actually used.
+#
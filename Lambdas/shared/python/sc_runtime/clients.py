@@ -0,0 +1,67 @@
+#
+# clients.py
+#
+# Factories for the AWS clients and the database connection the
+# Lambdas use. Each is constructed on first use and then reused
+# for the life of the container, so a cold start only pays for
+# the clients its code path actually needs -- a CORS preflight
+# pays for none of them.
+#
+
+import threading
+
+from sc_runtime import config, datatier, metrics
+
+_clients = {}
+_clients_lock = threading.Lock()  # boto3 client creation is not thread-safe
+
+
+def _boto3_client(service, region=None):
+    key = (service, region)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            if key not in _clients:
+                with metrics.span("aws.client"):
+                    import boto3
+
+                    if region:
+                        _clients[key] = boto3.client(service, region_name=region)
+                    else:
+                        _clients[key] = boto3.client(service)
+            client = _clients[key]
+    return client
+
+
+def s3():
+    return _boto3_client("s3", config.s3_region())
+
+
+_credentials = None
+
+def credentials():
+    """
+    The container's AWS credentials, for signing outside a client (see
+    signed_urls.py). botocore refreshes them as they near expiry.
+    """
+    global _credentials
+    if _credentials is None:
+        with _clients_lock:
+            if _credentials is None:
+                import boto3
+
+                _credentials = boto3.Session().get_credentials()
+    return _credentials
+
+
+def lambda_():
+    return _boto3_client("lambda")
+
+
+def sqs():
+    return _boto3_client("sqs", config.s3_region())
+
+
+def db():
+    """The warm, cached MySQL connection (see datatier.get_cached_dbConn)."""
+    return datatier.get_cached_dbConn(*config.rds_settings())
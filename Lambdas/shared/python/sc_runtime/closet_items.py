@@ -0,0 +1,41 @@
+#
+# closet_items.py
+#
+# The JSON form of a closet item, shared by SC_getCloset and
+# SC_closetSearch. Callers select JSON_COLUMNS first, in order;
+# any further columns of the row are ignored.
+#
+
+from sc_runtime.signed_urls import get_signed_url
+from sc_runtime.thumbnails import srcsets
+
+JSON_COLUMNS = ("id", "clothing_type", "color", "material", "style", "extra_info",
+                "new_image_s3_key", "color_rgb", "thumbnail_formats", "clipart_width")
+
+
+def item_json(row):
+    clothing_id, clothing_type, color, material, style, extra_info, s3_key, color_rgb, \
+        thumbnail_formats, clipart_width = row[:len(JSON_COLUMNS)]
+
+    signed_url = srcset = None
+    if s3_key:
+        try:
+            signed_url = get_signed_url(s3_key)
+            # grid-sized copies, so a tile downloads kilobytes instead
+            # of the full PNG
+            srcset = srcsets(s3_key, thumbnail_formats, clipart_width, get_signed_url)
+        except Exception as e:
+            print(f"Error generating signed URL (key: {s3_key}): {e}")
+
+    return {
+        "clothing_id": clothing_id,
+        "clothing_type": clothing_type,
+        "color": color,
+        "color_rgb": color_rgb,
+        "material": material,
+        "style": style,
+        "extra_info": extra_info,
+        "new_image_s3_key": s3_key,
+        "image_url": signed_url,
+        "srcset": srcset
+    }
@@ -0,0 +1,44 @@
+#
+# closet_version.py
+#
+# The per-user closet version (users.closet_version, migration
+# 0002) and the per-row stamp taken from it
+# (clothing_items.closet_stamp, migration 0008). Every write that
+# changes what the closet returns bumps the version, then stamps
+# the rows it touched with the bumped value, in the same
+# transaction. SC_getCloset builds its ETag from the version, and
+# SC_closetSearch reads only the rows stamped after the version its
+# cached index reflects.
+#
+
+from sc_runtime import datatier
+
+BUMP_SQL = "UPDATE users SET closet_version = closet_version + 1 WHERE id = %s"
+
+# The user's just-bumped version, as an SQL value to stamp rows with;
+# takes the user id as its parameter
+STAMP_SQL = "(SELECT closet_version FROM users WHERE id = %s)"
+
+# The same for an UPDATE of clothing_items covering several users
+# (the backfills): each row gets its owner's version
+OWNER_STAMP_SQL = "(SELECT closet_version FROM users WHERE id = clothing_items.user_id)"
+
+GET_SQL = "SELECT closet_version FROM users WHERE id = %s"
+
+
+def bump(conn, user_id):
+    datatier.perform_action(conn, BUMP_SQL, [user_id])
+
+
+def bump_many(conn, user_ids):
+    """Bumps each user once, in id order so concurrent writers lock alike."""
+    datatier.perform_many(conn, BUMP_SQL, [[u] for u in sorted(set(user_ids))])
+
+
+def get(conn, user_id):
+    """
+    The user's closet version, 0 for an unknown user. A primary-key
+    lookup, so checking it is far cheaper than reading the closet.
+    """
+    row = datatier.retrieve_one_row(conn, GET_SQL, [user_id])
+    return row[0] if row and row[0] is not None else 0
@@ -0,0 +1,207 @@
+#
+# color_analysis.py
+#
+# Dominant colors of a clothing image, measured from its pixels
+# instead of guessed by the detection model. The image is
+# shrunk, the white background is masked out (flood-filled in
+# from the border, so white clothing inside the outline is
+# kept), and the remaining pixels are clustered with k-means in
+# CIE Lab space. Each cluster becomes a swatch: its RGB and Lab
+# centre, the share of the foreground it covers, and the
+# nearest named bucket from the color vocabulary.
+#
+# Everything is vectorized NumPy. NumPy and Pillow are imported
+# on first use, so importing this module is free.
+#
+
+ANALYSIS_MAX_DIMENSION = 128   # pixels on the long side; plenty for a palette
+NUM_CLUSTERS = 4
+KMEANS_ITERATIONS = 12
+MIN_SWATCH_WEIGHT = 0.05       # clusters covering less of the item are noise
+BACKGROUND_MIN_CHANNEL = 235   # all of R, G, B at least this: near-white
+MIN_FOREGROUND_PIXELS = 32
+
+# Representative sRGB value for each named bucket; every bucket is a
+# canonical color of vocabulary.COLORS, so pixel colors and model colors
+# share one set of facet values
+BUCKET_RGB = {
+    "Black": (25, 25, 25),
+    "White": (245, 245, 242),
+    "Gray": (128, 128, 128),
+    "Navy": (30, 40, 85),
+    "Blue": (50, 100, 200),
+    "Teal": (0, 128, 128),
+    "Red": (200, 35, 45),
+    "Burgundy": (115, 25, 45),
+    "Pink": (240, 150, 180),
+    "Orange": (240, 130, 35),
+    "Yellow": (240, 210, 60),
+    "Green": (45, 140, 65),
+    "Olive": (110, 110, 45),
+    "Brown": (110, 70, 40),
+    "Beige": (215, 195, 160),
+    "Purple": (120, 65, 160),
+    "Gold": (205, 165, 60),
+    "Silver": (192, 192, 198),
+}
+
+_bucket_names = None
+_bucket_lab = None
+
+
+def rgb_to_lab(rgb):
+    """sRGB (..., 3) in 0-255 -> CIE Lab (..., 3), D65 white point."""
+    import numpy as np
+
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                        [0.3575761, 0.7151522, 0.1191920],
+                        [0.1804375, 0.0721750, 0.9503041]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([116 * f[..., 1] - 16,
+                     500 * (f[..., 0] - f[..., 1]),
+                     200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def nearest_buckets(lab):
+    """Named bucket for each Lab row of lab (n, 3)."""
+    global _bucket_names, _bucket_lab
+    import numpy as np
+
+    if _bucket_lab is None:
+        _bucket_names = list(BUCKET_RGB)
+        _bucket_lab = rgb_to_lab(np.array([BUCKET_RGB[n] for n in _bucket_names]))
+
+    dist = ((lab[:, None, :] - _bucket_lab[None, :, :]) ** 2).sum(axis=2)
+    return [_bucket_names[i] for i in dist.argmin(axis=1)]
+
+
+def bucket_lab(name):
+    """Lab value of a named bucket, or None if name is not a bucket."""
+    if name not in BUCKET_RGB:
+        return None
+    return rgb_to_lab(BUCKET_RGB[name])
+
+
+def load_pixels(image_bytes):
+    """Decodes and shrinks the image; returns an (h, w, 3) uint8 array on white."""
+    import io
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft("RGB", (ANALYSIS_MAX_DIMENSION, ANALYSIS_MAX_DIMENSION))
+        img.thumbnail((ANALYSIS_MAX_DIMENSION, ANALYSIS_MAX_DIMENSION))
+        if img.mode in ("RGBA", "LA", "P"):
+            # transparent areas count as background
+            img = img.convert("RGBA")
+            canvas = Image.new("RGBA", img.size, (255, 255, 255, 255))
+            canvas.alpha_composite(img)
+            img = canvas
+        return np.asarray(img.convert("RGB"))
+
+
+def foreground_mask(pixels):
+    """
+    True for pixels that belong to the item: everything except near-white
+    regions connected to the image border. Flood fill by repeated 4-way
+    dilation inside the near-white mask, one vectorized step per pixel of
+    reach.
+    """
+    import numpy as np
+
+    light = (pixels >= BACKGROUND_MIN_CHANNEL).all(axis=2)
+
+    background = np.zeros_like(light)
+    background[0, :] = light[0, :]
+    background[-1, :] = light[-1, :]
+    background[:, 0] = light[:, 0]
+    background[:, -1] = light[:, -1]
+
+    while True:
+        grown = background.copy()
+        grown[1:, :] |= background[:-1, :]
+        grown[:-1, :] |= background[1:, :]
+        grown[:, 1:] |= background[:, :-1]
+        grown[:, :-1] |= background[:, 1:]
+        grown &= light
+        if np.array_equal(grown, background):
+            return ~background
+        background = grown
+
+
+def kmeans(points, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Plain k-means on points (n, d) with k-means++ seeding from a fixed seed,
+    so the same image always gives the same palette. Returns
+    (centres (k', d), labels (n,)) with empty clusters dropped.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    k = min(k, len(points))
+
+    centres = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        d2 = ((points[:, None, :] - np.array(centres)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        total = d2.sum()
+        if total == 0:
+            break  # fewer distinct colors than clusters
+        centres.append(points[rng.choice(len(points), p=d2 / total)])
+    centres = np.array(centres)
+
+    for _ in range(iterations):
+        labels = ((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centres))
+        sums = np.zeros_like(centres)
+        np.add.at(sums, labels, points)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centres)
+        if np.allclose(updated, centres):
+            break
+        centres = updated
+
+    labels = ((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    used = np.unique(labels)
+    remap = np.full(len(centres), -1)
+    remap[used] = np.arange(len(used))
+    return centres[used], remap[labels]
+
+
+def dominant_colors(image_bytes, k=NUM_CLUSTERS):
+    """
+    Returns the image's swatches, heaviest first:
+      [{"rgb": "#rrggbb", "lab": [L, a, b], "bucket": "Navy", "weight": 0.62}, ...]
+    or [] if the image is (almost) all background.
+    """
+    import numpy as np
+
+    pixels = load_pixels(image_bytes)
+    fg = pixels[foreground_mask(pixels)]
+    if len(fg) < MIN_FOREGROUND_PIXELS:
+        return []
+
+    rgb = fg.astype(np.float64)
+    centres_lab, labels = kmeans(rgb_to_lab(rgb), k)
+
+    counts = np.bincount(labels, minlength=len(centres_lab))
+    weights = counts / counts.sum()
+    # mean RGB of each cluster's actual pixels, for display
+    sums = np.zeros((len(centres_lab), 3))
+    np.add.at(sums, labels, rgb)
+    centres_rgb = np.clip(np.rint(sums / np.maximum(counts, 1)[:, None]), 0, 255).astype(int)
+
+    buckets = nearest_buckets(centres_lab)
+    swatches = [
+        {
+            "rgb": "#%02x%02x%02x" % tuple(centres_rgb[i]),
+            "lab": [round(float(v), 1) for v in centres_lab[i]],
+            "bucket": buckets[i],
+            "weight": round(float(weights[i]), 3),
+        }
+        for i in np.argsort(-weights)
+        if weights[i] >= MIN_SWATCH_WEIGHT
+    ]
+    return swatches
+
@@ -0,0 +1,60 @@
+#
+# config.py
+#
+# Lazy access to SC.ini. The file is read the first time a
+# setting is asked for (once per container), not when a handler
+# module is imported.
+#
+
+import configparser
+
+CONFIG_FILE = "SC.ini"
+
+_config = None
+
+
+def get_config():
+    """Returns the parsed SC.ini, reading it on first use."""
+    global _config
+    if _config is None:
+        config = configparser.ConfigParser()
+        config.read(CONFIG_FILE)
+        _config = config
+    return _config
+
+
+def get(section, option, **kwargs):
+    """
+    Returns a setting as a string. Pass fallback=... for optional
+    settings; a missing required setting raises an Exception naming it.
+    """
+    try:
+        return get_config().get(section, option, **kwargs)
+    except (configparser.NoSectionError, configparser.NoOptionError) as e:
+        raise Exception(f"Missing configuration: {e}")
+
+
+def getint(section, option, **kwargs):
+    try:
+        return get_config().getint(section, option, **kwargs)
+    except (configparser.NoSectionError, configparser.NoOptionError) as e:
+        raise Exception(f"Missing configuration: {e}")
+
+
+def s3_bucket():
+    return get("s3", "bucket_name")
+
+
+def s3_region():
+    return get("s3", "region_name")
+
+
+def rds_settings():
+    """(endpoint, port, user, password, database) for datatier.get_dbConn()."""
+    return (
+        get("rds", "endpoint"),
+        getint("rds", "port_number"),
+        get("rds", "user_name"),
+        get("rds", "user_pwd"),
+        get("rds", "db_name"),
+    )
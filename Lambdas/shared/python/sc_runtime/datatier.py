@@ -0,0 +1,472 @@
+#
+# datatier.py
+#
+# Executes SQL queries against a MySQL database.
+#
+# pymysql is imported on first use rather than at import time,
+# so handler paths that never touch the database (e.g. CORS
+# preflight) don't pay for loading it.
+#
+# Original author:
+#   Prof. Joe Hummel
+#   Northwestern University
+#
+
+import sys
+import time
+from contextlib import contextmanager
+
+from sc_runtime import metrics
+
+
+#
+# Module-level connection kept alive across warm Lambda
+# invocations; see get_cached_dbConn():
+#
+_cachedConn = None
+_cachedConnArgs = None
+_cachedConnLastUsed = 0.0
+
+#
+# If the cached connection has been idle longer than this,
+# it is pinged (and reconnected if need be) before reuse:
+#
+PING_AFTER_IDLE_SECS = 30
+
+#
+# MySQL client errors that mean the connection was dropped
+# out from under us. CR_SERVER_GONE_ERROR is raised when the
+# statement could not be sent, so any statement can be
+# retried. CR_SERVER_LOST can arrive after the server already
+# ran (and, in autocommit mode, committed) the statement, so
+# only reads are retried after it:
+#
+_RECONNECT_ERRORS = (2006,)             # CR_SERVER_GONE_ERROR
+_READ_RECONNECT_ERRORS = (2006, 2013)   # ... and CR_SERVER_LOST
+
+#
+# ids of connections currently inside a transaction() block;
+# action queries on these connections defer their commit to
+# the end of the block:
+#
+_openTransactions = set()
+
+
+###################################################################
+#
+# get_dbConn:
+#
+# Opens and returns a connection object for interacting with a
+# MySQL database.
+#
+def get_dbConn(endpoint, portnum, username, pwd, dbname):
+  """
+  Opens and returns a connection object for interacting 
+  with a MySQL database
+
+  Parameters
+  ----------
+  endpoint : machine name or IP address of server (string),
+  portnum : server port # (integer),
+  username : user name for login (string),
+  pwd : user password for login (string),
+  dbname : database name (string)
+
+  Returns
+  -------
+  a connection object
+  """
+  try:
+    with metrics.span("db.connect"):
+      import pymysql
+
+      dbConn = pymysql.connect(host=endpoint,
+                               port=portnum,
+                               user=username,
+                               passwd=pwd,
+                               database=dbname)
+
+    return dbConn
+
+  except Exception as err:
+    print("datatier.get_dbConn() failed:")
+    print(str(err))
+    raise
+
+
+###################################################################
+#
+# get_cached_dbConn:
+#
+# Returns a module-level connection object that survives
+# across warm invocations of the same Lambda container, so
+# the TCP/TLS/auth handshake is paid once per container
+# rather than once per request. The connection runs in
+# autocommit mode so that reads never see a stale snapshot
+# left over from a previous invocation. Callers must NOT
+# close the returned connection.
+#
+def get_cached_dbConn(endpoint, portnum, username, pwd, dbname):
+  """
+  Returns a cached connection object for interacting with
+  a MySQL database, opening it on first use and checking
+  that it is still alive when it has been idle
+
+  Parameters
+  ----------
+  endpoint : machine name or IP address of server (string),
+  portnum : server port # (integer),
+  username : user name for login (string),
+  pwd : user password for login (string),
+  dbname : database name (string)
+
+  Returns
+  -------
+  a connection object (do not close it)
+  """
+  global _cachedConn, _cachedConnArgs, _cachedConnLastUsed
+
+  args = (endpoint, portnum, username, pwd, dbname)
+
+  try:
+    if _cachedConn is not None and _cachedConnArgs != args:
+      close_cached_dbConn()
+
+    if _cachedConn is None:
+      _cachedConn = get_dbConn(*args)
+      _cachedConn.autocommit(True)
+      _cachedConnArgs = args
+    elif time.monotonic() - _cachedConnLastUsed > PING_AFTER_IDLE_SECS:
+      with metrics.span("db.ping"):
+        _cachedConn.ping(reconnect=True)
+
+    _cachedConnLastUsed = time.monotonic()
+    return _cachedConn
+
+  except Exception as err:
+    print("datatier.get_cached_dbConn() failed:")
+    print(str(err))
+    close_cached_dbConn()
+    raise
+
+
+###################################################################
+#
+# close_cached_dbConn:
+#
+# Closes the module-level connection (if any) so the next call
+# to get_cached_dbConn() opens a fresh one.
+#
+def close_cached_dbConn():
+  """
+  Closes and forgets the cached connection, if one is open
+  """
+  global _cachedConn, _cachedConnArgs
+
+  conn = _cachedConn
+  _cachedConn = None
+  _cachedConnArgs = None
+
+  if conn is not None:
+    try:
+      conn.close()
+    except Exception:
+      pass  # already closed or broken, nothing to do
+
+
+###################################################################
+#
+# _execute:
+#
+# Executes the query on the given cursor. If the server has
+# gone away (e.g. idle timeout while the Lambda container was
+# frozen), reconnects and retries the query once, as long as
+# that cannot run it twice (see _RECONNECT_ERRORS). Each call
+# is timed as a "db.query" span (see metrics.py).
+#
+def _execute(dbConn, dbCursor, sql, parameters, read=False):
+  _with_reconnect(dbConn, dbCursor.execute, sql, parameters, read)
+
+
+def _with_reconnect(dbConn, func, sql, parameters, read=False):
+  with metrics.span("db.query"):
+    _call_with_reconnect(dbConn, func, sql, parameters, read)
+
+
+def _call_with_reconnect(dbConn, func, sql, parameters, read):
+  try:
+    func(sql, parameters)
+  except Exception as err:
+    #
+    # inside a transaction the earlier statements died with the
+    # connection, so replaying just this one would be wrong:
+    #
+    if not _is_reconnect_error(err, read) or id(dbConn) in _openTransactions:
+      raise
+    print("datatier: connection lost, reconnecting and retrying...")
+    dbConn.ping(reconnect=True)
+    func(sql, parameters)
+
+
+def _is_reconnect_error(err, read=False):
+  pymysql = sys.modules.get("pymysql")
+  if pymysql is None:
+    return False  # not a pymysql connection (e.g. the benchmark's SQLite stand-in)
+
+  if isinstance(err, pymysql.err.InterfaceError):
+    return True  # raised before sending, on a connection that was closed
+  if not isinstance(err, pymysql.err.OperationalError):
+    return False
+  codes = _READ_RECONNECT_ERRORS if read else _RECONNECT_ERRORS
+  return bool(err.args) and err.args[0] in codes
+
+
+##################################################################
+#
+# retrieve_one_row:
+#
+# Given a database connection and an SQL Select query,
+# executes this query against the database and returns
+# the first row (tuple) retrieved by the query (the tuple
+# can be empty if the SELECT retrieved no data). The query
+# can be parameterized using %s, in which case pass the
+# values as a list [value1, value2, ...]
+#
+def retrieve_one_row(dbConn, sql, parameters=[]):
+  """
+  Executes an sql SELECT query against the database connection
+  and returns the first row as a tuple
+
+  Parameters
+  __________
+  dbConn : the database connection, 
+  sql : the SQL SELECT query (can be parameterized with %s),
+  parameters: optional list of values if parameterized
+
+  Returns
+  _______
+  First row as a tuple, or () if SELECT retrieves no data
+  """
+
+  dbCursor = dbConn.cursor()
+
+  try:
+    _execute(dbConn, dbCursor, sql, parameters, read=True)
+    row = dbCursor.fetchone()
+    if row is None:  # executed successfully, but no data was retrieved
+      return ()
+    else:
+      return row
+
+  except Exception as err:
+    print("datatier.retrieve_one_row() failed:")
+    print(str(err))
+    raise
+
+  finally:
+    dbCursor.close()
+
+
+##################################################################
+#
+# retrieve_all_rows:
+#
+# Given a database connection and an SQL Select query,
+# executes this query against the database and returns
+# a list of rows (tuples) retrieved by the query. If the
+# query retrieves no data, the empty list [] is returned.
+# The query can be parameterized using %s, in which case
+# pass the values as a list [value1, value2, ...]
+#
+def retrieve_all_rows(dbConn, sql, parameters=[]):
+  """
+  Executes an sql SELECT query against the database connection
+  and returns all rows as a list of tuples
+
+  Parameters
+  __________
+  dbConn : the database connection, 
+  sql : the SQL SELECT query (can be parameterized with %s),
+  parameters: optional list of values if parameterized
+
+  Returns
+  _______
+  All rows as a list of tuples, or [] if SELECT retrieves no
+  data
+  """
+
+  dbCursor = dbConn.cursor()
+
+  try:
+    _execute(dbConn, dbCursor, sql, parameters, read=True)
+    rows = dbCursor.fetchall()
+    if rows is None:  # executed successfully, but no data was retrieved
+      return []
+    else:
+      return rows
+
+  except Exception as err:
+    print("datatier.retrieve_all_rows() failed:")
+    print(str(err))
+    raise
+
+  finally:
+    dbCursor.close()
+
+
+###############################################################
+#
+# perform_action:
+#
+# Given a database connection and an SQL action query,
+# executes an ACTION query and returns the number of rows
+# modified; a return value of 0 means no rows were
+# modified. Action queries are typically "insert",
+# "update", "delete". The query can be parameterized
+# using %s, in which case pass the values as a list
+# [value1, value2, ...]
+#
+def perform_action(dbConn, sql, parameters=[]):
+  """
+  Executes an sql ACTION query against the database connection
+  and returns number of rows modified
+
+  Parameters
+  __________
+  dbConn : the database connection, 
+  sql : the SQL SELECT query (can be parameterized with %s),
+  parameters: optional list of values if parameterized
+
+  Returns
+  _______
+  number of rows modified (0 is not an error but implies
+  the query made no modifications)
+  """
+
+  dbCursor = dbConn.cursor()
+
+  try:
+    # try to execute, and if successful commit the changes
+    # and return the # of rows modified by the query:
+    _execute(dbConn, dbCursor, sql, parameters)
+    _commit_unless_in_transaction(dbConn)
+    return dbCursor.rowcount
+
+  except Exception as err:
+    # failed, rollback any possible changes and log error:
+    _rollback_unless_in_transaction(dbConn)
+    print("datatier.perform_action() failed:")
+    print(str(err))
+    raise
+
+  finally:
+    dbCursor.close()
+
+
+###############################################################
+#
+# perform_many:
+#
+# Given a database connection, an SQL action query and a list
+# of parameter lists, executes the query once per parameter
+# list and returns the total number of rows modified. For
+# "INSERT ... VALUES (%s, ...)" queries the rows are sent to
+# the server as a single multi-row INSERT, so N rows cost one
+# round trip and one commit instead of N.
+#
+def perform_many(dbConn, sql, parameters_list):
+  """
+  Executes an sql ACTION query against the database connection
+  once for each set of parameters, committing once at the end,
+  and returns number of rows modified
+
+  Parameters
+  __________
+  dbConn : the database connection, 
+  sql : the SQL ACTION query (parameterized with %s),
+  parameters_list: list of parameter lists, one per row
+
+  Returns
+  _______
+  number of rows modified (0 is not an error but implies
+  the query made no modifications)
+  """
+
+  if not parameters_list:
+    return 0
+
+  dbCursor = dbConn.cursor()
+
+  try:
+    _with_reconnect(dbConn, dbCursor.executemany, sql, parameters_list)
+    _commit_unless_in_transaction(dbConn)
+    return dbCursor.rowcount
+
+  except Exception as err:
+    # failed, rollback any possible changes and log error:
+    _rollback_unless_in_transaction(dbConn)
+    print("datatier.perform_many() failed:")
+    print(str(err))
+    raise
+
+  finally:
+    dbCursor.close()
+
+
+###############################################################
+#
+# transaction:
+#
+# Context manager that groups several action queries into one
+# transaction: perform_action() / perform_many() calls made
+# inside the block do not commit individually; the whole block
+# is committed once on exit, or rolled back if it raises.
+#
+#   with datatier.transaction(dbConn):
+#     datatier.perform_action(dbConn, sql1, [...])
+#     datatier.perform_many(dbConn, sql2, [[...], [...]])
+#
+@contextmanager
+def transaction(dbConn):
+  """
+  Runs the enclosed action queries as a single transaction,
+  committing once on success and rolling back on error
+
+  Parameters
+  __________
+  dbConn : the database connection
+
+  Returns
+  _______
+  the same connection, for use in a "with ... as" clause
+  """
+
+  if id(dbConn) in _openTransactions:
+    yield dbConn  # nested: the outermost block commits
+    return
+
+  dbConn.begin()
+  _openTransactions.add(id(dbConn))
+
+  try:
+    yield dbConn
+    dbConn.commit()
+
+  except Exception as err:
+    dbConn.rollback()
+    print("datatier.transaction() failed:")
+    print(str(err))
+    raise
+
+  finally:
+    _openTransactions.discard(id(dbConn))
+
+
+def _commit_unless_in_transaction(dbConn):
+  if id(dbConn) not in _openTransactions:
+    dbConn.commit()
+
+
+def _rollback_unless_in_transaction(dbConn):
+  if id(dbConn) not in _openTransactions:
+    dbConn.rollback()
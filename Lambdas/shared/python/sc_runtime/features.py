@@ -0,0 +1,307 @@
+#
+# features.py
+#
+# Numeric encoding of clothing items, for "similar items" and
+# "goes with" scoring over a whole closet at once.
+#
+# Each item becomes one L2-normalized row of a feature matrix:
+#
+#   clothing_type  one-hot over the vocabulary's types
+#   material       one-hot over the vocabulary's materials
+#   style          multi-hot of the style's words, hashed
+#   color          soft assignment of the item's Lab color to the
+#                  named color buckets (an RBF embedding, so
+#                  nearby colors overlap)
+#
+# so similarity to one item is a single matrix-vector product.
+# Pairing ("goes with") combines the outfit slot of each type
+# (top, bottom, shoes, ...) with style agreement and a color
+# harmony score, all as array operations.
+#
+# NumPy is imported on first use.
+#
+
+import zlib
+
+from sc_runtime.color_analysis import BUCKET_RGB, bucket_lab
+from sc_runtime.vocabulary import CLOTHING_TYPES, MATERIALS
+
+# Outfit slots. A type's slot decides what it can be worn with.
+SLOTS = ("top", "bottom", "one_piece", "outerwear", "shoes", "accessory")
+
+TYPE_SLOTS = {
+    "T-Shirt": "top", "Shirt": "top", "Polo": "top", "Blouse": "top", "Tank Top": "top",
+    "Sweater": "top", "Hoodie": "top", "Sweatshirt": "top",
+    "Cardigan": "outerwear", "Jacket": "outerwear", "Blazer": "outerwear", "Coat": "outerwear",
+    "Vest": "outerwear",
+    "Dress": "one_piece",
+    "Skirt": "bottom", "Jeans": "bottom", "Pants": "bottom", "Leggings": "bottom", "Shorts": "bottom",
+    "Sneakers": "shoes", "Boots": "shoes", "Shoes": "shoes", "Sandals": "shoes",
+    "Hat": "accessory", "Scarf": "accessory", "Belt": "accessory", "Bag": "accessory",
+    "Sunglasses": "accessory", "Glasses": "accessory", "Watch": "accessory",
+    "Necklace": "accessory", "Bracelet": "accessory", "Earrings": "accessory", "Ring": "accessory",
+    "Socks": "accessory", "Tie": "accessory", "Gloves": "accessory",
+}
+
+# Slot pairs that belong in one outfit (symmetric)
+SLOT_PAIRS = (
+    ("top", "bottom"), ("top", "outerwear"), ("top", "shoes"), ("top", "accessory"),
+    ("bottom", "outerwear"), ("bottom", "shoes"), ("bottom", "accessory"),
+    ("one_piece", "outerwear"), ("one_piece", "shoes"), ("one_piece", "accessory"),
+    ("outerwear", "shoes"), ("outerwear", "accessory"),
+    ("shoes", "accessory"),
+)
+
+NO_SLOT = -1
+
+TYPE_NAMES = list(CLOTHING_TYPES) + ["Other"]
+MATERIAL_NAMES = list(MATERIALS) + ["Other"]
+COLOR_BUCKETS = list(BUCKET_RGB)
+STYLE_DIM = 16
+
+# Relative weight of each block in the similarity score
+TYPE_WEIGHT = 1.0
+MATERIAL_WEIGHT = 0.5
+STYLE_WEIGHT = 0.7
+COLOR_WEIGHT = 1.0
+
+COLOR_RBF_SIGMA = 18.0   # Lab distance at which bucket membership falls to ~60%
+NEUTRAL_CHROMA = 15.0    # below this Lab chroma a color is a neutral
+_COS_ANALOGOUS = 0.8660254       # cos 30 deg: hues this close are analogous
+_COS_COMPLEMENTARY = -0.8660254  # cos 150 deg: hues this far apart complement
+
+_TYPE_INDEX = {name: i for i, name in enumerate(TYPE_NAMES)}
+_MATERIAL_INDEX = {name: i for i, name in enumerate(MATERIAL_NAMES)}
+_SLOT_INDEX = {name: i for i, name in enumerate(SLOTS)}
+
+_blocks = None
+_bucket_labs = None    # bucket name -> (L, a, b)
+_style_cache = {}      # style text -> hashed buckets; styles repeat a lot
+
+
+def _block_layout():
+    """(start, end) column range of each block."""
+    global _blocks
+    if _blocks is None:
+        sizes = [("type", len(TYPE_NAMES)), ("material", len(MATERIAL_NAMES)),
+                 ("style", STYLE_DIM), ("color", len(COLOR_BUCKETS))]
+        _blocks = {}
+        start = 0
+        for name, size in sizes:
+            _blocks[name] = (start, start + size)
+            start += size
+    return _blocks
+
+
+def feature_dim():
+    return max(end for _, end in _block_layout().values())
+
+
+def slot_of(clothing_type):
+    slot = TYPE_SLOTS.get(clothing_type)
+    return _SLOT_INDEX[slot] if slot else NO_SLOT
+
+
+def slot_pair_matrix():
+    """
+    (len(SLOTS) + 1) square array, 1.0 where two slots belong in one
+    outfit. The extra last row and column are zeros, so indexing with
+    NO_SLOT (-1) never pairs.
+    """
+    import numpy as np
+
+    m = np.zeros((len(SLOTS) + 1, len(SLOTS) + 1), dtype=np.float32)
+    for a, b in SLOT_PAIRS:
+        m[_SLOT_INDEX[a], _SLOT_INDEX[b]] = m[_SLOT_INDEX[b], _SLOT_INDEX[a]] = 1.0
+    return m
+
+
+def style_buckets(style):
+    """Hashed buckets of the style's words ("Slim Fit" -> two buckets)."""
+    buckets = _style_cache.get(style)
+    if buckets is None:
+        words = "".join(c if c.isalnum() else " " for c in (style or "").lower()).split()
+        buckets = sorted({zlib.crc32(w.encode("utf-8")) % STYLE_DIM for w in words})
+        if len(_style_cache) < 10000:
+            _style_cache[style] = buckets
+    return buckets
+
+
+def bucket_labs():
+    """Lab value of every named color bucket, computed once."""
+    global _bucket_labs
+    if _bucket_labs is None:
+        _bucket_labs = {name: tuple(float(v) for v in bucket_lab(name)) for name in COLOR_BUCKETS}
+    return _bucket_labs
+
+
+def item_lab(color, lab_l, lab_a, lab_b):
+    """Measured Lab color if there is one, else the named color's bucket, else None."""
+    if lab_l is not None and lab_a is not None and lab_b is not None:
+        return (float(lab_l), float(lab_a), float(lab_b))
+    return bucket_labs().get(color)
+
+
+def encode(items):
+    """
+    Encodes items, each a (clothing_type, color, material, style, lab or
+    None) tuple. Returns (features (n, d) float32 with unit rows, style
+    (n, STYLE_DIM) float32 with unit or zero rows, lab (n, 3) float32 with
+    NaN rows where unknown, slots (n,) int8).
+    """
+    import numpy as np
+
+    n = len(items)
+    layout = _block_layout()
+    features = np.zeros((n, feature_dim()), dtype=np.float32)
+    style = np.zeros((n, STYLE_DIM), dtype=np.float32)
+    lab = np.full((n, 3), np.nan, dtype=np.float32)
+    slots = np.full(n, NO_SLOT, dtype=np.int8)
+    if n == 0:
+        return features, style, lab, slots
+
+    rows = np.arange(n)
+    type_idx = np.array([_TYPE_INDEX.get(t, _TYPE_INDEX["Other"]) for t, *_ in items])
+    material_idx = np.array([_MATERIAL_INDEX.get(m, _MATERIAL_INDEX["Other"]) for _, _, m, _, _ in items])
+    features[rows, layout["type"][0] + type_idx] = TYPE_WEIGHT
+    features[rows, layout["material"][0] + material_idx] = MATERIAL_WEIGHT
+
+    for i, (clothing_type, _, _, item_style, item_lab_value) in enumerate(items):
+        slots[i] = slot_of(clothing_type)
+        buckets = style_buckets(item_style)
+        if buckets:
+            style[i, buckets] = 1.0
+        if item_lab_value is not None:
+            lab[i] = item_lab_value
+
+    norms = np.linalg.norm(style, axis=1, keepdims=True)
+    style = np.divide(style, norms, out=np.zeros_like(style), where=norms > 0)
+    start, end = layout["style"]
+    features[:, start:end] = STYLE_WEIGHT * style
+
+    start, end = layout["color"]
+    features[:, start:end] = COLOR_WEIGHT * color_embedding(lab)
+
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    features /= np.maximum(norms, 1e-6)
+    return features, style, lab, slots
+
+
+def color_embedding(lab):
+    """(n, 3) Lab, NaN where unknown -> (n, len(COLOR_BUCKETS)) unit rows (zeros if unknown)."""
+    import numpy as np
+
+    centres = bucket_centres()
+    d2 = ((lab[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+    emb = np.exp(-d2 / (2 * COLOR_RBF_SIGMA ** 2))
+    emb = np.nan_to_num(emb, nan=0.0)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    return np.divide(emb, norms, out=np.zeros_like(emb), where=norms > 0)
+
+
+def color_harmony(lab_a, lab_b):
+    """
+    How well two sets of colors go together: (na, 3) and (nb, 3) Lab
+    arrays -> (na, nb) scores in 0..1. Neutrals go with anything;
+    otherwise analogous and complementary hues score well and clashing
+    ones poorly, with a bonus for light/dark contrast. Unknown colors
+    (NaN) score a neutral 0.5.
+
+    The hue test compares the cosine of the angle between (a, b) hue
+    vectors, which is one small matrix product instead of per-pair
+    trigonometry.
+    """
+    import numpy as np
+
+    def hue_parts(lab):
+        known = ~np.isnan(lab).any(axis=1)
+        ab = np.where(known[:, None], lab[:, 1:], 0).astype(np.float32)
+        chroma = np.hypot(ab[:, 0], ab[:, 1])
+        unit = ab / np.maximum(chroma, 1e-6)[:, None]
+        return known, chroma < NEUTRAL_CHROMA, unit, np.where(known, lab[:, 0], 0).astype(np.float32)
+
+    known_a, neutral_a, unit_a, light_a = hue_parts(lab_a)
+    known_b, neutral_b, unit_b, light_b = hue_parts(lab_b)
+
+    cos = unit_a @ unit_b.T
+    hue = np.full(cos.shape, 0.4, dtype=np.float32)
+    hue[cos >= _COS_ANALOGOUS] = 0.8
+    hue[cos <= _COS_COMPLEMENTARY] = 0.9
+    hue[neutral_a] = 0.9
+    hue[:, neutral_b] = 0.9
+
+    contrast = np.abs(light_a[:, None] - light_b[None, :])
+    contrast *= 1 / 50.0
+    np.minimum(contrast, 1.0, out=contrast)
+
+    score = 0.8 * hue + 0.2 * contrast
+    score[~known_a] = 0.5
+    score[:, ~known_b] = 0.5
+    return score
+
+
+def pair_scores(style_a, lab_a, slots_a, style_b, lab_b, slots_b, pair_matrix=None):
+    """
+    (na, nb) "goes with" scores between two sets of encoded items: zero
+    unless their slots belong in one outfit, otherwise an even mix of
+    style agreement and color harmony. All array operations, no Python
+    loop over items.
+    """
+    if pair_matrix is None:
+        pair_matrix = slot_pair_matrix()
+
+    # NO_SLOT (-1) picks the matrix's trailing all-zero row and column
+    compat = pair_matrix[slots_a][:, slots_b]
+
+    score = style_a @ style_b.T
+    # no style words on either side: neither agreement nor clash
+    score[~style_a.any(axis=1)] = 0.5
+    score[:, ~style_b.any(axis=1)] = 0.5
+
+    score += color_harmony(lab_a, lab_b)
+    score *= 0.5
+    score *= compat
+    return score
+
+
+def bucket_centres():
+    """(len(COLOR_BUCKETS), 3) Lab array of the named color buckets."""
+    import numpy as np
+
+    return np.array([bucket_labs()[name] for name in COLOR_BUCKETS], dtype=np.float32)
+
+
+def partner_summary(style, lab):
+    """
+    What expected_pair_scores needs to know about a set of items: their
+    count, summed style vectors, how many have no style, and a histogram
+    of their colors over the named buckets (unknown colors last).
+    """
+    import numpy as np
+
+    known = ~np.isnan(lab).any(axis=1)
+    centres = bucket_centres()
+    nearest = ((lab[known][:, None, :] - centres[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    hist = np.bincount(nearest, minlength=len(centres)).astype(np.float32)
+    return (len(style), style.sum(axis=0), len(style) - int(style.any(axis=1).sum()),
+            hist, len(style) - int(known.sum()))
+
+
+def expected_pair_scores(style_a, bucket_harmony_a, summary):
+    """
+    (na,) mean pair score of each a item against a set of items that all
+    belong in an outfit with it, in time linear in na: style agreement is
+    linear, so its mean is one product with the set's summed style
+    vector, and the set's colors count as their nearest named bucket.
+    bucket_harmony_a is color_harmony(lab_a, bucket_centres()); summary
+    is the set's partner_summary. Used to rank items by how well they go
+    with a whole slot.
+    """
+    import numpy as np
+
+    n, style_sum, unstyled, hist, unknown = summary
+    if n == 0:
+        return np.zeros(len(style_a), dtype=np.float32)
+    style_mean = np.where(style_a.any(axis=1), (style_a @ style_sum + 0.5 * unstyled) / n, 0.5)
+    harmony_mean = (bucket_harmony_a @ hist + 0.5 * unknown) / n
+    return (0.5 * (style_mean + harmony_mean)).astype(np.float32)
@@ -0,0 +1,133 @@
+#
+# metrics.py
+#
+# Per-stage timing for the Lambda handlers. A handler wrapped in
+# @instrument("SC_...") collects the spans recorded while it
+# runs -- presign, model call, DB connect, each query, S3 put,
+# Lambda invoke, ... -- and prints them as one CloudWatch
+# Embedded Metric Format (EMF) log line when it returns, tagged
+# cold or warm. CloudWatch turns the line into metrics; the raw
+# spans stay searchable in Logs Insights.
+#
+# Spans recorded outside an instrumented handler (e.g. by the
+# migration scripts) are dropped.
+#
+
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+NAMESPACE = "SmartCloset"
+
+# Individual spans kept on the log line for drill-down; stage
+# totals are always complete
+MAX_SPANS_PER_LINE = 200
+
+_lock = threading.Lock()  # batch handlers record from worker threads
+_current = None            # the invocation being traced, if any
+_cold_start = True         # until the first invocation in this container
+
+
+class _Invocation:
+    def __init__(self, function_name, start):
+        self.function_name = function_name
+        self.start = start
+        self.totals = {}  # stage -> total ms
+        self.counts = {}  # stage -> number of spans
+        self.spans = []   # [stage, ms] in completion order
+
+
+def record(stage, ms):
+    """Adds ms milliseconds to stage in the current invocation."""
+    with _lock:
+        inv = _current
+        if inv is None:
+            return
+        inv.totals[stage] = inv.totals.get(stage, 0.0) + ms
+        inv.counts[stage] = inv.counts.get(stage, 0) + 1
+        if len(inv.spans) < MAX_SPANS_PER_LINE:
+            inv.spans.append([stage, round(ms, 3)])
+
+
+@contextmanager
+def span(stage):
+    """Times the body of a with statement as one span of stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, (time.perf_counter() - start) * 1000)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument(function_name):
+    """
+    Decorator for a lambda_handler: traces the invocation and emits its
+    EMF line, even if the handler raises.
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _current, _cold_start
+
+            inv = _Invocation(function_name, time.perf_counter())
+            cold = _cold_start
+            _cold_start = False
+            with _lock:
+                _current = inv
+
+            status = None
+            try:
+                result = handler(event, context)
+                if isinstance(result, dict):
+                    status = result.get("statusCode")
+                return result
+            except Exception:
+                status = "exception"
+                raise
+            finally:
+                with _lock:
+                    _current = None
+                duration = (time.perf_counter() - inv.start) * 1000
+                print(json.dumps(emf_record(inv, duration, cold, status)))
+        return wrapper
+    return decorate
+
+
+def emf_record(inv, duration_ms, cold, status):
+    failed = status == "exception" or (isinstance(status, int) and status >= 500)
+
+    metrics = [{"Name": "Duration", "Unit": "Milliseconds"},
+               {"Name": "Errors", "Unit": "Count"}]
+    metrics += [{"Name": stage, "Unit": "Milliseconds"} for stage in inv.totals]
+
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [["Function"], ["Function", "Start"]],
+                "Metrics": metrics,
+            }],
+        },
+        "Function": inv.function_name,
+        "Start": "cold" if cold else "warm",
+        "Duration": round(duration_ms, 3),
+        "Errors": 1 if failed else 0,
+        **{stage: round(ms, 3) for stage, ms in inv.totals.items()},
+        "StatusCode": status,
+        "SpanCounts": inv.counts,
+        "Spans": inv.spans,
+    }
@@ -0,0 +1,346 @@
+#
+# model_client.py
+#
+# Shared HTTP client for the model APIs (OpenAI, Gemini). One
+# pooled requests.Session lives at module level, so keep-alive
+# connections -- and the DNS, TCP and TLS setup behind them --
+# are reused across warm Lambda invocations instead of being
+# paid on every call. Every request has explicit connect and
+# read timeouts.
+#
+# Calls also go through a per-host rate limiter: a concurrency
+# cap, a token bucket fed by the provider's rate-limit response
+# headers, and jittered exponential backoff on 429/5xx within a
+# total deadline, so a burst of uploads queues up behind the
+# quota instead of failing and being retried wholesale.
+#
+# requests is imported when the first session is created, so
+# importing this module costs nothing on paths that never call
+# a model.
+#
+
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+from sc_runtime import metrics
+
+CONNECT_TIMEOUT_SECS = 3.05   # slightly over a TCP retransmit window
+DEFAULT_READ_TIMEOUT_SECS = 60
+POOL_MAXSIZE = 10             # connections kept per host
+
+# Rate limiting / retry
+MAX_CONCURRENT_CALLS = 4        # in-flight requests per host, per container
+DEFAULT_DEADLINE_SECS = 180     # give up retrying after this long in total
+# Time a handler keeps after its model calls give up, to clean up and
+# report the failure before Lambda's own timeout kills it
+INVOCATION_MARGIN_SECS = 5
+BACKOFF_BASE_SECS = 1.0
+BACKOFF_MAX_SECS = 30.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()   # batch workers share the session
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class ModelCallTimeout(Exception):
+    pass
+
+
+def get_session():
+    """Returns the module-level pooled session, creating it on first use."""
+    global _session
+    session = _session
+    if session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                new_session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                new_session.mount("https://", adapter)
+                _session = new_session
+            session = _session
+    return session
+
+
+def reset_session(failed):
+    """
+    Replaces the session that failed with a fresh one on the next call,
+    unless another thread already has. The old session is not closed:
+    other threads may still have requests in flight on it, and its idle
+    connections go when it is garbage-collected.
+    """
+    global _session
+    with _session_lock:
+        if _session is failed:
+            _session = None
+
+
+###################################################################
+#
+# Rate limiting
+#
+
+def parse_duration(value):
+    """
+    Parses rate-limit durations: plain seconds ("20", "0.5") or
+    OpenAI-style "1m30s" / "6m0s" / "250ms". Returns seconds or None.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    number = ""
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            number += ch
+            i += 1
+            continue
+        if not number:
+            return None
+        if value.startswith("ms", i):
+            total += float(number) / 1000
+            i += 2
+        elif ch in "hms":
+            total += float(number) * {"h": 3600, "m": 60, "s": 1}[ch]
+            i += 1
+        else:
+            return None
+        number = ""
+    return total if not number else None
+
+
+class RateLimiter:
+    """
+    Per-host limiter. Unknown quotas are not throttled until the provider
+    tells us about them through response headers; after that a token
+    bucket paces requests to the advertised rate.
+    """
+
+    def __init__(self, max_concurrency):
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._tokens = None        # None = quota unknown, do not throttle
+        self._capacity = None
+        self._refill_per_sec = None
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+
+    def acquire(self, deadline):
+        """Waits for a concurrency slot and a token; raises ModelCallTimeout past deadline."""
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise ModelCallTimeout("Timed out waiting for a model call slot")
+        try:
+            while True:
+                wait = self._take_token()
+                if wait <= 0:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise ModelCallTimeout("Rate limit wait would exceed the deadline")
+                time.sleep(wait)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self):
+        self._slots.release()
+
+    def _take_token(self):
+        """Takes a token if available and returns 0, else returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens is None:
+                return 0
+
+            if self._refill_per_sec:
+                self._tokens = min(self._capacity,
+                                   self._tokens + (now - self._refilled_at) * self._refill_per_sec)
+            self._refilled_at = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            if not self._refill_per_sec:
+                return BACKOFF_BASE_SECS
+            return (1 - self._tokens) / self._refill_per_sec
+
+    def pause(self, seconds):
+        """Holds back every caller for this host, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, headers):
+        """Updates the bucket from x-ratelimit-* request headers (OpenAI style)."""
+        limit = headers.get("x-ratelimit-limit-requests")
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        if limit is None or remaining is None:
+            return
+        try:
+            limit = float(limit)
+            remaining = float(remaining)
+        except ValueError:
+            return
+
+        with self._lock:
+            self._capacity = limit
+            self._tokens = remaining
+            self._refilled_at = time.monotonic()
+            # the reset header says when the bucket is full again
+            missing = limit - remaining
+            if reset and missing > 0:
+                self._refill_per_sec = missing / reset
+            elif not self._refill_per_sec:
+                self._refill_per_sec = limit / 60  # quotas are per minute
+
+
+def invocation_deadline(context, margin_secs=INVOCATION_MARGIN_SECS):
+    """
+    The time.monotonic() deadline for model calls made by this Lambda
+    invocation: its remaining time less margin_secs, so a call gives up
+    (and the handler reports the failure) before the platform kills the
+    invocation and a retry repeats it all. None without a Lambda context,
+    e.g. when run locally.
+    """
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - margin_secs
+
+
+def get_limiter(url):
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter(MAX_CONCURRENT_CALLS)
+        return _limiters[host]
+
+
+def retry_after_secs(response):
+    """Server-requested delay from Retry-After / retry-after-ms, or None."""
+    ms = response.headers.get("retry-after-ms")
+    if ms is not None:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(response.headers.get("retry-after"))
+
+
+def backoff_secs(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_MAX_SECS, BACKOFF_BASE_SECS * 2 ** attempt))
+
+
+###################################################################
+#
+# Requests
+#
+
+def _post_once(url, payload, headers, timeout, stream):
+    import requests
+
+    session = get_session()
+    try:
+        return session.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+    except requests.exceptions.ConnectionError:
+        # a keep-alive connection may have been closed by the server while
+        # the container was frozen; retry once on a fresh connection
+        print("model_client: connection failed, retrying on a fresh connection...")
+        reset_session(session)
+        return get_session().post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+
+
+def _release_on_close(response, limiter):
+    """
+    Makes closing the streamed response release its limiter slot (once),
+    so a call counts against MAX_CONCURRENT_CALLS until its body is read,
+    not just until its headers arrive.
+    """
+    close = response.close
+    released = threading.Lock()
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            if released.acquire(blocking=False):
+                limiter.release()
+
+    response.close = close_and_release  # also what "with response:" calls
+    return response
+
+
+def post_json(url, payload, headers=None, read_timeout=DEFAULT_READ_TIMEOUT_SECS,
+              deadline_secs=DEFAULT_DEADLINE_SECS, stream=False, deadline=None):
+    """
+    POSTs payload as JSON over the pooled session and returns the
+    requests.Response. Rate-limited (429) and transient 5xx responses are
+    retried with jittered exponential backoff, honoring Retry-After, until
+    deadline_secs have passed, or the absolute time.monotonic() deadline
+    if that comes first (see invocation_deadline); the last response is
+    then returned for the caller to report. Raises ModelCallTimeout if
+    the deadline passes while waiting for the limiter.
+
+    With stream=True the body is left unread for the caller to iterate
+    (read_timeout then bounds the gap between chunks); close the response
+    when done so its connection goes back to the pool and its limiter
+    slot is freed.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + deadline_secs
+    else:
+        deadline = min(deadline, time.monotonic() + deadline_secs)
+    limiter = get_limiter(url)
+    attempt = 0
+
+    while True:
+        with metrics.span("model.wait"):
+            limiter.acquire(deadline)
+        try:
+            remaining = deadline - time.monotonic()
+            timeout = (CONNECT_TIMEOUT_SECS, max(1.0, min(read_timeout, remaining)))
+            with metrics.span("model.request"):  # until the response headers arrive
+                response = _post_once(url, payload, headers, timeout, stream)
+        except BaseException:
+            limiter.release()
+            raise
+        if stream:
+            # the body is still to be read: the slot is held until close
+            _release_on_close(response, limiter)
+        else:
+            limiter.release()
+
+        limiter.observe(response.headers)
+        if response.status_code not in RETRY_STATUS_CODES:
+            return response
+
+        delay = backoff_secs(attempt)
+        server_delay = retry_after_secs(response)
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        if response.status_code == 429:
+            limiter.pause(delay)
+
+        if time.monotonic() + delay >= deadline:
+            print(f"model_client: giving up after {attempt + 1} attempts (HTTP {response.status_code})")
+            return response
+
+        print(f"model_client: HTTP {response.status_code}, retrying in {delay:.1f}s")
+        response.close()
+        with metrics.span("model.backoff"):
+            time.sleep(delay)
+        attempt += 1
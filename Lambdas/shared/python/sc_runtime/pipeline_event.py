@@ -0,0 +1,74 @@
+#
+# pipeline_event.py
+#
+# Versioned event passed between the image-processing Lambdas
+# (SC_upload -> SC_preprocessImage -> SC_detectClothing /
+# SC_clipartCreator). It carries everything the downstream
+# stages need, so none of them has to look the image up in the
+# database before starting work.
+#
+# Version 1 fields:
+#   version      : PIPELINE_EVENT_VERSION (int)
+#   image_id     : images.id of the upload (string)
+#   user_id      : owner of the image (alphanumeric string)
+#   s3_key       : key of the original upload (string)
+#   model_s3_key : key of the model-sized derivative, set by
+#                  SC_preprocessImage (string, optional)
+#
+
+import json
+
+PIPELINE_EVENT_VERSION = 1
+
+_REQUIRED_FIELDS = ("image_id", "user_id", "s3_key")
+
+
+class InvalidPipelineEvent(Exception):
+    pass
+
+
+def make_pipeline_event(image_id, user_id, s3_key, model_s3_key=None):
+    """Builds a pipeline event dict, ready for json.dumps()."""
+    event = {
+        "version": PIPELINE_EVENT_VERSION,
+        "image_id": image_id,
+        "user_id": user_id,
+        "s3_key": s3_key,
+    }
+    if model_s3_key:
+        event["model_s3_key"] = model_s3_key
+    return event
+
+
+def parse_pipeline_event(event):
+    """
+    Validates an incoming Lambda event (direct invoke payload, or an
+    API Gateway event with a JSON body) and returns the pipeline event
+    dict. Raises InvalidPipelineEvent if it is malformed.
+    """
+    try:
+        body = json.loads(event["body"]) if isinstance(event.get("body"), str) else event
+    except (TypeError, ValueError) as e:
+        raise InvalidPipelineEvent(f"Malformed event body: {e}")
+
+    if not isinstance(body, dict):
+        raise InvalidPipelineEvent("Event must be a JSON object")
+
+    version = body.get("version")
+    if version != PIPELINE_EVENT_VERSION:
+        raise InvalidPipelineEvent(
+            f"Unsupported pipeline event version {version!r} (expected {PIPELINE_EVENT_VERSION})")
+
+    for field in _REQUIRED_FIELDS:
+        value = body.get(field)
+        if not isinstance(value, str) or not value:
+            raise InvalidPipelineEvent(f"Missing or invalid {field}")
+
+    if not body["user_id"].isalnum():
+        raise InvalidPipelineEvent("Invalid user_id")
+
+    model_s3_key = body.get("model_s3_key")
+    if model_s3_key is not None and (not isinstance(model_s3_key, str) or not model_s3_key):
+        raise InvalidPipelineEvent("Invalid model_s3_key")
+
+    return make_pipeline_event(body["image_id"], body["user_id"], body["s3_key"], model_s3_key)
@@ -0,0 +1,108 @@
+#
+# signed_urls.py
+#
+# Presigned GET URLs for closet images, shared by the Lambdas
+# that return items to the browser (SC_getCloset,
+# SC_closetSearch). URLs are stable within a signing window and
+# memoized across warm invocations, so the browser can cache the
+# (immutable) images.
+#
+# A URL is signed as of the start of its window, with a fixed
+# lifetime, rather than at the current time, so every container
+# signing the same key in the same window (with the same
+# credentials) hands out the same URL. botocore's
+# generate_presigned_url always signs at the current time, so
+# the signing goes through its SigV4 query signer directly.
+#
+
+import time
+import urllib.parse
+from collections import OrderedDict
+
+from sc_runtime import clients, config, metrics
+
+URL_BUCKET_SECS = 3600         # one URL per key per signing window (1 hour)
+URL_MIN_REMAINING = 3600       # validity left on a URL handed out at the very end of a window
+URL_EXPIRES_IN = URL_BUCKET_SECS + URL_MIN_REMAINING   # counted from the window's start
+# LRU bound on the warm-container cache. An item with thumbnails has
+# seven URLs (its PNG plus two formats at three widths), so this holds
+# about 7,000 items' worth.
+URL_CACHE_MAX_ENTRIES = 50000
+
+# s3_key -> (signed_url, window_end); survives across warm invocations
+_signed_url_cache = OrderedDict()
+
+
+def get_signed_url(s3_key):
+    """
+    Returns a presigned GET URL for s3_key that stays the same for the whole
+    signing window, so the browser sees an identical URL on every closet
+    refresh and serves the (immutable) image from its cache.
+
+    Each URL is signed once per window and memoized across warm invocations,
+    so a closet refresh within the window signs nothing new. It is signed
+    as of the window's start and outlives the window by URL_MIN_REMAINING
+    seconds, so a URL is never handed out close to expiry, and any
+    container signing the key in this window produces the same URL; when
+    the window rolls over the cached entry is replaced.
+    """
+    now = time.time()
+    window_end = current_url_window_end(now)
+
+    cached = _signed_url_cache.get(s3_key)
+    if cached:
+        url, cached_window_end = cached
+        if cached_window_end == window_end:
+            _signed_url_cache.move_to_end(s3_key)
+            return url
+        del _signed_url_cache[s3_key]
+
+    with metrics.span("s3.presign"):
+        url = presign_get_url(config.s3_bucket(), s3_key,
+                              int(window_end) - URL_BUCKET_SECS, URL_EXPIRES_IN)
+    _signed_url_cache[s3_key] = (url, window_end)
+    if len(_signed_url_cache) > URL_CACHE_MAX_ENTRIES:
+        _signed_url_cache.popitem(last=False)
+    return url
+
+
+def current_url_window_end(now):
+    return now - (now % URL_BUCKET_SECS) + URL_BUCKET_SECS
+
+
+_auth_class = None
+
+def _window_auth_class():
+    """botocore's S3 presigning signer, with the signing time given rather than now."""
+    global _auth_class
+    if _auth_class is None:
+        from botocore.auth import SIGV4_TIMESTAMP, S3SigV4QueryAuth
+
+        class WindowQueryAuth(S3SigV4QueryAuth):
+            def __init__(self, credentials, region_name, expires, signed_at):
+                super().__init__(credentials, "s3", region_name, expires=expires)
+                self._timestamp = time.strftime(SIGV4_TIMESTAMP, time.gmtime(signed_at))
+
+            def _modify_request_before_signing(self, request):
+                # add_auth stamped the current time; everything signed
+                # after this point reads the timestamp from the context
+                request.context["timestamp"] = self._timestamp
+                super()._modify_request_before_signing(request)
+
+        _auth_class = WindowQueryAuth
+    return _auth_class
+
+
+def presign_get_url(bucket, s3_key, signed_at, expires_in):
+    """
+    Presigned (SigV4 query string) GET URL for the object, signed as of
+    signed_at (epoch seconds) and valid for expires_in seconds from then.
+    """
+    from botocore.awsrequest import AWSRequest
+
+    region = config.s3_region()
+    url = f"https://{bucket}.s3.{region}.amazonaws.com/{urllib.parse.quote(s3_key, safe='/~')}"
+    request = AWSRequest(method="GET", url=url)
+    auth = _window_auth_class()(clients.credentials().get_frozen_credentials(), region, expires_in, signed_at)
+    auth.add_auth(request)
+    return request.prepare().url
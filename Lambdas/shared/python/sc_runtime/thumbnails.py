@@ -0,0 +1,139 @@
+#
+# thumbnails.py
+#
+# Small AVIF/WebP copies of each clipart PNG for the closet grid,
+# written by SC_clipartCreator right after the clipart, and the
+# srcset strings SC_getCloset and SC_closetSearch hand to the
+# browser. A thumbnail's key is derived from its clipart's key:
+#
+#   {user}/closet_items/{item}.png -> {user}/closet_items/{item}_w320.webp
+#
+# and the widths written follow from the clipart's own width, so
+# only that width and the formats written are stored
+# (clothing_items.clipart_width / thumbnail_formats, migration
+# 0010). Pillow is imported only when rendering.
+#
+
+import io
+import posixpath
+
+from sc_runtime import clients, config, metrics
+
+# Widths in pixels: the 120px match/outfit thumbnails and the ~300px
+# grid tiles, at 1x and 2x. Clipart is never upscaled, see
+# thumbnail_widths.
+THUMBNAIL_WIDTHS = (160, 320, 640)
+
+# Best first. Formats this Pillow build cannot encode are skipped; the
+# browser falls back to the next one, and to the PNG after that.
+THUMBNAIL_FORMATS = ("avif", "webp")
+
+CONTENT_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+ENCODE_OPTIONS = {
+    "avif": {"quality": 60, "speed": 8},
+    "webp": {"quality": 80, "method": 4},
+}
+
+# Written once under a key unique to the clipart, never modified
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def thumbnail_key(clipart_key, width, fmt):
+    return f"{posixpath.splitext(clipart_key)[0]}_w{width}.{fmt}"
+
+
+def thumbnail_widths(clipart_width):
+    """
+    The widths written for clipart this many pixels wide: each of
+    THUMBNAIL_WIDTHS it is wider than, and the clipart's own width in
+    place of the larger ones. Every copy is exactly as wide as its key
+    and srcset descriptor say, so the browser's choice is right.
+    """
+    if not clipart_width:
+        return []
+    widths = [w for w in THUMBNAIL_WIDTHS if w < clipart_width]
+    if len(widths) < len(THUMBNAIL_WIDTHS):
+        widths.append(clipart_width)
+    return widths
+
+
+def encodable_formats():
+    from PIL import features
+
+    formats = []
+    for fmt in THUMBNAIL_FORMATS:
+        try:
+            if features.check(fmt):
+                formats.append(fmt)
+        except ValueError:   # a Pillow too old to know the format at all
+            pass
+    return formats
+
+
+@metrics.timed("image.thumbnail")
+def render_thumbnails(image_bytes, formats):
+    """
+    Returns (clipart width, [(width, format, bytes)]) with every width of
+    thumbnail_widths in every format.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        rendered = []
+        for width in thumbnail_widths(img.width):
+            scaled = img.copy()
+            if width < img.width:
+                scaled = scaled.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+            for fmt in formats:
+                out = io.BytesIO()
+                scaled.save(out, format=fmt.upper(), **ENCODE_OPTIONS[fmt])
+                rendered.append((width, fmt, out.getvalue()))
+        return img.width, rendered
+
+
+def write_thumbnails(clipart_key, image_bytes):
+    """
+    Renders and uploads the thumbnails of the clipart stored under
+    clipart_key. Returns the (thumbnail_formats, clipart_width) values to
+    store: the formats written, comma-separated, and the clipart's width
+    in pixels; (None, None) if no format can be written.
+    """
+    formats = encodable_formats()
+    if not formats:
+        return None, None
+    clipart_width, rendered = render_thumbnails(image_bytes, formats)
+    for width, fmt, data in rendered:
+        with metrics.span("s3.put"):
+            clients.s3().put_object(
+                Bucket=config.s3_bucket(),
+                Key=thumbnail_key(clipart_key, width, fmt),
+                Body=data,
+                ContentType=CONTENT_TYPES[fmt],
+                CacheControl=THUMBNAIL_CACHE_CONTROL
+            )
+    return ",".join(formats), clipart_width
+
+
+def thumbnail_keys(clipart_key, thumbnail_formats, clipart_width):
+    """Every thumbnail key of the clipart, e.g. for copying them all."""
+    if not clipart_key or not thumbnail_formats:
+        return []
+    return [thumbnail_key(clipart_key, width, fmt)
+            for fmt in thumbnail_formats.split(",") for width in thumbnail_widths(clipart_width)]
+
+
+def srcsets(clipart_key, thumbnail_formats, clipart_width, sign):
+    """
+    {format: "url 160w, url 320w, url 640w"} for each thumbnail format of
+    the clipart, best first, with each URL from sign(key); None if it has
+    no thumbnails (clipart drawn before 0010, or rendering failed).
+    """
+    widths = thumbnail_widths(clipart_width)
+    if not clipart_key or not thumbnail_formats or not widths:
+        return None
+    return {
+        fmt: ", ".join(f"{sign(thumbnail_key(clipart_key, width, fmt))} {width}w" for width in widths)
+        for fmt in thumbnail_formats.split(",")
+    }
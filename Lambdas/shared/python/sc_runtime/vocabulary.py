@@ -0,0 +1,230 @@
+#
+# vocabulary.py
+#
+# Canonical values for the clothing attributes the detection
+# model returns as free text ("T-Shirt", "t shirt", "Tee";
+# "Navy Blue", "navy"). Each vocabulary maps every synonym of a
+# canonical value to it; the maps are compiled into plain dict
+# lookups once per container, keyed on the text with case,
+# spacing and punctuation squashed out.
+#
+# Phrases that are not in a vocabulary fall back to the words
+# inside them (the last recognized noun for clothing types, the
+# colors mentioned for colors, the first recognized material),
+# and finally to the tidied-up raw text, so nothing is dropped.
+#
+# Bump VOCABULARY_VERSION whenever a vocabulary changes; the
+# backfill (migrations/backfill_attributes.py) re-canonicalizes
+# every row stored under an older version from its raw values.
+#
+
+import re
+
+VOCABULARY_VERSION = 1
+
+NORMALIZED_FIELDS = ("clothing_type", "color", "material")
+
+# canonical value: synonyms (the canonical value itself is implied)
+CLOTHING_TYPES = {
+    "T-Shirt": ("t shirt", "tshirt", "tee", "tee shirt", "graphic tee", "crew neck tee"),
+    "Shirt": ("button up", "button down", "button up shirt", "button down shirt", "dress shirt",
+              "oxford shirt", "flannel", "flannel shirt"),
+    "Polo": ("polo shirt",),
+    "Blouse": (),
+    "Tank Top": ("tank", "camisole", "cami"),
+    "Sweater": ("jumper", "pullover", "knit sweater", "turtleneck"),
+    "Cardigan": (),
+    "Hoodie": ("hoody", "hooded sweatshirt", "zip up hoodie"),
+    "Sweatshirt": ("crewneck", "crewneck sweatshirt"),
+    "Jacket": ("bomber", "bomber jacket", "denim jacket", "leather jacket", "windbreaker",
+               "track jacket"),
+    "Blazer": ("sport coat", "suit jacket"),
+    "Coat": ("overcoat", "trench", "trench coat", "parka", "puffer", "puffer jacket"),
+    "Vest": ("gilet",),
+    "Dress": ("gown", "sundress"),
+    "Skirt": (),
+    "Jeans": ("denim pants", "denims"),
+    "Pants": ("trousers", "slacks", "chinos", "khakis", "joggers", "sweatpants", "cargo pants"),
+    "Leggings": (),
+    "Shorts": (),
+    "Sneakers": ("trainers", "running shoes", "tennis shoes", "athletic shoes"),
+    "Boots": ("ankle boots", "chelsea boots"),
+    "Shoes": ("loafers", "oxfords", "flats", "heels", "dress shoes"),
+    "Sandals": ("flip flops", "slides"),
+    "Hat": ("cap", "baseball cap", "beanie", "bucket hat", "fedora"),
+    "Scarf": (),
+    "Belt": (),
+    "Bag": ("handbag", "purse", "backpack", "tote", "tote bag", "crossbody bag"),
+    "Sunglasses": ("shades",),
+    "Glasses": ("eyeglasses", "spectacles"),
+    "Watch": ("wristwatch",),
+    "Necklace": ("chain", "pendant"),
+    "Bracelet": (),
+    "Earrings": (),
+    "Ring": (),
+    "Socks": (),
+    "Tie": ("necktie", "bow tie"),
+    "Gloves": (),
+}
+
+COLORS = {
+    "Black": ("jet black", "onyx"),
+    "White": ("off white", "ivory"),
+    "Gray": ("grey", "charcoal", "heather gray", "heather grey", "slate"),
+    "Navy": ("navy blue", "dark blue", "midnight blue"),
+    "Blue": ("light blue", "sky blue", "baby blue", "royal blue", "cobalt", "denim blue"),
+    "Teal": ("turquoise", "aqua"),
+    "Red": ("crimson", "scarlet"),
+    "Burgundy": ("maroon", "wine", "oxblood"),
+    "Pink": ("blush", "rose", "fuchsia", "magenta", "hot pink"),
+    "Orange": ("rust", "coral"),
+    "Yellow": ("mustard",),
+    "Green": ("forest green", "emerald", "mint", "sage"),
+    "Olive": ("olive green", "army green", "khaki green"),
+    "Brown": ("chocolate", "camel", "cognac"),
+    "Beige": ("tan", "khaki", "cream", "sand", "nude", "taupe"),
+    "Purple": ("violet", "lavender", "lilac", "plum"),
+    "Gold": ("golden",),
+    "Silver": (),
+    "Multicolor": ("multi", "multicolored", "multicolour", "multi color", "rainbow", "various"),
+}
+
+MATERIALS = {
+    "Cotton": ("organic cotton", "cotton blend"),
+    "Denim": ("jean",),
+    "Leather": ("genuine leather", "faux leather", "vegan leather", "pleather", "patent leather"),
+    "Suede": (),
+    "Wool": ("merino", "merino wool", "wool blend"),
+    "Cashmere": (),
+    "Polyester": ("poly",),
+    "Nylon": (),
+    "Silk": (),
+    "Satin": (),
+    "Linen": (),
+    "Knit": ("knitted", "cable knit", "jersey"),
+    "Fleece": (),
+    "Canvas": (),
+    "Corduroy": (),
+    "Velvet": (),
+    "Chiffon": (),
+    "Fur": ("faux fur", "shearling"),
+    "Spandex": ("elastane", "lycra"),
+    "Rayon": ("viscose",),
+    "Mesh": (),
+    "Rubber": (),
+    "Plastic": ("acetate",),
+    "Metal": ("steel", "stainless steel", "alloy"),
+}
+
+# Words that qualify a color without changing which one it is
+_COLOR_MODIFIERS = frozenset(("light", "dark", "pale", "bright", "deep", "soft", "muted", "faded", "washed"))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text):
+    return _WORD_RE.findall(text.lower())
+
+
+def _squash(words):
+    return "".join(words)
+
+
+class Vocabulary:
+    """
+    Compiled synonym map for one attribute. match is how a phrase that is
+    not itself a synonym falls back to the words inside it:
+
+      "head"   the longest recognized run of trailing words
+               ("light wash denim jacket" -> Jacket)
+      "colors" every color mentioned; more than one is multicolor
+               ("black and white stripes" -> Multicolor)
+      "first"  the first recognized word ("cotton/polyester" -> Cotton)
+    """
+
+    def __init__(self, synonyms, match):
+        self.match = match
+        self._lookup = {}
+        for canonical, aliases in synonyms.items():
+            for phrase in (canonical,) + tuple(aliases):
+                key = _squash(_words(phrase))
+                self._lookup[key] = canonical
+                # singular / plural forms of the same phrase
+                if key.endswith("s"):
+                    self._lookup.setdefault(key[:-1], canonical)
+                else:
+                    self._lookup.setdefault(key + "s", canonical)
+
+    def lookup(self, words):
+        return self._lookup.get(_squash(words)) if words else None
+
+    def canonicalize(self, raw):
+        """Returns the canonical value for raw ("" for empty input)."""
+        words = _words(raw or "")
+        if not words:
+            return ""
+
+        found = self.lookup(words)
+        if found:
+            return found
+
+        if self.match == "head":
+            for start in range(1, len(words)):
+                found = self.lookup(words[start:])
+                if found:
+                    return found
+        elif self.match == "colors":
+            colors = []
+            i = 0
+            while i < len(words):
+                # two-word names ("forest green") before single words
+                found = self.lookup(words[i:i + 2]) if i + 1 < len(words) else None
+                if found:
+                    i += 2
+                else:
+                    found = None if words[i] in _COLOR_MODIFIERS else self.lookup([words[i]])
+                    i += 1
+                if found and found not in colors:
+                    colors.append(found)
+            if len(colors) == 1:
+                return colors[0]
+            if colors:
+                return "Multicolor"
+        elif self.match == "first":
+            for i, word in enumerate(words):
+                found = (self.lookup(words[i:i + 2]) if i + 1 < len(words) else None) or self.lookup([word])
+                if found:
+                    return found
+
+        return tidy(raw)
+
+
+def tidy(raw):
+    """Collapses whitespace and title-cases, so unknown values at least group by case."""
+    text = " ".join(raw.split())
+    return text.title() if text.islower() or text.isupper() else text
+
+
+_VOCABULARIES = {
+    "clothing_type": Vocabulary(CLOTHING_TYPES, "head"),
+    "color": Vocabulary(COLORS, "colors"),
+    "material": Vocabulary(MATERIALS, "first"),
+}
+
+
+def canonicalize(field, raw):
+    return _VOCABULARIES[field].canonicalize(raw)
+
+
+def normalize_item(item):
+    """
+    Returns a copy of a detected item with clothing_type, color and
+    material canonicalized and the model's original text kept under
+    <field>_raw.
+    """
+    normalized = dict(item)
+    for field in NORMALIZED_FIELDS:
+        raw = item.get(field) or ""
+        normalized[field + "_raw"] = raw
+        normalized[field] = canonicalize(field, raw)
+    return normalized
@@ -0,0 +1,32 @@
+#
+# conftest.py
+#
+# The tests run handlers in-process against the same stand-ins as
+# the benchmark (bench/fakes.py): in-memory S3 and Lambda clients
+# and SQLite behind datatier, migrated to the current schema.
+#
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+import run_bench  # noqa: E402  (also puts sc_runtime and migrations on sys.path)
+
+BUCKET = run_bench.BUCKET
+USER_ID = run_bench.USER_ID
+
+
+@pytest.fixture
+def env():
+    """A fresh BenchEnv wired into sc_runtime, with the test user created."""
+    env = run_bench.BenchEnv()
+    env.seed_closet(0)
+    return env
+
+
+@pytest.fixture
+def load_handler():
+    return run_bench.load_handler
@@ -0,0 +1,43 @@
+import contextlib
+import io
+
+import backfill_attributes
+from conftest import USER_ID
+from sc_runtime import datatier
+from sc_runtime.vocabulary import VOCABULARY_VERSION
+
+INSERT_ITEM_SQL = """
+    INSERT INTO clothing_items (id, original_image_id, user_id, clothing_type, color, material,
+                                clothing_type_raw, color_raw, material_raw, color_rgb)
+    VALUES (%s, 'photo', %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def stored(env, item_id):
+    return datatier.retrieve_one_row(
+        env.db, "SELECT clothing_type, color, material, attributes_version FROM clothing_items WHERE id = %s",
+        [item_id])
+
+
+def backfill(env):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return backfill_attributes.backfill(env.db)
+
+
+def test_model_color_is_canonicalized(env):
+    datatier.perform_action(env.db, INSERT_ITEM_SQL,
+        ["guess", USER_ID, "tee shirt", "light blue", "cotton", "tee shirt", "light blue", "cotton", None])
+
+    backfill(env)
+
+    assert stored(env, "guess") == ("T-Shirt", "Blue", "Cotton", VOCABULARY_VERSION)
+
+
+def test_measured_color_is_kept(env):
+    # SC_clipartCreator measured Navy from the clipart; the model said light blue
+    datatier.perform_action(env.db, INSERT_ITEM_SQL,
+        ["measured", USER_ID, "tee shirt", "Navy", "cotton", "tee shirt", "light blue", "cotton", "#1e285a"])
+
+    backfill(env)
+
+    assert stored(env, "measured") == ("T-Shirt", "Navy", "Cotton", VOCABULARY_VERSION)
@@ -0,0 +1,78 @@
+import json
+
+import fakes
+from conftest import USER_ID
+from sc_runtime import datatier
+from sc_runtime.pipeline_event import make_pipeline_event
+
+DETECTED = [dict(item, bbox=box) for item, box in zip(fakes.SAMPLE_ITEMS, fakes.SAMPLE_BOXES)]
+
+
+def fake_detection(calls):
+    """Stands in for the streamed OpenAI call: stores DETECTED in one batch."""
+    def call_openai_with_image_url(image_url, on_items, deadline=None):
+        calls.append(image_url)
+        on_items(DETECTED)
+        return len(DETECTED)
+    return call_openai_with_image_url
+
+
+def sqs_record(image_id, s3_key, message_id="m-1"):
+    return {
+        "messageId": message_id,
+        "eventSource": "aws:sqs",
+        "body": json.dumps(make_pipeline_event(image_id, USER_ID, s3_key)),
+    }
+
+
+def item_count(env, image_id):
+    return datatier.retrieve_one_row(
+        env.db, "SELECT COUNT(*) FROM clothing_items WHERE original_image_id = %s", [image_id])[0]
+
+
+def test_redelivered_record_is_detected_once(env, load_handler, monkeypatch):
+    detect = load_handler("detectClothing")
+    calls = []
+    monkeypatch.setattr(detect, "call_openai_with_image_url", fake_detection(calls))
+    (image_id, _, s3_key), = env.seed_pending_photos(1, items_per_photo=0)
+    record = sqs_record(image_id, s3_key)
+
+    for _ in range(2):   # SQS delivers at least once
+        assert detect.lambda_handler({"Records": [record]}, None) == {"batchItemFailures": []}
+
+    assert len(calls) == 1
+    assert item_count(env, image_id) == len(DETECTED)
+    assert [name for name, _ in env.lambda_.invocations] == [detect.CLIPART_CREATOR_FUNCTION]
+
+
+def test_partial_attempt_is_replaced(env, load_handler, monkeypatch):
+    detect = load_handler("detectClothing")
+    calls = []
+    monkeypatch.setattr(detect, "call_openai_with_image_url", fake_detection(calls))
+    (image_id, _, s3_key), = env.seed_pending_photos(1, items_per_photo=0)
+
+    # an earlier attempt stored one item and was killed before finishing
+    detect.insert_clothing_items_to_db(image_id, USER_ID, DETECTED[:1])
+
+    assert detect.lambda_handler({"Records": [sqs_record(image_id, s3_key)]}, None) == {"batchItemFailures": []}
+
+    assert len(calls) == 1
+    assert item_count(env, image_id) == len(DETECTED)
+
+
+def test_photo_without_clothing_is_final(env, load_handler, monkeypatch):
+    detect = load_handler("detectClothing")
+    calls = []
+    def call_openai_with_image_url(image_url, on_items, deadline=None):
+        calls.append(image_url)
+        return 0
+    monkeypatch.setattr(detect, "call_openai_with_image_url", call_openai_with_image_url)
+    (image_id, _, s3_key), = env.seed_pending_photos(1, items_per_photo=0)
+    record = sqs_record(image_id, s3_key)
+
+    for _ in range(2):
+        assert detect.lambda_handler({"Records": [record]}, None) == {"batchItemFailures": []}
+
+    assert len(calls) == 1
+    assert item_count(env, image_id) == 0
+    assert env.lambda_.invocations == []
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import run_bench
+from sc_runtime import datatier
+
+
+@pytest.fixture
+def closet():
+    """A BenchEnv whose test user has 23 items over six photos."""
+    env = run_bench.BenchEnv()
+    env.seed_closet(23)
+    return env
+
+
+def get_page(handler, **kwargs):
+    response = handler(run_bench.closet_event(**kwargs), None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_cursor_round_trip(load_handler):
+    get_closet = load_handler("getCloset")
+    cursor = get_closet.encode_cursor("image-1", "item-2")
+    assert "=" not in cursor   # padding is stripped; the cursor goes in a query string
+    assert get_closet.decode_cursor(cursor) == ("image-1", "item-2")
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", "WzFd"])   # "not json", "[1]"
+def test_invalid_cursor_is_a_bad_request(load_handler, cursor):
+    get_closet = load_handler("getCloset")
+    with pytest.raises(get_closet.BadRequest):
+        get_closet.decode_cursor(cursor)
+
+
+def test_pages_cover_the_closet_once_in_order(closet, load_handler):
+    handler = load_handler("getCloset").lambda_handler
+    seen, cursor = [], None
+    while True:
+        status, body = get_page(handler, limit=5, cursor=cursor)
+        assert status == 200
+        assert len(body["items"]) <= 5
+        seen += [item["clothing_id"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    expected = [row[0] for row in datatier.retrieve_all_rows(closet.db,
+        "SELECT id FROM clothing_items WHERE user_id = %s ORDER BY original_image_id, id", [run_bench.USER_ID])]
+    assert seen == expected
+    assert len(seen) == 23
+
+
+def test_last_full_page_has_no_cursor(closet, load_handler):
+    handler = load_handler("getCloset").lambda_handler
+    status, body = get_page(handler, limit=23)
+    assert len(body["items"]) == 23
+    assert body["next_cursor"] is None
+
+
+def test_bad_cursor_returns_400(closet, load_handler):
+    handler = load_handler("getCloset").lambda_handler
+    status, body = get_page(handler, cursor="not base64!")
+    assert status == 400
+    assert body["error"] == "Invalid cursor"
@@ -0,0 +1,81 @@
+import json
+
+from item_stream import ItemStreamParser, clean_bbox, parse_items
+
+SHIRT = {"clothing_type": "Shirt", "color": "Blue", "material": "Cotton", "style": "Casual",
+         "extra_info": "", "bbox": [0.1, 0.2, 0.5, 0.6]}
+JEANS = {"clothing_type": "Jeans", "color": "Navy", "material": "Denim", "style": "Slim",
+         "extra_info": "cuffed", "bbox": [0.2, 0.5, 0.7, 0.95]}
+
+
+def response(*items):
+    return json.dumps({"items": list(items)})
+
+
+def feed_in_chunks(text, size):
+    parser = ItemStreamParser()
+    batches = [parser.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return parser, batches
+
+
+def test_items_split_across_chunks():
+    text = response(SHIRT, JEANS)
+    for size in (1, 2, 7, len(text)):
+        parser, batches = feed_in_chunks(text, size)
+        items = [item for batch in batches for item in batch]
+        assert [item["clothing_type"] for item in items] == ["Shirt", "Jeans"]
+        assert parser.num_items == 2
+
+
+def test_item_is_returned_as_soon_as_it_closes():
+    text = response(SHIRT, JEANS)
+    first_end = text.index("}") + 1   # SHIRT has no nested objects
+    parser = ItemStreamParser()
+    assert [item["clothing_type"] for item in parser.feed(text[:first_end])] == ["Shirt"]
+    assert [item["clothing_type"] for item in parser.feed(text[first_end:])] == ["Jeans"]
+
+
+def test_quotes_and_braces_inside_strings():
+    tricky = dict(SHIRT, extra_info='logo says "{hi}" ]\\ [', style="a } b { c")
+    parser, batches = feed_in_chunks(response(tricky, JEANS), 3)
+    items = [item for batch in batches for item in batch]
+    assert [item["extra_info"] for item in items] == ['logo says "{hi}" ]\\ [', "cuffed"]
+    assert items[0]["style"] == "a } b { c"
+
+
+def test_malformed_and_unusable_items_are_skipped():
+    text = ('{"items": [{"clothing_type": "Hat", "color": }, '
+            '{"clothing_type": "", "color": "Red"}, '
+            '{"clothing_type": 5}, '
+            '"not an object", ' + json.dumps(JEANS) + "]}")
+    assert [item["clothing_type"] for item in parse_items(text)] == ["Jeans"]
+
+
+def test_partial_item_at_end_of_stream_is_dropped():
+    text = response(SHIRT, JEANS)
+    parser = ItemStreamParser()
+    items = parser.feed(text[:text.index('"Jeans"')])
+    assert [item["clothing_type"] for item in items] == ["Shirt"]
+    assert parser.num_items == 1
+
+
+def test_fields_are_stripped_and_nulls_become_empty():
+    item, = parse_items(response(dict(SHIRT, clothing_type="  Shirt ", material=None)))
+    assert item["clothing_type"] == "Shirt"
+    assert item["material"] == ""
+
+
+def test_bbox_cleaning():
+    assert clean_bbox([0.1, 0.2, 0.5, 0.6]) == (0.1, 0.2, 0.5, 0.6)
+    assert clean_bbox([-0.5, 0.2, 1.5, 0.6]) == (0.0, 0.2, 1.0, 0.6)   # clamped
+    assert clean_bbox([0.1, 0.2, 0.11, 0.6]) is None                  # too thin
+    assert clean_bbox([0.1, 0.2, 0.5]) is None
+    assert clean_bbox([0.1, 0.2, "0.5", 0.6]) is None
+    assert clean_bbox([True, 0.2, 0.5, 0.6]) is None
+    assert clean_bbox(None) is None
+
+
+def test_unusable_bbox_keeps_the_item():
+    item, = parse_items(response(dict(SHIRT, bbox="top left")))
+    assert item["clothing_type"] == "Shirt"
+    assert item["bbox"] is None
@@ -0,0 +1,48 @@
+from sc_runtime import model_client
+
+URL = "https://models.test/v1/chat"
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def free_slots(limiter):
+    return limiter._slots._value
+
+
+def test_streamed_call_holds_its_slot_until_closed(monkeypatch):
+    monkeypatch.setattr(model_client, "_post_once", lambda *args: FakeResponse())
+    monkeypatch.setattr(model_client, "_limiters", {})
+    limiter = model_client.get_limiter(URL)
+
+    response = model_client.post_json(URL, {}, stream=True)
+    assert free_slots(limiter) == model_client.MAX_CONCURRENT_CALLS - 1
+
+    with response:
+        pass
+    response.close()   # closing twice frees the slot once
+    assert response.closed
+    assert free_slots(limiter) == model_client.MAX_CONCURRENT_CALLS
+
+
+def test_plain_call_frees_its_slot_on_return(monkeypatch):
+    monkeypatch.setattr(model_client, "_post_once", lambda *args: FakeResponse())
+    monkeypatch.setattr(model_client, "_limiters", {})
+    limiter = model_client.get_limiter(URL)
+
+    model_client.post_json(URL, {})
+    assert free_slots(limiter) == model_client.MAX_CONCURRENT_CALLS
@@ -0,0 +1,47 @@
+import pytest
+
+from conftest import BUCKET, USER_ID
+from sc_runtime import datatier
+from sc_runtime.pipeline_event import make_pipeline_event
+
+
+def test_failure_raises_for_async_retry(env, load_handler):
+    preprocess = load_handler("preprocessImage")
+    (image_id, _, s3_key), = env.seed_pending_photos(1, items_per_photo=0)
+
+    # the original is not in S3: a returned 500 would count as success
+    with pytest.raises(KeyError):
+        preprocess.lambda_handler(make_pipeline_event(image_id, USER_ID, s3_key), None)
+    assert env.lambda_.invocations == []
+
+
+def test_malformed_event_is_not_retried(env, load_handler):
+    preprocess = load_handler("preprocessImage")
+    assert preprocess.lambda_handler({"s3_key": "x"}, None)["statusCode"] == 400
+
+
+def test_duplicate_is_cloned_once(env, load_handler):
+    preprocess = load_handler("preprocessImage")
+    (source_id, _, source_key), (image_id, _, s3_key) = env.seed_pending_photos(2, items_per_photo=0)
+    source_items = 2
+
+    # an earlier upload of the same bytes, fully processed
+    photo = b"the same photo"
+    env.s3.put_object(Bucket=BUCKET, Key=source_key, Body=photo)
+    env.s3.put_object(Bucket=BUCKET, Key=s3_key, Body=photo)
+    datatier.perform_action(env.db, "UPDATE images SET content_hash = %s WHERE id = %s",
+                            [preprocess.content_hash(photo), source_id])
+    for n in range(source_items):
+        clipart_key = f"{USER_ID}/closet_items/source{n}.png"
+        env.s3.put_object(Bucket=BUCKET, Key=clipart_key, Body=b"png")
+        datatier.perform_action(env.db, """
+            INSERT INTO clothing_items (id, original_image_id, user_id, clothing_type, new_image_s3_key)
+            VALUES (%s, %s, %s, %s, %s)
+        """, [f"source{n}", source_id, USER_ID, "Shirt", clipart_key])
+
+    for _ in range(2):   # a retry, or a duplicate async delivery
+        preprocess.lambda_handler(make_pipeline_event(image_id, USER_ID, s3_key), None)
+
+    assert datatier.retrieve_one_row(env.db,
+        "SELECT COUNT(*) FROM clothing_items WHERE original_image_id = %s", [image_id])[0] == source_items
+    assert env.lambda_.invocations == []
@@ -0,0 +1,22 @@
+from sc_runtime import signed_urls
+
+KEY = "benchuser/closet_items/item.png"
+WINDOW_START = 1_760_000_400   # a multiple of URL_BUCKET_SECS
+
+
+def url_at(monkeypatch, now):
+    """The URL a cold container would hand out at time now."""
+    monkeypatch.setattr(signed_urls.time, "time", lambda: now)
+    signed_urls._signed_url_cache.clear()
+    return signed_urls.get_signed_url(KEY)
+
+
+def test_same_url_in_every_container_within_a_window(env, monkeypatch):
+    first = url_at(monkeypatch, WINDOW_START + 5)
+    assert url_at(monkeypatch, WINDOW_START + signed_urls.URL_BUCKET_SECS - 5) == first
+    assert f"X-Amz-Date={WINDOW_START}&X-Amz-Expires={signed_urls.URL_EXPIRES_IN}&" in first
+
+
+def test_new_url_in_the_next_window(env, monkeypatch):
+    first = url_at(monkeypatch, WINDOW_START + 5)
+    assert url_at(monkeypatch, WINDOW_START + signed_urls.URL_BUCKET_SECS + 5) != first
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from conftest import BUCKET, USER_ID
+from sc_runtime import datatier
+
+
+def object_created(s3_key):
+    return {"Records": [{"s3": {"bucket": {"name": BUCKET}, "object": {"key": s3_key}}}]}
+
+
+def test_failed_fan_out_is_retried(env, load_handler):
+    upload = load_handler("upload")
+    s3_key = f"uploads/{USER_ID}/11111111-1111-1111-1111-111111111111.jpg"
+    event = object_created(s3_key)
+
+    invoke = env.lambda_.invoke
+    def unavailable(**kwargs):
+        raise ConnectionError("Lambda unavailable")
+    env.lambda_.invoke = unavailable
+    with pytest.raises(ConnectionError):
+        upload.lambda_handler(event, None)
+
+    # Lambda's async retry delivers the event again
+    env.lambda_.invoke = invoke
+    upload.lambda_handler(event, None)
+
+    assert [json.loads(payload)["s3_key"] for _, payload in env.lambda_.invocations] == [s3_key]
+
+
+def test_duplicate_notification_after_processing_started(env, load_handler):
+    upload = load_handler("upload")
+    s3_key = f"uploads/{USER_ID}/11111111-1111-1111-1111-111111111111.jpg"
+
+    upload.lambda_handler(object_created(s3_key), None)
+    datatier.perform_action(env.db, "UPDATE images SET content_hash = %s WHERE s3_key = %s", ["0" * 64, s3_key])
+    upload.lambda_handler(object_created(s3_key), None)
+
+    assert len(env.lambda_.invocations) == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from sc_runtime.vocabulary import canonicalize, normalize_item, tidy
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("T-Shirt", "T-Shirt"),
+    ("t shirt", "T-Shirt"),
+    ("TEE", "T-Shirt"),
+    ("Tees", "T-Shirt"),                     # plural of a synonym
+    ("light wash denim jacket", "Jacket"),   # trailing words
+    ("Chelsea Boots", "Boots"),
+    ("sneaker", "Sneakers"),                 # singular of a canonical value
+])
+def test_clothing_types(raw, expected):
+    assert canonicalize("clothing_type", raw) == expected
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Navy Blue", "Navy"),
+    ("navy", "Navy"),
+    ("grey", "Gray"),
+    ("light grey", "Gray"),                  # modifier ignored
+    ("forest green", "Green"),               # two-word name before single words
+    ("black and white stripes", "Multicolor"),
+    ("dark", "Dark"),                        # a lone modifier is not a color
+])
+def test_colors(raw, expected):
+    assert canonicalize("color", raw) == expected
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("cotton/polyester", "Cotton"),          # first recognized material
+    ("faux leather", "Leather"),
+    ("stainless steel", "Metal"),
+    ("100% merino wool", "Wool"),
+])
+def test_materials(raw, expected):
+    assert canonicalize("material", raw) == expected
+
+
+def test_unknown_values_are_tidied_not_dropped():
+    assert canonicalize("clothing_type", "  KIMONO ") == "Kimono"
+    assert canonicalize("material", "Bouclé") == "Bouclé"
+    assert tidy("mixed  Case") == "mixed Case"
+
+
+def test_empty_values():
+    for field in ("clothing_type", "color", "material"):
+        assert canonicalize(field, "") == ""
+        assert canonicalize(field, None) == ""
+        assert canonicalize(field, " - ") == ""
+
+
+def test_normalize_item_keeps_raw_values():
+    item = normalize_item({"clothing_type": "tee", "color": "navy blue", "material": None, "style": "Casual"})
+    assert item == {
+        "clothing_type": "T-Shirt", "clothing_type_raw": "tee",
+        "color": "Navy", "color_raw": "navy blue",
+        "material": "", "material_raw": "",
+        "style": "Casual",
+    }
@@ -1,34 +1,132 @@
 import json
-import base64
 import uuid
-import boto3
-import configparser
-from datatier import get_dbConn, perform_action, retrieve_one_row
-
-# Load config
-CONFIG_FILE = "SC.ini"
-config = configparser.ConfigParser()
-config.read(CONFIG_FILE)
-
-# S3 config
-S3_BUCKET = config.get("s3", "bucket_name")
-S3_REGION = config.get("s3", "region_name")
-
-# RDS config
-DB_HOST = config.get("rds", "endpoint")
-DB_PORT = config.getint("rds", "port_number")
-DB_USER = config.get("rds", "user_name")
-DB_PASSWORD = config.get("rds", "user_pwd")
-DB_NAME = config.get("rds", "db_name")
-
-# AWS Clients
-s3_client = boto3.client("s3", region_name=S3_REGION)
-lambda_client = boto3.client("lambda")
+import urllib.parse
+from sc_runtime import clients, closet_version, config, metrics
+from sc_runtime.datatier import perform_action, retrieve_one_row, transaction
+from sc_runtime.pipeline_event import make_pipeline_event
 
-# Lambda function names
-DETECT_CLOTHING_FUNCTION = "SC_detectClothing"
-CLIPART_CREATOR_FUNCTION = "SC_clipartCreator"
+# Config (SC.ini) and AWS/DB clients are loaded lazily through
+# sc_runtime on first use, so CORS preflight touches neither.
 
+# Lambda function names
+PREPROCESS_IMAGE_FUNCTION = "SC_preprocessImage"
+
+# Direct-to-S3 uploads. Originals land under UPLOAD_PREFIX; the bucket's
+# ObjectCreated notification for that prefix invokes this same function,
+# which registers the image and starts processing.
+UPLOAD_PREFIX = "uploads/"
+UPLOAD_URL_EXPIRES_IN = 300             # seconds the browser has to start the upload
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024     # 20 MB
+ALLOWED_CONTENT_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+}
+
+def create_upload(user_id, content_type):
+    """
+    Phase 1: make sure the user exists and hand back a presigned POST that
+    lets the browser send the photo straight to S3. S3 itself enforces the
+    size limit and content type, so image bytes never pass through Lambda.
+    """
+    conn = clients.db()
+
+    # Check if user exists
+    user_check = retrieve_one_row(conn, "SELECT id FROM users WHERE id = %s", [user_id])
+    if not user_check:
+        perform_action(conn, "INSERT INTO users (id) VALUES (%s)", [user_id])
+        print(f"New user created: {user_id}")
+    else:
+        print(f"User exists: {user_id}")
+
+    image_id = str(uuid.uuid4())
+    s3_key = f"{UPLOAD_PREFIX}{user_id}/{image_id}.{ALLOWED_CONTENT_TYPES[content_type]}"
+
+    with metrics.span("s3.presign"):
+        presigned = clients.s3().generate_presigned_post(
+            Bucket=config.s3_bucket(),
+            Key=s3_key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, MAX_UPLOAD_BYTES],
+            ],
+            ExpiresIn=UPLOAD_URL_EXPIRES_IN
+        )
+    return image_id, s3_key, presigned
+
+def parse_upload_key(s3_key):
+    """Returns (user_id, image_id) for keys of the form uploads/<user>/<image>.<ext>, else None."""
+    if not s3_key.startswith(UPLOAD_PREFIX):
+        return None
+    parts = s3_key[len(UPLOAD_PREFIX):].split("/")
+    if len(parts) != 2 or not parts[0].isalnum() or "." not in parts[1]:
+        return None
+    return parts[0], parts[1].rsplit(".", 1)[0]
+
+def start_processing(s3_key, image_id, user_id):
+    # Trigger SC_preprocessImage Lambda, which fans out to
+    # SC_detectClothing and SC_clipartCreator once the model-sized
+    # derivative is ready
+    with metrics.span("lambda.invoke"):
+        clients.lambda_().invoke(
+            FunctionName=PREPROCESS_IMAGE_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps(make_pipeline_event(image_id, user_id, s3_key))
+        )
+    print(f"Invoked SC_preprocessImage for {s3_key}")
+
+# Processing state of a registered image: SC_preprocessImage stores the
+# content hash first, and detection (or a duplicate's clone) adds items
+PROCESSING_STATE_SQL = """
+    SELECT i.content_hash IS NOT NULL
+           OR EXISTS (SELECT 1 FROM clothing_items c WHERE c.original_image_id = i.id)
+    FROM images i
+    WHERE i.id = %s
+"""
+
+def register_uploaded_object(s3_key):
+    """
+    Phase 2 (S3 ObjectCreated): record the image and fan out to the
+    processing Lambdas. S3 may deliver the same notification more than
+    once, and Lambda retries the event when the fan-out fails, so the
+    insert is idempotent and a delivery fans out unless processing has
+    visibly started. SC_preprocessImage is idempotent, so the rare second
+    fan-out is harmless.
+    """
+    parsed = parse_upload_key(s3_key)
+    if not parsed:
+        print(f"Ignoring object outside the upload scheme: {s3_key}")
+        return
+    user_id, image_id = parsed
+
+    conn = clients.db()
+
+    # Save image record
+    sql = """
+        INSERT IGNORE INTO images (id, user_id, s3_key)
+        VALUES (%s, %s, %s)
+    """
+    with transaction(conn):
+        inserted = perform_action(conn, sql, [image_id, user_id, s3_key])
+        if inserted:
+            closet_version.bump(conn, user_id)
+
+    if not inserted and retrieve_one_row(conn, PROCESSING_STATE_SQL, [image_id])[0]:
+        print(f"Image already registered and processing: {s3_key}")
+        return
+
+    start_processing(s3_key, image_id, user_id)
+
+def handle_s3_event(event):
+    for record in event["Records"]:
+        s3_key = urllib.parse.unquote_plus(record["s3"]["object"]["key"], encoding="utf-8")
+        print(f"Processing upload: s3://{record['s3']['bucket']['name']}/{s3_key}")
+        register_uploaded_object(s3_key)
+
+    return {'statusCode': 200, 'body': json.dumps({'message': 'Uploads registered.'})}
+
+@metrics.instrument("SC_upload")
 def lambda_handler(event, context):
     headers = {
         "Access-Control-Allow-Origin": "*",  # Update to your domain for production
@@ -43,80 +141,40 @@ def lambda_handler(event, context):
             "body": json.dumps("Preflight OK")
         }
 
+    # S3 ObjectCreated notification for a finished upload. Errors propagate
+    # so that Lambda's async retry re-delivers the event.
+    if "Records" in event:
+        return handle_s3_event(event)
+
     try:
         # Parse request body
         body = json.loads(event['body']) if 'body' in event else event
         incoming_user_id = body['user_id'].strip()
         user_id = ''.join(c for c in incoming_user_id if c.isalnum())
 
+        content_type = body.get('content_type', 'image/jpeg')
+        if not user_id or content_type not in ALLOWED_CONTENT_TYPES:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'Missing user_id or unsupported content_type'})
+            }
 
-        filename = body['filename']
-        file_content_b64 = body['file_content']
-
-        # Decode image from base64
-        image_bytes = base64.b64decode(file_content_b64)
-
-        # Connect to DB
-        conn = get_dbConn(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
-        try:
-            # Check if user exists
-            user_check = retrieve_one_row(conn, "SELECT id FROM users WHERE id = %s", [user_id])
-            if not user_check:
-                perform_action(conn, "INSERT INTO users (id) VALUES (%s)", [user_id])
-                print(f"New user created: {user_id}")
-            else:
-                print(f"User exists: {user_id}")
-
-            # Prepare image upload
-            image_id = str(uuid.uuid4())
-            ext = filename.split('.')[-1]
-            s3_key = f"{user_id}/{image_id}.{ext}"
-
-            # Upload to S3
-            s3_client.put_object(
-                Bucket=S3_BUCKET,
-                Key=s3_key,
-                Body=image_bytes,
-                ContentType="image/jpeg"
-            )
-
-            # Save image record
-            sql = """
-                INSERT INTO images (id, user_id, s3_key)
-                VALUES (%s, %s, %s)
-            """
-            perform_action(conn, sql, [image_id, user_id, s3_key])
-
-        finally:
-            conn.close()
-
-        # Trigger SC_detectClothing Lambda
-        lambda_client.invoke(
-            FunctionName=DETECT_CLOTHING_FUNCTION,
-            InvocationType="Event",
-            Payload=json.dumps({"s3_key": s3_key})
-        )
-        print(f"Invoked SC_detectClothing for {s3_key}")
-
-        # Trigger SC_clipartCreator Lambda
-        lambda_client.invoke(
-            FunctionName=CLIPART_CREATOR_FUNCTION,
-            InvocationType="Event",
-            Payload=json.dumps({
-                "s3_key": s3_key,
-                "clothing_id": image_id
-            })
-        )
-        print(f"Invoked SC_clipartCreator for {s3_key}")
+        image_id, s3_key, presigned = create_upload(user_id, content_type)
 
         return {
             'statusCode': 200,
             'headers': headers,
             'body': json.dumps({
-                'message': 'Upload successful. Clothing detection and clipart generation started.',
+                'message': 'Upload URL issued. POST the file to upload.url with upload.fields.',
                 'user_id': user_id,
                 'image_id': image_id,
-                's3_key': s3_key
+                's3_key': s3_key,
+                'upload': {
+                    'url': presigned['url'],
+                    'fields': presigned['fields'],
+                    'max_bytes': MAX_UPLOAD_BYTES
+                }
             })
         }
 
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { ClosetResponse } from '../types/types';
+import { ClosetFilters, ClosetResponse, MatchesResponse, MatchMode, OutfitsResponse, UploadTicket } from '../types/types';
 
 const API_BASE_URL = 'https://v5bqcgfgd7.execute-api.us-east-2.amazonaws.com/prod';
 
@@ -8,36 +8,83 @@ axios.defaults.headers.common['Content-Type'] = 'application/json';
 // Add any authentication headers here if needed
 // axios.defaults.headers.common['Authorization'] = 'your-auth-token';
 
+// Two-phase upload: ask the API for a presigned POST, then send the file
+// straight to S3. The bucket's ObjectCreated trigger registers the image and
+// starts clothing detection, so the photo never passes through the API.
 export const uploadImage = async (file: File, userId: string): Promise<void> => {
-    // Convert file to base64
-    const reader = new FileReader();
-    const base64Promise = new Promise<string>((resolve, reject) => {
-        reader.onload = () => {
-            if (typeof reader.result === 'string') {
-                // Remove the data URL prefix (e.g., "data:image/jpeg;base64,")
-                const base64String = reader.result.split(',')[1];
-                resolve(base64String);
-            } else {
-                reject(new Error('Failed to convert file to base64'));
-            }
-        };
-        reader.onerror = () => reject(new Error('Failed to read file'));
+    const { data } = await axios.post<UploadTicket>(`${API_BASE_URL}/images`, {
+        user_id: userId,
+        content_type: file.type || 'image/jpeg'
     });
 
-    reader.readAsDataURL(file);
-    const base64Data = await base64Promise;
+    if (file.size > data.upload.max_bytes) {
+        throw new Error('File is too large to upload');
+    }
 
-    // Send the data as JSON
-    await axios.post(`${API_BASE_URL}/images`, {
-        user_id: userId,
-        filename: file.name,
-        file_content: base64Data
-    });
+    const form = new FormData();
+    Object.entries(data.upload.fields).forEach(([name, value]) => form.append(name, value));
+    form.append('file', file);  // S3 requires the file to be the last field
+
+    // Plain fetch: the JSON Content-Type default above must not apply here
+    const response = await fetch(data.upload.url, { method: 'POST', body: form });
+    if (!response.ok) {
+        throw new Error(`S3 upload failed with status ${response.status}`);
+    }
 };
 
-export const getCloset = async (userId: string): Promise<ClosetResponse> => {
+export const CLOSET_PAGE_SIZE = 60;
+
+// Fetches one page of the closet. Pass the previous page's next_cursor to
+// continue where it left off; omit it to start from the beginning. Filters
+// must be the same for every page of one listing.
+export const getCloset = async (
+    userId: string,
+    cursor?: string | null,
+    limit: number = CLOSET_PAGE_SIZE,
+    filters: ClosetFilters = {}
+): Promise<ClosetResponse> => {
     // Strip special characters from userId, keeping only alphanumeric characters
     const cleanUserId = userId.replace(/[^a-zA-Z0-9]/g, '');
-    const response = await axios.get(`${API_BASE_URL}/closet/${cleanUserId}`);
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) {
+        params.append('cursor', cursor);
+    }
+    // Repeated parameters (?color=Blue&color=Navy) match any of the values
+    Object.entries(filters).forEach(([attribute, values]) => {
+        (values ?? []).forEach((value) => params.append(attribute, value));
+    });
+    const response = await axios.get(`${API_BASE_URL}/closet/${cleanUserId}`, { params });
+    return response.data;
+}; 
+
+// Items from the same closet that look like the given item ('similar') or
+// would be worn with it ('goes_with'), best match first.
+export const getMatches = async (
+    userId: string,
+    itemId: string,
+    mode: MatchMode,
+    limit: number = 12
+): Promise<MatchesResponse> => {
+    const cleanUserId = userId.replace(/[^a-zA-Z0-9]/g, '');
+    const response = await axios.get(
+        `${API_BASE_URL}/closet/${cleanUserId}/items/${encodeURIComponent(itemId)}/matches`,
+        { params: { mode, limit } }
+    );
     return response.data;
-}; 
\ No newline at end of file
+};
+
+// Ranked outfit suggestions from the closet. With itemId, every outfit is
+// built around that item.
+export const getOutfits = async (
+    userId: string,
+    count: number = 20,
+    itemId?: string
+): Promise<OutfitsResponse> => {
+    const cleanUserId = userId.replace(/[^a-zA-Z0-9]/g, '');
+    const params: Record<string, string> = { count: String(count) };
+    if (itemId) {
+        params.item = itemId;
+    }
+    const response = await axios.get(`${API_BASE_URL}/closet/${cleanUserId}/outfits`, { params });
+    return response.data;
+};
@@ -1,11 +1,21 @@
 import React, { useState } from 'react';
-import { Box, Dialog, DialogContent, DialogTitle, IconButton, List, ListItem, ListItemText, Typography, Divider } from '@mui/material';
-import { ClothingItem } from '../types/types';
+import { Box, Button, CircularProgress, Dialog, DialogContent, DialogTitle, IconButton, List, ListItem, ListItemText, Typography, Divider } from '@mui/material';
+import { ClothingItem, MatchesResponse, MatchMode } from '../types/types';
+import { getMatches } from '../api/api';
+import ClothingImage from './ClothingImage';
 import CloseIcon from '@mui/icons-material/Close';
 
-const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
+const MATCH_LABELS: Record<MatchMode, string> = {
+    similar: 'Similar items',
+    goes_with: 'Goes with'
+};
+
+const ClosetGrid: React.FC<{ items: ClothingItem[]; userId?: string }> = ({ items, userId }) => {
     const [selectedImage, setSelectedImage] = useState<string | null>(null);
     const [selectedItems, setSelectedItems] = useState<ClothingItem[]>([]);
+    const [matches, setMatches] = useState<MatchesResponse | null>(null);
+    const [matchesLoading, setMatchesLoading] = useState(false);
+    const [matchesError, setMatchesError] = useState<string | null>(null);
 
     // Group items by their image
     const imageGroups = items.reduce((acc, item) => {
@@ -24,6 +34,22 @@ const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
     const handleClose = () => {
         setSelectedImage(null);
         setSelectedItems([]);
+        setMatches(null);
+        setMatchesError(null);
+    };
+
+    const handleShowMatches = async (item: ClothingItem, mode: MatchMode) => {
+        if (!userId) return;
+        setMatchesLoading(true);
+        setMatchesError(null);
+        try {
+            setMatches(await getMatches(userId, item.clothing_id, mode));
+        } catch (err) {
+            console.error('Error fetching matches:', err);
+            setMatchesError('Failed to load matches. Please try again.');
+        } finally {
+            setMatchesLoading(false);
+        }
     };
 
     return (
@@ -54,8 +80,9 @@ const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
                             }}
                             onClick={() => handleImageClick(imageKey)}
                         >
-                            <img
-                                src={firstItem.image_url}
+                            <ClothingImage
+                                item={firstItem}
+                                sizes="300px"
                                 alt={`Clothing image ${imageKey}`}
                                 style={{
                                     maxWidth: '100%',
@@ -76,7 +103,7 @@ const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
                 fullWidth
             >
                 <DialogTitle>
-                    Items in this Image
+                    {selectedItems.length === 1 ? selectedItems[0].clothing_type : 'Items in this Image'}
                     <IconButton
                         aria-label="close"
                         onClick={handleClose}
@@ -107,8 +134,9 @@ const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
                             height: '400px'
                         }}>
                             {selectedImage && (
-                                <img
-                                    src={imageGroups[selectedImage][0].image_url}
+                                <ClothingImage
+                                    item={imageGroups[selectedImage][0]}
+                                    sizes="400px"
                                     alt="Selected clothing"
                                     style={{
                                         maxWidth: '100%',
@@ -140,9 +168,22 @@ const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
                                                             component="span"
                                                             variant="body2"
                                                             color="text.primary"
-                                                            sx={{ display: 'block' }}
+                                                            sx={{ display: 'flex', alignItems: 'center', gap: 1 }}
                                                         >
                                                             Color: {item.color}
+                                                            {item.color_rgb && (
+                                                                <Box
+                                                                    component="span"
+                                                                    sx={{
+                                                                        display: 'inline-block',
+                                                                        width: 14,
+                                                                        height: 14,
+                                                                        borderRadius: '50%',
+                                                                        border: '1px solid rgba(0, 0, 0, 0.2)',
+                                                                        backgroundColor: item.color_rgb
+                                                                    }}
+                                                                />
+                                                            )}
                                                         </Typography>
                                                         <Typography
                                                             component="span"
@@ -170,6 +211,21 @@ const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
                                                                 Details: {item.extra_info}
                                                             </Typography>
                                                         )}
+                                                        {userId && (
+                                                            <Box component="span" sx={{ display: 'flex', gap: 1, mt: 1 }}>
+                                                                {(Object.keys(MATCH_LABELS) as MatchMode[]).map((mode) => (
+                                                                    <Button
+                                                                        key={mode}
+                                                                        size="small"
+                                                                        variant="outlined"
+                                                                        disabled={matchesLoading}
+                                                                        onClick={() => handleShowMatches(item, mode)}
+                                                                    >
+                                                                        {MATCH_LABELS[mode]}
+                                                                    </Button>
+                                                                ))}
+                                                            </Box>
+                                                        )}
                                                     </>
                                                 }
                                             />
@@ -180,6 +236,58 @@ const ClosetGrid: React.FC<{ items: ClothingItem[] }> = ({ items }) => {
                             </List>
                         </Box>
                     </Box>
+                    {(matchesLoading || matchesError || matches) && (
+                        <Box sx={{ mt: 3 }}>
+                            <Divider sx={{ mb: 2 }} />
+                            {matchesLoading && <CircularProgress size={24} />}
+                            {!matchesLoading && matchesError && (
+                                <Typography color="error">{matchesError}</Typography>
+                            )}
+                            {!matchesLoading && !matchesError && matches && (
+                                <>
+                                    <Typography variant="subtitle1" sx={{ fontWeight: 'bold', mb: 1 }}>
+                                        {MATCH_LABELS[matches.mode]}
+                                    </Typography>
+                                    {matches.items.length === 0 ? (
+                                        <Typography variant="body2" color="text.secondary">
+                                            No matches in your closet yet.
+                                        </Typography>
+                                    ) : (
+                                        <Box sx={{ display: 'flex', gap: 2, overflowX: 'auto', pb: 1 }}>
+                                            {matches.items.map((match) => (
+                                                <Box
+                                                    key={match.clothing_id}
+                                                    sx={{
+                                                        flex: '0 0 120px',
+                                                        textAlign: 'center',
+                                                        backgroundColor: '#f5f5f5',
+                                                        borderRadius: '8px',
+                                                        padding: '8px'
+                                                    }}
+                                                >
+                                                    {match.image_url && (
+                                                        <ClothingImage
+                                                            item={match}
+                                                            sizes="104px"
+                                                            style={{
+                                                                width: '100%',
+                                                                height: '100px',
+                                                                objectFit: 'contain',
+                                                                borderRadius: '4px'
+                                                            }}
+                                                        />
+                                                    )}
+                                                    <Typography variant="caption" sx={{ display: 'block' }}>
+                                                        {match.color} {match.clothing_type}
+                                                    </Typography>
+                                                </Box>
+                                            ))}
+                                        </Box>
+                                    )}
+                                </>
+                            )}
+                        </Box>
+                    )}
                 </DialogContent>
             </Dialog>
         </>
@@ -0,0 +1,25 @@
+import React from 'react';
+import { ClothingItem, ThumbnailFormat } from '../types/types';
+
+const MIME_TYPES: Record<ThumbnailFormat, string> = {
+    avif: 'image/avif',
+    webp: 'image/webp'
+};
+
+// An item's clipart, from the smallest thumbnail that fills `sizes` in a
+// format the browser supports; the full-size PNG otherwise.
+const ClothingImage: React.FC<{
+    item: ClothingItem;
+    sizes: string;
+    alt?: string;
+    style?: React.CSSProperties;
+}> = ({ item, sizes, alt, style }) => (
+    <picture style={{ display: 'contents' }}>
+        {item.srcset && (Object.keys(item.srcset) as ThumbnailFormat[]).map((format) => (
+            <source key={format} type={MIME_TYPES[format]} srcSet={item.srcset![format]} sizes={sizes} />
+        ))}
+        <img src={item.image_url} alt={alt ?? item.clothing_type} loading="lazy" style={style} />
+    </picture>
+);
+
+export default ClothingImage;
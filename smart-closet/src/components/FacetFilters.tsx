@@ -0,0 +1,51 @@
+import React from 'react';
+import { Box, Chip, Typography } from '@mui/material';
+import { ClosetFilters, FacetAttribute, FacetCount } from '../types/types';
+
+const FACET_LABELS: Record<FacetAttribute, string> = {
+    clothing_type: 'Type',
+    color: 'Color',
+    material: 'Material',
+    style: 'Style',
+};
+
+interface FacetFiltersProps {
+    facets: Record<FacetAttribute, FacetCount[]>;
+    filters: ClosetFilters;
+    onToggle: (attribute: FacetAttribute, value: string) => void;
+    disabled?: boolean;
+}
+
+// One row of chips per attribute, e.g. "Blue (12)". Counts come from the
+// server, so they cover the whole closet, not just the loaded pages.
+const FacetFilters: React.FC<FacetFiltersProps> = ({ facets, filters, onToggle, disabled }) => (
+    <Box sx={{ mb: 4 }}>
+        {(Object.keys(FACET_LABELS) as FacetAttribute[]).map((attribute) => {
+            const values = facets[attribute] ?? [];
+            if (values.length === 0) return null;
+            return (
+                <Box key={attribute} sx={{ display: 'flex', flexWrap: 'wrap', alignItems: 'center', gap: 1, mb: 1.5 }}>
+                    <Typography variant="subtitle2" sx={{ width: 80, color: 'text.secondary' }}>
+                        {FACET_LABELS[attribute]}
+                    </Typography>
+                    {values.map(({ value, count }) => {
+                        const selected = filters[attribute]?.includes(value) ?? false;
+                        return (
+                            <Chip
+                                key={value}
+                                label={`${value} (${count})`}
+                                color={selected ? 'primary' : 'default'}
+                                variant={selected ? 'filled' : 'outlined'}
+                                onClick={() => onToggle(attribute, value)}
+                                disabled={disabled}
+                                size="small"
+                            />
+                        );
+                    })}
+                </Box>
+            );
+        })}
+    </Box>
+);
+
+export default FacetFilters;
@@ -0,0 +1,59 @@
+import React from 'react';
+import { Box, Typography } from '@mui/material';
+import { Outfit } from '../types/types';
+import ClothingImage from './ClothingImage';
+
+// One row of item thumbnails per suggested outfit, best first
+const OutfitList: React.FC<{ outfits: Outfit[] }> = ({ outfits }) => {
+    if (outfits.length === 0) {
+        return (
+            <Typography variant="body2" color="text.secondary">
+                Not enough items for an outfit yet. Add tops, bottoms and shoes!
+            </Typography>
+        );
+    }
+
+    return (
+        <Box sx={{ display: 'flex', flexDirection: 'column', gap: 2 }}>
+            {outfits.map((outfit, index) => (
+                <Box
+                    key={outfit.items.map((item) => item.clothing_id).join('-')}
+                    sx={{
+                        display: 'flex',
+                        alignItems: 'center',
+                        gap: 2,
+                        overflowX: 'auto',
+                        backgroundColor: '#f5f5f5',
+                        borderRadius: '8px',
+                        padding: '12px'
+                    }}
+                >
+                    <Typography variant="subtitle1" sx={{ fontWeight: 'bold', minWidth: 32 }}>
+                        #{index + 1}
+                    </Typography>
+                    {outfit.items.map((item) => (
+                        <Box key={item.clothing_id} sx={{ flex: '0 0 110px', textAlign: 'center' }}>
+                            {item.image_url && (
+                                <ClothingImage
+                                    item={item}
+                                    sizes="110px"
+                                    style={{
+                                        width: '100%',
+                                        height: '100px',
+                                        objectFit: 'contain',
+                                        borderRadius: '4px'
+                                    }}
+                                />
+                            )}
+                            <Typography variant="caption" sx={{ display: 'block' }}>
+                                {item.color} {item.clothing_type}
+                            </Typography>
+                        </Box>
+                    ))}
+                </Box>
+            ))}
+        </Box>
+    );
+};
+
+export default OutfitList;
@@ -1,10 +1,12 @@
 import React, { useState } from "react";
 import { useAuth0 } from "@auth0/auth0-react";
-import { Container, Typography, Box, Paper } from "@mui/material";
-import { uploadImage, getCloset } from "../api/api";
-import { ClosetResponse } from "../types/types";
+import { Container, Typography, Box, Paper, Button } from "@mui/material";
+import { uploadImage, getCloset, getOutfits } from "../api/api";
+import { ClosetFilters, ClosetResponse, FacetAttribute, Outfit } from "../types/types";
 import UserActions from "../components/UserActions";
 import ClosetGrid from "../components/ClosetGrid";
+import FacetFilters from "../components/FacetFilters";
+import OutfitList from "../components/OutfitList";
 import ErrorMessage from "../components/ErrorMessage";
 import LoadingSpinner from "../components/LoadingSpinner";
 import UserCard from "../components/UserCard";
@@ -16,6 +18,8 @@ const Closet: React.FC = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [uploadSuccess, setUploadSuccess] = useState(false);
+  const [filters, setFilters] = useState<ClosetFilters>({});
+  const [outfits, setOutfits] = useState<Outfit[] | null>(null);
 
   const handleFileUpload = async (
     event: React.ChangeEvent<HTMLInputElement>
@@ -36,13 +40,13 @@ const Closet: React.FC = () => {
     }
   };
 
-  const handleGetCloset = async () => {
+  const fetchFirstPage = async (activeFilters: ClosetFilters) => {
     if (!user?.sub) return;
 
     try {
       setLoading(true);
       setError(null);
-      const closetData = await getCloset(user.sub);
+      const closetData = await getCloset(user.sub, null, undefined, activeFilters);
       setCloset(closetData);
       setUploadSuccess(false);
     } catch (err) {
@@ -53,6 +57,58 @@ const Closet: React.FC = () => {
     }
   };
 
+  const handleGetCloset = () => fetchFirstPage(filters);
+
+  // Selecting or clearing a facet value starts a new listing from page one
+  const handleToggleFilter = (attribute: FacetAttribute, value: string) => {
+    const current = filters[attribute] ?? [];
+    const values = current.includes(value)
+      ? current.filter((v) => v !== value)
+      : [...current, value];
+    const next = { ...filters, [attribute]: values };
+    if (values.length === 0) {
+      delete next[attribute];
+    }
+    setFilters(next);
+    fetchFirstPage(next);
+  };
+
+  const handleSuggestOutfits = async () => {
+    if (!user?.sub) return;
+
+    try {
+      setLoading(true);
+      setError(null);
+      const response = await getOutfits(user.sub);
+      setOutfits(response.outfits);
+    } catch (err) {
+      setError("Failed to suggest outfits. Please try again.");
+      console.error(err);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const handleLoadMore = async () => {
+    if (!user?.sub || !closet?.next_cursor) return;
+
+    try {
+      setLoading(true);
+      setError(null);
+      const page = await getCloset(user.sub, closet.next_cursor, undefined, filters);
+      setCloset({
+        items: [...closet.items, ...page.items],
+        next_cursor: page.next_cursor,
+        facets: closet.facets,  // only the first page carries facets
+      });
+    } catch (err) {
+      setError("Failed to fetch more items. Please try again.");
+      console.error(err);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   return (
     <Container maxWidth="lg" sx={{ mt: 4, mb: 8 }}>
       <Box sx={{ mb: 6 }}>
@@ -92,7 +148,7 @@ const Closet: React.FC = () => {
           }}
         >
           <UserCard />
-          <Box sx{{ mt: 3, display: 'flex', justifyContent: 'center' }}>
+          <Box sx={{ mt: 3, display: 'flex', justifyContent: 'center' }}>
             <LogoutButton />
           </Box>
         </Paper>
@@ -137,7 +193,32 @@ const Closet: React.FC = () => {
           >
             Your Clothing Collection
           </Typography>
-          <ClosetGrid items={closet.items} />
+          <Box sx={{ mb: 3 }}>
+            <Button variant="contained" onClick={handleSuggestOutfits} disabled={loading}>
+              Suggest Outfits
+            </Button>
+          </Box>
+          {outfits && (
+            <Box sx={{ mb: 4 }}>
+              <OutfitList outfits={outfits} />
+            </Box>
+          )}
+          {closet.facets && (
+            <FacetFilters
+              facets={closet.facets}
+              filters={filters}
+              onToggle={handleToggleFilter}
+              disabled={loading}
+            />
+          )}
+          <ClosetGrid items={closet.items} userId={user?.sub} />
+          {closet.next_cursor && (
+            <Box sx={{ mt: 3, display: 'flex', justifyContent: 'center' }}>
+              <Button variant="outlined" onClick={handleLoadMore} disabled={loading}>
+                Load More
+              </Button>
+            </Box>
+          )}
         </Paper>
       )}
       
@@ -158,7 +239,9 @@ const Closet: React.FC = () => {
               mb: 2
             }}
           >
-            No clothing items found in your closet.
+            {Object.keys(filters).length > 0
+              ? "No clothing items match these filters."
+              : "No clothing items found in your closet."}
           </Typography>
           <Typography 
             variant="body1" 
@@ -168,6 +251,16 @@ const Closet: React.FC = () => {
           >
             Upload some images to get started!
           </Typography>
+          {Object.keys(filters).length > 0 && (
+            <Button
+              variant="outlined"
+              sx={{ mt: 3 }}
+              onClick={() => { setFilters({}); fetchFirstPage({}); }}
+              disabled={loading}
+            >
+              Clear Filters
+            </Button>
+          )}
         </Paper>
       )}
     </Container>
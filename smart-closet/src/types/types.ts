@@ -2,17 +2,87 @@ export interface ClothingItem {
     clothing_id: string;
     clothing_type: string;
     color: string;
+    // Dominant color measured from the clipart ("#rrggbb"), once available
+    color_rgb: string | null;
     material: string;
     style: string;
     extra_info: string;
     new_image_s3_key: string;
+    // Full-size clipart PNG
     image_url: string;
+    // Small copies of the clipart for grids, best format first
+    // ({ avif: "url 160w, url 320w, url 640w", webp: ... }); null for
+    // clipart without them, which is then shown from image_url
+    srcset: Partial<Record<ThumbnailFormat, string>> | null;
 }
 
+export type ThumbnailFormat = 'avif' | 'webp';
+
+// Attributes the closet can be filtered on
+export type FacetAttribute = 'clothing_type' | 'color' | 'material' | 'style';
+
+export interface FacetCount {
+    value: string;
+    count: number;
+}
+
+// Selected values per attribute; an item matches if it has any of them
+export type ClosetFilters = Partial<Record<FacetAttribute, string[]>>;
+
 export interface ClosetResponse {
     items: ClothingItem[];
+    // Opaque cursor for the next page, or null when this was the last page
+    next_cursor: string | null;
+    // Item counts per attribute value, most common first; sent with the
+    // first page only (null on later pages)
+    facets: Record<FacetAttribute, FacetCount[]> | null;
 } 
 
+// How SC_closetSearch relates the matches to the chosen item
+export type MatchMode = 'similar' | 'goes_with';
+
+export interface MatchedItem extends ClothingItem {
+    // Higher is a better match; comparable within one response only
+    score: number;
+}
+
+export interface MatchesResponse {
+    item_id: string;
+    mode: MatchMode;
+    // Best match first
+    items: MatchedItem[];
+}
+
+export type OutfitSlot = 'top' | 'bottom' | 'one_piece' | 'outerwear' | 'shoes' | 'accessory';
+
+export interface OutfitItem extends ClothingItem {
+    slot: OutfitSlot;
+}
+
+export interface Outfit {
+    // Mean pairwise compatibility of the outfit's items, 0..1
+    score: number;
+    items: OutfitItem[];
+}
+
+export interface OutfitsResponse {
+    // The item every outfit was built around, if one was requested
+    item_id: string | null;
+    // Best outfit first
+    outfits: Outfit[];
+}
+
+export interface UploadTicket {
+    user_id: string;
+    image_id: string;
+    s3_key: string;
+    upload: {
+        url: string;
+        fields: Record<string, string>;
+        max_bytes: number;
+    };
+}
+
 export interface UserInfo {
     // TBD
     // Probably a mixture of Auth0 fields and clothing info from the DB 